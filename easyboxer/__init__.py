@@ -0,0 +1,2 @@
+# EasyBoxer : Make label easy
+# core modules (dataset, labels, image) are Qt-free and cheap to import, GUI lives in easyboxer.gui
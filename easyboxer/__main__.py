@@ -0,0 +1,4 @@
+import sys
+from .gui import main
+
+sys.exit(main())
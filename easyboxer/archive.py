@@ -0,0 +1,138 @@
+import hashlib
+import io
+import os
+import sqlite3
+import struct
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path
+from natsort import natsorted
+from .dataset import is_image
+from .image import decode_image, fit_factor, read_size
+from .trace import tracer
+
+ARCHIVE_FORMATS = ['zip', 'tar']  # uncompressed tar only, members of tar.gz can't be read by offset
+CACHE_DIR = Path.home() / '.cache' / 'easyboxer' / 'archives'
+HEAD_BYTES = 1 << 16  # enough of a member to read image size from its header
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS members (
+    name TEXT PRIMARY KEY,
+    seq INTEGER,
+    offset INTEGER,
+    size INTEGER,
+    method INTEGER,
+    csize INTEGER
+);
+'''
+
+
+def is_archive(path):
+    p = Path(path)
+    return p.suffix[1:].lower() in ARCHIVE_FORMATS and p.is_file()
+
+
+def member_name(name):  # flat name of member, folders kept in it so a/001.jpg and b/001.jpg get own label files
+    return name.strip('/').replace('/', '__')
+
+
+def zip_members(path):  # (name, data offset, size, method, compressed size) from central directory
+    members = []
+    with open(path, 'rb') as f, zipfile.ZipFile(f) as z:
+        for info in z.infolist():
+            if info.is_dir() or not is_image(info.filename):
+                continue
+            f.seek(info.header_offset)
+            head = f.read(30)  # local header, its name and extra lengths may differ from central directory
+            if head[:4] != b'PK\x03\x04':
+                raise ValueError(f'bad local header {info.filename}')
+            n, m = struct.unpack('<HH', head[26:30])
+            members.append((info.filename, info.header_offset + 30 + n + m, info.file_size,
+                            info.compress_type, info.compress_size))
+    return members
+
+
+def tar_members(path):  # (name, data offset, size, method, compressed size), walks headers only
+    members = []
+    with tarfile.open(path, 'r:') as t:  # raises ReadError for compressed tar
+        for info in t:
+            if info.isfile() and is_image(info.name):
+                members.append((info.name, info.offset_data, info.size, zipfile.ZIP_STORED, info.size))
+    return members
+
+
+class ArchiveSource:  # images inside zip or tar read by offset, member list indexed once and kept on disk
+
+    def __init__(self, path, cache, root=CACHE_DIR):
+        self.path = str(Path(path).resolve())
+        self.cache = cache  # FrameCache shared with loose files
+        st = os.stat(self.path)
+        key = hashlib.sha1(f'{self.path}|{st.st_size}|{st.st_mtime_ns}'.encode()).hexdigest()
+        Path(root).mkdir(parents=True, exist_ok=True)
+        self.db_path = str(Path(root) / (key + '.db'))  # archive changed -> new key, indexed again
+        db = sqlite3.connect(self.db_path)
+        try:
+            db.executescript(SCHEMA)
+            if db.execute("SELECT value FROM meta WHERE key = 'scanned'").fetchone() is None:  # archive without images too
+                with tracer.span('archive_index'):
+                    rows = self.scan()
+                with db:
+                    db.execute('DELETE FROM members')
+                    db.executemany('INSERT INTO members VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(r[0], seq) + r[1:] for seq, r in enumerate(rows)])
+                    db.execute("REPLACE INTO meta VALUES ('scanned', '1')")
+            rows = db.execute('SELECT name, offset, size, method, csize FROM members ORDER BY seq').fetchall()
+        finally:
+            db.close()
+        self.members = {str(Path(self.path) / member_name(r[0])): r[1:] for r in rows}  # virtual path -> member
+        self.names = {str(Path(self.path) / member_name(r[0])): r[0] for r in rows}
+        self.paths = list(self.members)
+
+    def scan(self):  # natural name order, same as loose files
+        try:
+            members = zip_members(self.path) if zipfile.is_zipfile(self.path) else tar_members(self.path)
+        except (zipfile.BadZipFile, tarfile.TarError, struct.error) as e:
+            raise ValueError(f'cannot index {self.path}: {e}') from e
+        return natsorted(members, key=lambda m: m[0])
+
+    def read(self, path, n=None):  # bytes of member (first n only if given), own file handle per call
+        offset, size, method, csize = self.members[path]
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):  # rare methods, let zipfile handle it
+            with zipfile.ZipFile(self.path) as z:
+                return z.read(self.names[path])[:n]
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            if method == zipfile.ZIP_STORED:
+                return f.read(size if n is None else min(n, size))
+            d = zlib.decompressobj(-15)  # raw deflate
+            if n is None:
+                return d.decompress(f.read(csize))
+            out = b''
+            left = csize
+            while len(out) < n and left > 0:
+                chunk = f.read(min(left, HEAD_BYTES))
+                left -= len(chunk)
+                out += d.decompress(chunk)
+            return out[:n]
+
+    def load(self, path, view, prefetch=False):  # (frame, size, factor) decoded through frame cache
+        size = read_size(io.BytesIO(self.read(path, HEAD_BYTES)))
+        factor = fit_factor(size, view)
+        img = self.cache.find(path, factor)
+        if prefetch:
+            if img is None:
+                tracer.count('prefetch')
+        else:
+            tracer.count('hit' if img is not None else 'miss')
+        if img is None:
+            with tracer.span('fromfile'):
+                data = self.read(path)
+            img = decode_image(data, factor)
+            if img is not None:
+                self.cache.put((path, factor), img)
+        return img, size, factor
+
+    def close(self):
+        pass
@@ -0,0 +1,328 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+import cv2
+import numpy as np
+from .bulk import bulk_edit
+from .dataset import IMG_FORMATS, list_images
+from .dedup import THRESHOLD, compute_hashes, near_pairs
+from .export import export
+from .image import load_image, reduce_factor
+from .index import DatasetIndex
+from .labels import LabelStore, Labels, format_box, parse_labels, read_labels
+from .packed import PackedLabels, label_mtime
+from .prelabel import TINY_SIZE, prelabel, tiny_model
+from .spatial import BoxGrid
+
+VIEW = (1280, 760)  # display size used by decode and render benchmarks
+
+
+def stats(times):  # milliseconds
+    times = sorted(t * 1000 for t in times)
+    return {'n': len(times), 'min': times[0], 'median': times[len(times) // 2],
+            'mean': sum(times) / len(times), 'max': times[-1]}
+
+
+def timeit(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+    return stats(times)
+
+
+def synthetic_image(w, h, seed=0):  # noisy gradient, compresses like a photo rather than a flat color
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, (max(1, h // 32), max(1, w // 32), 3), dtype=np.uint8)
+    img = cv2.resize(small, (w, h), interpolation=cv2.INTER_CUBIC)
+    return cv2.add(img, rng.integers(0, 24, (h, w, 3), dtype=np.uint8))
+
+
+def synthetic_labels(n, seed=0):  # n random yolo lines
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n):
+        w, h = rng.uniform(0.01, 0.2), rng.uniform(0.01, 0.2)
+        box = (round(rng.uniform(w / 2, 1 - w / 2), 4), round(rng.uniform(h / 2, 1 - h / 2), 4), round(w, 4), round(h, 4))
+        lines.append(format_box(rng.randrange(10), box))
+    return '\n'.join(lines)
+
+
+def make_dataset(root, n_files, size, fmt, n_boxes):  # one encoded image copied n_files times, labels alike
+    img_dir, lbl_dir = Path(root) / 'images', Path(root) / 'labels'
+    img_dir.mkdir(parents=True, exist_ok=True)
+    lbl_dir.mkdir(parents=True, exist_ok=True)
+    ok, buf = cv2.imencode('.' + fmt, synthetic_image(*size))
+    data = buf.tobytes()
+    code = synthetic_labels(n_boxes)
+    for i in range(n_files):
+        with open(img_dir / f'{i:07d}.{fmt}', 'wb') as f:
+            f.write(data)
+        with open(lbl_dir / f'{i:07d}.txt', 'w') as f:
+            f.write(code)
+    return str(img_dir), str(lbl_dir)
+
+
+def bench_listing(root, files, repeat):
+    results = {}
+    for n in files:
+        d = Path(root) / f'list_{n}'
+        img_dir, lbl_dir = make_dataset(d, n, (64, 48), 'jpg', 1)
+        results[f'list_images/{n}'] = timeit(lambda: list_images(img_dir), repeat)
+        t = time.perf_counter()
+        index = DatasetIndex(img_dir, lbl_dir)
+        index.refresh()
+        results[f'index_cold/{n}'] = stats([time.perf_counter() - t])
+        results[f'index_warm/{n}'] = timeit(index.refresh, repeat)
+        index.close()
+        shutil.rmtree(d)
+    return results
+
+
+def bench_decode(root, sizes, formats, repeat):
+    results = {}
+    for w, h in sizes:
+        img = synthetic_image(w, h)
+        for fmt in formats:
+            p = Path(root) / f'decode_{w}x{h}.{fmt}'
+            if not cv2.imwrite(str(p), img):
+                continue
+            factor = reduce_factor(p, VIEW)
+            results[f'decode_full/{fmt}/{w}x{h}'] = timeit(lambda: load_image(p), repeat)
+            results[f'decode_view/{fmt}/{w}x{h}'] = timeit(lambda: load_image(p, factor), repeat)
+    return results
+
+
+def append_label(path, line):  # edit as the viewer wrote it before LabelStore, baseline of label_commit_erase
+    with open(path, 'a+') as f:
+        f.seek(0)
+        if len(f.read(1)) > 0:
+            f.write('\n')
+        f.write(line)
+
+
+def remove_label(path, line):  # baseline, whole file read and rewritten in place
+    with open(path, 'r') as f:
+        s = f.read()
+    s = s.replace(line, '').strip('\n').replace('\n\n', '\n')
+    with open(path, 'w') as f:
+        f.write(s)
+
+
+def bench_labels(root, boxes, repeat):
+    results = {}
+    for n in boxes:
+        code = synthetic_labels(n)
+        results[f'label_parse/{n}'] = timeit(lambda: Labels.parse(code), repeat)
+        boxes = Labels.parse(code).boxes
+        results[f'box_grid/{n}'] = timeit(lambda: BoxGrid(boxes), repeat)
+        grid, rng = BoxGrid(boxes), random.Random(0)
+        results[f'box_pick/{n}'] = timeit(lambda: grid.pick(rng.random(), rng.random()), repeat * 100)
+        p = str(Path(root) / f'labels_{n}.txt')
+        line = format_box(0, (0.5, 0.5, 0.1, 0.1))
+
+        def commit_erase():
+            append_label(p, line)
+            remove_label(p, line)
+        with open(p, 'w') as f:
+            f.write(code)
+        results[f'label_commit_erase/{n}'] = timeit(commit_erase, repeat)
+        store = LabelStore()
+
+        def store_edit():  # what the viewer does per edit, including the write
+            labels = store.add(p, 0, (0.5, 0.5, 0.1, 0.1))
+            store.remove(p, len(labels) - 1)
+            store.flush()
+        results[f'label_store_edit/{n}'] = timeit(store_edit, repeat)
+    return results
+
+
+def bench_prelabel(root, n, repeat):  # tiny model over n images, cold run then rerun served by cache
+    img_dir, _ = make_dataset(Path(root) / 'prelabel', n, (640, 480), 'jpg', 0)
+    paths = list_images(img_dir)
+    model = tiny_model(Path(root) / 'tiny.onnx')
+    db = Path(root) / 'proposals.db'
+    t = time.perf_counter()
+    prelabel(paths, model, size=TINY_SIZE, cache_path=db)
+    results = {f'prelabel_cold/{n}': stats([time.perf_counter() - t])}
+    results[f'prelabel_cached/{n}'] = timeit(lambda: prelabel(paths, model, size=TINY_SIZE, cache_path=db), repeat)
+    return results
+
+
+def bench_export(root, n, repeat):  # all formats cold, rerun with nothing changed, rerun after one label edit
+    img_dir, lbl_dir = make_dataset(Path(root) / 'export', n, (64, 48), 'jpg', 20)
+    out = Path(root) / 'export_out'
+    t = time.perf_counter()
+    export(img_dir, lbl_dir, out)
+    results = {f'export_cold/{n}': stats([time.perf_counter() - t])}
+    results[f'export_unchanged/{n}'] = timeit(lambda: export(img_dir, lbl_dir, out), repeat)
+
+    def edit_export():
+        with open(Path(lbl_dir) / f'{n // 2:07d}.txt', 'a') as f:
+            f.write('\n' + format_box(0, (0.5, 0.5, 0.1, 0.1)))
+        export(img_dir, lbl_dir, out)
+    results[f'export_one_edit/{n}'] = timeit(edit_export, repeat)
+    return results
+
+
+def bench_packed(root, n, repeat):  # packed label cache against reading label files
+    img_dir, lbl_dir = make_dataset(Path(root) / 'packed', n, (64, 48), 'jpg', 20)
+    index = DatasetIndex(img_dir, lbl_dir)
+    index.refresh()
+    t = time.perf_counter()
+    PackedLabels(index).close()
+    results = {f'packed_build/{n}': stats([time.perf_counter() - t])}
+    results[f'packed_open/{n}'] = timeit(lambda: PackedLabels(index).close(), repeat)
+    packed, rng = PackedLabels(index), random.Random(0)
+    paths = [str(Path(lbl_dir) / (Path(name).stem + '.txt')) for name in index.names()]
+
+    def packed_labels():
+        i = rng.randrange(n)
+        packed.labels(i, label_mtime(paths[i]))
+    results[f'packed_labels/{n}'] = timeit(packed_labels, repeat * 100)
+    results[f'file_labels/{n}'] = timeit(lambda: Labels.parse(read_labels(paths[rng.randrange(n)])), repeat * 100)
+    results[f'packed_query/{n}'] = timeit(lambda: packed.query(category=3, max_side=0.05), repeat)
+    results[f'packed_stats/{n}'] = timeit(packed.stats, repeat)
+    packed.close()
+    index.close()
+    return results
+
+
+def bench_dedup(root, n, repeat):  # hashing of small folder, then near pair search over n random hashes
+    img_dir, _ = make_dataset(Path(root) / 'dedup', 200, (1280, 960), 'jpg', 0)
+    index = DatasetIndex(img_dir)
+    index.refresh()
+    t = time.perf_counter()
+    compute_hashes(index)
+    results = {'dedup_hash/200': stats([time.perf_counter() - t])}
+    index.close()
+    rng = np.random.default_rng(0)
+    h = rng.integers(np.iinfo(np.int64).min, np.iinfo(np.int64).max, n, np.int64).view(np.uint64)
+    h[n // 2:] = h[:n - n // 2] ^ np.uint64(0b10101)  # half are near copies, 3 bits apart
+    results[f'dedup_pairs/{n}'] = timeit(lambda: near_pairs(h, THRESHOLD), repeat)
+    return results
+
+
+def bench_bulk(root, n, repeat):  # class remap touching a tenth of the files, dry run then rewrite
+    img_dir, lbl_dir = make_dataset(Path(root) / 'bulk', n, (64, 48), 'jpg', 20)
+    for i in range(0, n, 10):
+        with open(Path(lbl_dir) / f'{i:07d}.txt', 'a') as f:
+            f.write('\n' + format_box(50, (0.5, 0.5, 0.1, 0.1)))
+    results = {f'bulk_remap_dry/{n}': timeit(lambda: bulk_edit(img_dir, lbl_dir, {'remap': {50: 51}}, True), repeat)}
+    ops = iter([{'remap': {50 + k: 51 + k}} for k in range(repeat)])
+    results[f'bulk_remap/{n}'] = timeit(lambda: bulk_edit(img_dir, lbl_dir, next(ops)), repeat)
+    results[f'bulk_clip_dry/{n}'] = timeit(lambda: bulk_edit(img_dir, lbl_dir, {'clip': True}, True), repeat)
+    return results
+
+
+def bench_qt(root, sizes, boxes, repeat, steps):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtCore import QEventLoop
+    from PyQt5.QtGui import QPixmap
+    from PyQt5.QtWidgets import QApplication
+    from . import gui
+    app = QApplication.instance() or QApplication(sys.argv)
+    ex = gui.MyApp()
+    ex.resize(1600, 900)
+    app.processEvents()
+    cw = ex.cent_widget
+    results = {}
+    for n in boxes:  # overlay paint
+        cw.lbl_rect.set_boxes([box for _, box in parse_labels(synthetic_labels(n))])
+        target = QPixmap(cw.lbl_rect.size())
+        results[f'render_boxes/{n}'] = timeit(lambda: cw.lbl_rect.render(target), repeat)
+        code = synthetic_labels(n)
+        results[f'open_labels/{n}'] = timeit(lambda: (cw.code(Labels.parse(code)), app.processEvents()), repeat)
+    cw.lbl_rect.set_boxes([])
+    for w, h in sizes:  # frame to pixmap
+        frame = synthetic_image(w, h)
+        results[f'show_image/{w}x{h}'] = timeit(lambda: cw.show_image(frame), repeat)
+        results[f'brightness/{w}x{h}'] = timeit(cw.adjust, repeat)
+    for w, h in sizes:  # steady state next key
+        img_dir, lbl_dir = make_dataset(Path(root) / f'next_{w}x{h}', steps + 1, (w, h), 'jpg', 50)
+        cw.lbl_img.setText(img_dir)
+        cw.lbl_txt.setText(lbl_dir)
+        loop = QEventLoop()
+        cw.loader.send_img.connect(loop.quit)
+        cw.run()
+        loop.exec_()  # first image
+        times = []
+        for _ in range(steps):
+            t = time.perf_counter()
+            cw.next()
+            loop.exec_()
+            app.processEvents()
+            times.append(time.perf_counter() - t)
+        results[f'next_key/{w}x{h}'] = stats(times)
+        results[f'next_key/{w}x{h}']['per_second'] = steps / sum(times)
+        cw.loader.send_img.disconnect(loop.quit)
+        cw.end_session()  # journal, packed labels and their build closed before next folder
+        cw.loader.reset_val()
+    ex.close()  # same teardown once more, nothing left open
+    return results
+
+
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'numpy': np.__version__, 'opencv': cv2.__version__, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.bench', description='headless easyboxer benchmarks')
+    parser.add_argument('--files', default='10,1000', help='dataset sizes for listing, e.g. 10,1000,1000000')
+    parser.add_argument('--sizes', default='640x480,4000x3000', help='image sizes WxH')
+    parser.add_argument('--formats', default='jpg,png', help=f'formats among {IMG_FORMATS}')
+    parser.add_argument('--boxes', default='0,100,5000', help='boxes per image')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--steps', type=int, default=20, help='next key presses')
+    parser.add_argument('--prelabel', type=int, default=64, help='images for tiny model prelabel run, 0 to skip')
+    parser.add_argument('--export', type=int, default=5000, help='images for export runs, 0 to skip')
+    parser.add_argument('--packed', type=int, default=5000, help='images for packed label cache runs, 0 to skip')
+    parser.add_argument('--dedup', type=int, default=200000, help='hashes for near duplicate search, 0 to skip')
+    parser.add_argument('--bulk', type=int, default=5000, help='images for bulk label edit runs, 0 to skip')
+    parser.add_argument('--no-qt', action='store_true', help='skip render, show_image and next key benchmarks')
+    parser.add_argument('--workdir', help='synthetic datasets go here, default temporary folder')
+    parser.add_argument('--out', default='bench.json')
+    opt = parser.parse_args(argv)
+    files = [int(n) for n in opt.files.split(',')]
+    sizes = [tuple(int(v) for v in s.split('x')) for s in opt.sizes.split(',')]
+    formats = opt.formats.split(',')
+    boxes = [int(n) for n in opt.boxes.split(',')]
+    root = tempfile.mkdtemp(prefix='easyboxer_bench_', dir=opt.workdir)
+    try:
+        results = {}
+        results.update(bench_listing(root, files, opt.repeat))
+        results.update(bench_decode(root, sizes, formats, opt.repeat))
+        results.update(bench_labels(root, boxes, opt.repeat))
+        if opt.prelabel:
+            results.update(bench_prelabel(root, opt.prelabel, opt.repeat))
+        if opt.export:
+            results.update(bench_export(root, opt.export, opt.repeat))
+        if opt.packed:
+            results.update(bench_packed(root, opt.packed, opt.repeat))
+        if opt.dedup:
+            results.update(bench_dedup(root, opt.dedup, opt.repeat))
+        if opt.bulk:
+            results.update(bench_bulk(root, opt.bulk, opt.repeat))
+        if not opt.no_qt:
+            results.update(bench_qt(root, sizes, boxes, opt.repeat, opt.steps))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    report = {'environment': environment(), 'params': vars(opt), 'results': results}
+    with open(opt.out, 'w') as f:
+        json.dump(report, f, indent=1)
+    for name, r in results.items():
+        print(f'{name:40s} median {r["median"]:9.3f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,191 @@
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+import numpy as np
+from .image import decoded_size, image_size
+from .index import DatasetIndex
+from .labels import format_box, parse_line, read_labels, write_labels
+from .packed import PackedLabels
+from .pool import WORKERS, worker_pool
+
+CHUNK = 64  # label files per worker task
+MARGIN = 1e-5  # packed float32 boxes near a limit are rechecked exactly by the worker
+
+
+def parse_remap(text):  # '3:1,4:1' to {3: 1, 4: 1}, merging is many to one
+    return {int(a): int(b) for a, b in (pair.split(':') for pair in text.split(',') if pair.strip())}
+
+
+def clip_box(box):  # box cut to image, None if nothing is left
+    x, y, w, h = box
+    x1, y1, x2, y2 = max(x - w / 2, 0.0), max(y - h / 2, 0.0), min(x + w / 2, 1.0), min(y + h / 2, 1.0)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    return round((x1 + x2) / 2, 6), round((y1 + y2) / 2, 6), round(x2 - x1, 6), round(y2 - y1, 6)
+
+
+def edit_lines(lines, ops, size):  # (new lines, changed boxes, dropped boxes), untouched lines kept as written
+    remap, delete = ops.get('remap') or {}, set(ops.get('delete') or ())
+    min_size, min_pixels, clip = ops.get('min_size'), ops.get('min_pixels'), ops.get('clip')
+    out, changed, dropped = [], 0, 0
+    for line in lines:
+        p = parse_line(line)
+        if p is None:  # malformed, not ours to fix
+            out.append(line)
+            continue
+        c, box = p
+        if c in delete:
+            dropped += 1
+            continue
+        x, y, w, h = box
+        new = box
+        if clip and (x - w / 2 < 0 or y - h / 2 < 0 or x + w / 2 > 1 or y + h / 2 > 1):
+            new = clip_box(box)
+            if new is None:
+                dropped += 1
+                continue
+        w, h = new[2:]
+        if (min_size is not None and min(w, h) < min_size) or \
+                (min_pixels is not None and size and size[0] and size[1] and min(w * size[0], h * size[1]) < min_pixels):
+            dropped += 1
+            continue
+        k = remap.get(c, c)
+        if new != box:
+            line = format_box(k, new)
+        elif k != c:
+            line = str(k) + line[line.index(' '):]
+        changed += new != box or k != c
+        out.append(line)
+    return out, changed, dropped
+
+
+def rewrite_file(args):  # worker, edit one label file, written atomically unless dry run
+    img_dir, lbl_dir, name, size, ops, dry_run = args
+    if ops.get('min_pixels') is not None and (size is None or None in size):  # size unknown to index, 0 if unreadable
+        img = os.path.join(img_dir, name)
+        size = image_size(img) or decoded_size(img)
+    path = os.path.join(lbl_dir, Path(name).stem + '.txt')
+    lines = [line for line in read_labels(path).split('\n') if line.strip()]
+    out, changed, dropped = edit_lines(lines, ops, size)
+    if not (changed or dropped):
+        return name, 0, 0, None, None
+    counts = {}
+    for c, _ in filter(None, map(parse_line, out)):
+        counts[c] = counts.get(c, 0) + 1
+    if dry_run:
+        return name, changed, dropped, counts, None
+    write_labels(path, '\n'.join(out))
+    return name, changed, dropped, counts, os.stat(path).st_mtime_ns
+
+
+def candidates(index, ops, packed=None):  # names of images whose label files may change, from index and packed labels
+    names = set()
+    classes = set(ops.get('remap') or ()) | set(ops.get('delete') or ())
+    if classes:
+        names.update(n for n, in index.db.execute(
+            f'SELECT DISTINCT name FROM classes WHERE cls IN ({",".join("?" * len(classes))})', sorted(classes)))
+    if ops.get('clip') or ops.get('min_size') is not None or ops.get('min_pixels') is not None:
+        if packed is None:  # every labeled file
+            names.update(n for n, in index.db.execute('SELECT name FROM images WHERE n_boxes > 0'))
+        else:
+            names.update(geometry_candidates(index, ops, packed))
+    return names
+
+
+def geometry_candidates(index, ops, packed):  # images with boxes outside or below size, vectorized over packed boxes
+    boxes = packed.boxes
+    mask = np.zeros(len(boxes), bool)
+    half = boxes[:, 2:] / 2
+    if ops.get('clip'):
+        mask |= ((boxes[:, :2] - half) < MARGIN).any(1) | ((boxes[:, :2] + half) > 1 - MARGIN).any(1)
+    if ops.get('min_size') is not None:
+        mask |= boxes[:, 2:].min(1) < ops['min_size'] + MARGIN
+    unknown = set()
+    if ops.get('min_pixels') is not None:
+        size = np.array([(w or np.nan, h or np.nan) for w, h in
+                         index.db.execute('SELECT width, height FROM images ORDER BY seq')], np.float32).reshape(-1, 2)
+        per_box = np.repeat(size, np.diff(packed.offsets), axis=0)
+        mask |= (boxes[:, 2:] * per_box).min(1) < ops['min_pixels'] + MARGIN  # false for unknown size
+        unknown = set(np.flatnonzero(np.isnan(size).any(1) & (np.diff(packed.offsets) > 0)).tolist())
+    rows = set(np.flatnonzero(packed.counts(mask)).tolist()) | set(packed.overlay) | unknown  # rechecked by worker
+    names = index.names()
+    return [names[i] for i in rows]
+
+
+def bulk_edit(img_dir, lbl_dir, ops, dry_run=False, names=None, workers=WORKERS, progress=None,
+              report=None):  # rewrite affected label files in parallel, index kept in sync, return summary
+    index = DatasetIndex(img_dir, lbl_dir)
+    try:
+        if names is None:  # caller holding index and packed labels gives them
+            index.refresh()
+            packed = None if set(ops) <= {'remap', 'delete'} else PackedLabels(index, workers)
+            names = candidates(index, ops, packed)
+            if packed is not None:
+                packed.close()
+        names = set(names)
+        sizes = {n: (w, h) for n, w, h in index.db.execute('SELECT name, width, height FROM images')
+                 if n in names} if ops.get('min_pixels') is not None else {}
+        names = sorted(names)
+        summary = {'candidates': len(names), 'files': 0, 'changed': 0, 'dropped': 0, 'dry_run': dry_run}
+        done = 0
+        if progress is not None:
+            progress(done, len(names))
+        if not names:
+            return summary
+        jobs = [(index.img_dir, index.lbl_dir, n, sizes.get(n), ops, dry_run) for n in names]
+        with worker_pool(min(workers, len(jobs))) as pool:
+            for name, changed, dropped, counts, mtime in pool.imap_unordered(rewrite_file, jobs, chunksize=CHUNK):
+                done += 1
+                if counts is not None:
+                    summary['files'] += 1
+                    summary['changed'] += changed
+                    summary['dropped'] += dropped
+                    if report is not None:
+                        report({'file': name, 'changed': changed, 'dropped': dropped})
+                    if mtime is not None:
+                        index.store_label(name, mtime, counts)
+                if done % CHUNK == 0 or done == len(jobs):
+                    index.db.commit()
+                    if progress is not None:
+                        progress(done, len(jobs))
+        index.db.commit()
+        return summary
+    finally:
+        index.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.bulk', description='edit every label file at once')
+    parser.add_argument('images', help='image folder')
+    parser.add_argument('labels', help='label folder')
+    parser.add_argument('--remap', help="categories to change, old:new pairs like '3:1,4:1' (merge 3 and 4 into 1)")
+    parser.add_argument('--delete', help='categories whose boxes are removed, comma separated')
+    parser.add_argument('--min-size', type=float, help='remove boxes whose width or height is under this fraction')
+    parser.add_argument('--min-pixels', type=float, help='remove boxes whose width or height is under this many pixels')
+    parser.add_argument('--clip', action='store_true', help='cut boxes to the image, remove those fully outside')
+    parser.add_argument('--dry-run', action='store_true', help='report changes, write nothing')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes')
+    opt = parser.parse_args(argv)
+    ops = {}
+    if opt.remap:
+        ops['remap'] = parse_remap(opt.remap)
+    if opt.delete:
+        ops['delete'] = [int(c) for c in opt.delete.split(',')]
+    if opt.min_size is not None:
+        ops['min_size'] = opt.min_size
+    if opt.min_pixels is not None:
+        ops['min_pixels'] = opt.min_pixels
+    if opt.clip:
+        ops['clip'] = True
+    if not ops:
+        parser.error('nothing to do, give --remap, --delete, --min-size, --min-pixels or --clip')
+    summary = bulk_edit(opt.images, opt.labels, ops, opt.dry_run, workers=opt.workers,
+                        report=lambda r: print(json.dumps(r, ensure_ascii=False)))
+    print(json.dumps(dict(summary, type='summary')))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import os
+from pathlib import Path
+from natsort import natsorted
+
+IMG_FORMATS = ['bmp', 'jpg', 'jpeg', 'png', 'tif', 'tiff', 'dng', 'webp', 'mpo']  # acceptable image suffixes
+
+
+def is_image(name):
+    return name.rsplit('.', 1)[-1].lower() in IMG_FORMATS
+
+
+def list_images(img_dir):  # image paths of folder in natural name order, same order as DatasetIndex
+    p = str(Path(img_dir).resolve())  # os-agnostic absolute path
+    with os.scandir(p) as it:
+        return natsorted(e.path for e in it if e.is_file() and is_image(e.name))
+
+
+def has_images(img_dir):  # stops at first image, cheap check before indexing
+    try:
+        with os.scandir(Path(img_dir).resolve()) as it:
+            return any(is_image(e.name) and e.is_file() for e in it)
+    except OSError:
+        return False
+
+
+def label_path(lbl_dir, img_path):  # yolo label file of image
+    return str(Path(lbl_dir).resolve() / (Path(img_path).stem + '.txt'))
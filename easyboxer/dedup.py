@@ -0,0 +1,185 @@
+import argparse
+import json
+import os
+import sys
+from itertools import combinations
+import cv2
+import numpy as np
+from send2trash import send2trash
+from .dataset import label_path
+from .image import load_image, reduce_factor
+from .index import DatasetIndex
+from .pool import WORKERS, worker_pool
+
+HASH_DECODE = 64  # reduced decode still covers this many pixels per side
+THRESHOLD = 5  # phash bits that may differ between near duplicates
+DHASH_THRESHOLD = 12  # dhash bits that may differ, second check against phash collisions
+CHUNK = 64  # images per worker task
+QUERY_CHUNK = 1 << 16  # hashes searched at once, bounds candidate pair memory
+TABLE_BITS = 24  # bands up to this wide use a bucket table instead of binary search
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], np.uint8)  # set bits of byte
+
+
+def hash_bits(mask):  # 64 bools to signed 64 bit int, as sqlite stores it
+    return int(np.packbits(mask.ravel()).view('>i8')[0])
+
+
+def image_hashes(path):  # (dhash, phash) of image from reduced decode, None if unreadable
+    img = load_image(path, reduce_factor(path, (HASH_DECODE, HASH_DECODE)))
+    if img is None:
+        return None
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    dhash = hash_bits(small[:, 1:] > small[:, :-1])  # brighter than left neighbor
+    low = cv2.dct(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32))[:8, :8]
+    phash = hash_bits(low > np.median(low.ravel()[1:]))  # low frequencies above median, dc left out
+    return dhash, phash
+
+
+def hash_chunk(args):  # worker, [(name, mtime_ns, dhash, phash)]
+    img_dir, rows = args
+    out = []
+    for name, mtime in rows:
+        h = image_hashes(os.path.join(img_dir, name))
+        out.append((name, mtime) + (h or (None, None)))
+    return out
+
+
+def compute_hashes(index, workers=WORKERS, progress=None, cancelled=None):  # hash new or modified images, stored as done
+    todo = index.unhashed()
+    total, done = len(todo), 0
+    if progress is not None:
+        progress(done, total)
+    if not todo:
+        return 0
+    jobs = [(index.img_dir, todo[i:i + CHUNK]) for i in range(0, total, CHUNK)]
+    with worker_pool(min(workers, len(jobs))) as pool:
+        for rows in pool.imap_unordered(hash_chunk, jobs):
+            index.store_hashes(rows)
+            done += len(rows)
+            if progress is not None:
+                progress(done, total)
+            if cancelled is not None and cancelled():  # stored hashes stay, next run continues
+                pool.terminate()
+                break
+    return done
+
+
+def hamming(a, b):  # differing bits of uint64 arrays
+    return POPCOUNT[(a ^ b).view(np.uint8).reshape(-1, 8)].sum(1)
+
+
+def flip_masks(width, r):  # every mask of at most r set bits among width bits
+    masks = [0]
+    for k in range(1, r + 1):
+        masks += [sum(1 << b for b in bits) for bits in combinations(range(width), k)]
+    return np.array(masks, np.uint64)
+
+
+def near_pairs(h, t):  # (i, j) with i < j and hamming(h[i], h[j]) <= t, multi-index hashing instead of all pairs
+    n = len(h)
+    if n < 2:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    m = int(np.clip(round(64 / max(np.log2(n), 1)), 1, t + 1))  # band of about log2 n bits, few hashes per bucket
+    r = t // m  # pair within t differs by at most r bits in some band
+    edges = np.linspace(0, 64, m + 1).astype(int)
+    found = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        width = int(hi - lo)
+        band = (h >> np.uint64(lo)) & np.uint64((1 << width) - 1)
+        order = np.argsort(band, kind='stable')
+        ordered = band[order]
+        if width <= TABLE_BITS:  # bucket start and size looked up directly
+            size = np.bincount(band.astype(np.int64), minlength=1 << width)
+            first = np.cumsum(size) - size
+        masks = flip_masks(width, r)
+        for start in range(0, n, QUERY_CHUNK):
+            q = band[start:start + QUERY_CHUNK]
+            for mask in masks:
+                keys = q ^ mask
+                if width <= TABLE_BITS:
+                    left, cnt = first[keys.astype(np.int64)], size[keys.astype(np.int64)]
+                else:
+                    left = np.searchsorted(ordered, keys, 'left')
+                    cnt = np.searchsorted(ordered, keys, 'right') - left
+                i = np.repeat(np.arange(start, start + len(q)), cnt)
+                j = order[np.repeat(left, cnt) + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)]
+                keep = i < j
+                i, j = i[keep], j[keep]
+                keep = hamming(h[i], h[j]) <= t
+                found.append(i[keep] * n + j[keep])
+    pairs = np.unique(np.concatenate(found))  # pair found by several bands once
+    return pairs // n, pairs % n
+
+
+def union_find(n, i, j):  # component root of each of n nodes joined by pairs
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    for a, b in zip(i.tolist(), j.tolist()):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    return np.array([find(x) for x in range(n)], np.int64)
+
+
+def find_clusters(index, threshold=THRESHOLD, dthreshold=DHASH_THRESHOLD):  # [[seq, ...]] largest first, keeper first
+    rows = index.hashes()
+    if len(rows) < 2:
+        return []
+    seq, dhash, phash, boxes = (np.array(c, np.int64) for c in zip(*((s, d, p, n or 0) for s, d, p, n in rows)))
+    dhash, phash = dhash.view(np.uint64), phash.view(np.uint64)
+    uniq, inverse = np.unique(np.stack([phash, dhash], 1), axis=0, return_inverse=True)  # exact copies searched once
+    i, j = near_pairs(uniq[:, 0].copy(), threshold)
+    close = hamming(uniq[i, 1], uniq[j, 1]) <= dthreshold
+    root = union_find(len(uniq), i[close], j[close])[inverse.ravel()]
+    order = np.lexsort((seq, -boxes, root))  # by component, most boxes then first in order leads
+    root, seq = root[order], seq[order]
+    starts = np.flatnonzero(np.r_[True, root[1:] != root[:-1]])
+    clusters = [c.tolist() for c in np.split(seq, starts[1:]) if len(c) > 1]
+    clusters.sort(key=lambda c: (-len(c), min(c)))
+    return clusters
+
+
+def trash_cluster(img_dir, lbl_dir, names):  # duplicates and their label files to trash, [path] trashed
+    trashed = []
+    for name in names:
+        for p in (os.path.join(img_dir, name), label_path(lbl_dir, name) if lbl_dir else None):
+            if p and os.path.exists(p):
+                send2trash(p)
+                trashed.append(p)
+    return trashed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.dedup', description='find near duplicate images')
+    parser.add_argument('images', help='image folder')
+    parser.add_argument('labels', nargs='?', default='', help='label folder, image with most boxes is kept')
+    parser.add_argument('--threshold', type=int, default=THRESHOLD, help='phash bits that may differ')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='hashing processes')
+    parser.add_argument('--trash', action='store_true', help='send duplicates and their labels to trash')
+    opt = parser.parse_args(argv)
+    index = DatasetIndex(opt.images, opt.labels)
+    try:
+        index.refresh()
+        compute_hashes(index, opt.workers)
+        clusters = find_clusters(index, opt.threshold)
+        names = index.names()
+    finally:
+        index.close()
+    for c in clusters:
+        dups = [names[s] for s in c[1:]]
+        print(json.dumps({'keep': names[c[0]], 'duplicates': dups}, ensure_ascii=False))
+        if opt.trash:
+            trash_cluster(index.img_dir, opt.labels, dups)
+    print(json.dumps({'images': len(names), 'clusters': len(clusters),
+                      'duplicates': sum(len(c) - 1 for c in clusters), 'trashed': opt.trash}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
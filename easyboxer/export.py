@@ -0,0 +1,230 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+from xml.sax.saxutils import escape
+import numpy as np
+from .image import decoded_size, image_size
+from .index import DatasetIndex
+from .labels import parse_array, read_labels
+from .pool import WORKERS, worker_pool
+from .validate import read_names
+
+FORMATS = ['coco', 'voc', 'packed']
+SHARD = 1000  # images per shard, unit of work and of incremental re-export
+MANIFEST = 'export.json'  # shard fingerprints of last export
+SHARD_DIR = '.shards'  # per shard parts, final files are streamed from these
+ANN_SHIFT = 20  # coco annotation id is image id << ANN_SHIFT + box number, stable across re-exports
+
+
+def atomic_write(path, data, mode='w'):  # temp file renamed over path, readers never see half a file
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.', suffix='.tmp')
+    with os.fdopen(fd, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def shard_rows(db_path, shard, size):  # index rows of shard in shared order, read-only connection of worker
+    db = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    try:
+        return db.execute('SELECT name, size, mtime_ns, width, height, lbl_mtime_ns FROM images '
+                          'WHERE seq >= ? AND seq < ? ORDER BY seq', (shard * size, (shard + 1) * size)).fetchall()
+    finally:
+        db.close()
+
+
+def shard_key(rows, settings):  # fingerprint of shard, changes with any image, label or setting
+    h = hashlib.sha1(settings.encode())
+    for row in rows:
+        h.update(repr(row).encode())
+    return h.hexdigest()
+
+
+def category_name(names, c):
+    return names[c] if names and 0 <= c < len(names) else str(c)
+
+
+def voc_xml(name, w, h, cls, corners, names):  # pascal voc annotation, 1-based pixel corners
+    objects = ''.join(
+        f'<object><name>{escape(category_name(names, c))}</name><pose>Unspecified</pose><truncated>0</truncated>'
+        f'<difficult>0</difficult><bndbox><xmin>{x1}</xmin><ymin>{y1}</ymin><xmax>{x2}</xmax><ymax>{y2}</ymax>'
+        f'</bndbox></object>' for c, (x1, y1, x2, y2) in zip(cls.tolist(), corners.tolist()))
+    return (f'<annotation><filename>{escape(name)}</filename><size><width>{w}</width><height>{h}</height>'
+            f'<depth>3</depth></size><segmented>0</segmented>{objects}</annotation>\n')
+
+
+def export_shard(args):  # worker, write parts of one shard unless its fingerprint is unchanged
+    db_path, img_dir, lbl_dir, out, shard, size, formats, names, settings, old_key = args
+    rows = shard_rows(db_path, shard, size)
+    key = shard_key(rows, settings)
+    base = Path(out) / SHARD_DIR / f'shard_{shard:05d}'
+    old_names = set()
+    if base.with_suffix('.npz').exists():
+        if key == old_key:
+            return shard, key, None, None
+        with np.load(base.with_suffix('.npz')) as part:
+            old_names = set(part['names'].tolist())
+    kept, sizes, cls_parts, box_parts, offsets = [], [], [], [], [0]
+    coco_images, coco_anns = [], []
+    skipped = 0
+    for name, _, _, w, h, _ in rows:
+        if w is None or h is None:  # size unknown to older index, read from image itself
+            path = os.path.join(img_dir, name)
+            w, h = image_size(path) or decoded_size(path) or (None, None)
+        if not w or not h:  # unreadable image, no size to convert boxes to pixels
+            skipped += 1
+            continue
+        stem = Path(name).stem
+        _, _, cls, boxes = parse_array(read_labels(os.path.join(lbl_dir, stem + '.txt')))
+        kept.append(name)
+        sizes.append((w, h))
+        cls_parts.append(cls)
+        box_parts.append(boxes.astype(np.float32))
+        offsets.append(offsets[-1] + len(cls))
+        xy, wh = boxes[:, :2] * (w, h), boxes[:, 2:] * (w, h)
+        if 'coco' in formats:
+            image_id = shard * size + len(kept)  # seq + 1 when no image is skipped
+            coco_images.append(json.dumps({'id': image_id, 'file_name': name, 'width': w, 'height': h}))
+            for k, (c, (x, y), (bw, bh)) in enumerate(zip(cls.tolist(), (xy - wh / 2).round(2).tolist(),
+                                                          wh.round(2).tolist())):
+                coco_anns.append(json.dumps({'id': (image_id << ANN_SHIFT) + k, 'image_id': image_id,
+                                             'category_id': c + 1, 'bbox': [x, y, bw, bh],
+                                             'area': round(bw * bh, 2), 'iscrowd': 0, 'segmentation': []}))
+        if 'voc' in formats:
+            corners = np.clip(np.rint(np.hstack([xy - wh / 2, xy + wh / 2])).astype(np.int64) + 1, 1, (w, h, w, h))
+            atomic_write(Path(out) / 'voc' / (stem + '.xml'), voc_xml(name, w, h, cls, corners, names))
+    if 'coco' in formats:
+        atomic_write(base.with_suffix('.images'), ',\n'.join(coco_images))
+        atomic_write(base.with_suffix('.annotations'), ',\n'.join(coco_anns))
+    fd, tmp = tempfile.mkstemp(dir=base.parent, prefix='.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        np.savez(f, names=np.array(kept, str), sizes=np.array(sizes, np.int32).reshape(-1, 2),
+                 classes=np.concatenate(cls_parts or [np.zeros(0)]).astype(np.int32),
+                 boxes=np.concatenate(box_parts or [np.zeros((0, 4))]).astype(np.float32).reshape(-1, 4),
+                 offsets=np.array(offsets, np.int64))
+    os.replace(tmp, base.with_suffix('.npz'))
+    return shard, key, (len(kept), offsets[-1], skipped), sorted(old_names - set(kept))  # images, boxes, names gone
+
+
+def write_coco(out, n_shards, categories):  # stream shard parts into one json, one part in memory at a time
+    shard_dir = Path(out) / SHARD_DIR
+    path = Path(out) / 'coco.json'
+    fd, tmp = tempfile.mkstemp(dir=out, prefix='.', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for key in ('images', 'annotations'):
+            f.write(f'{{"{key}": [\n' if key == 'images' else f'],\n"{key}": [\n')
+            first = True
+            for shard in range(n_shards):
+                part = (shard_dir / f'shard_{shard:05d}.{key}').read_text(encoding='utf-8')
+                if part:
+                    f.write(part if first else ',\n' + part)
+                    first = False
+        f.write('],\n"categories": ' + json.dumps(categories, ensure_ascii=False) + '}\n')
+    os.replace(tmp, path)
+
+
+def write_packed(out, n_shards, counts):  # shard arrays copied into single memory-mappable .npy files
+    shard_dir, folder = Path(out) / SHARD_DIR, Path(out) / 'packed'
+    folder.mkdir(parents=True, exist_ok=True)
+    n_images, n_boxes = sum(c[0] for c in counts), sum(c[1] for c in counts)
+    arrays = {'boxes': ((n_boxes, 4), np.float32), 'classes': ((n_boxes,), np.int32),
+              'offsets': ((n_images + 1,), np.int64), 'sizes': ((n_images, 2), np.int32)}
+    tmp = {k: folder / f'.{k}.npy.tmp' for k in arrays}
+    mm = {k: np.lib.format.open_memmap(tmp[k], 'w+', dtype, shape) for k, (shape, dtype) in arrays.items()}
+    mm['offsets'][0] = 0
+    fd, names_tmp = tempfile.mkstemp(dir=folder, prefix='.', suffix='.tmp')
+    i = b = 0
+    with os.fdopen(fd, 'w', encoding='utf-8') as names:
+        for shard in range(n_shards):
+            with np.load(shard_dir / f'shard_{shard:05d}.npz') as part:
+                m, n = len(part['names']), len(part['classes'])
+                mm['boxes'][b:b + n] = part['boxes']
+                mm['classes'][b:b + n] = part['classes']
+                mm['offsets'][i + 1:i + m + 1] = part['offsets'][1:] + b
+                mm['sizes'][i:i + m] = part['sizes']
+                names.write(''.join(name + '\n' for name in part['names'].tolist()))
+            i, b = i + m, b + n
+    for k, a in mm.items():
+        a.flush()
+        os.replace(tmp[k], folder / f'{k}.npy')
+    os.replace(names_tmp, folder / 'images.txt')
+
+
+def export(img_dir, lbl_dir, out, formats=FORMATS, names=None, workers=WORKERS, shard=SHARD):  # summary dict
+    index = DatasetIndex(img_dir, lbl_dir)
+    try:
+        index.refresh()
+        n_shards = (len(index) + shard - 1) // shard
+        categories = [c for c, in index.db.execute('SELECT DISTINCT cls FROM classes ORDER BY cls')]
+        db_path, img_dir = index.db_path, index.img_dir
+    finally:
+        index.close()
+    out = Path(out)
+    out.mkdir(parents=True, exist_ok=True)
+    (out / SHARD_DIR).mkdir(exist_ok=True)
+    try:
+        manifest = json.loads((out / MANIFEST).read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        manifest = {}
+    settings = json.dumps([sorted(formats), names, shard, str(Path(lbl_dir).resolve())])
+    old = manifest.get('shards', {}) if manifest.get('settings') == settings else {}
+    old = {k: v for k, v in old.items() if len(v) == 4}  # [key, images, boxes, skipped], older shards exported again
+    jobs = [(db_path, img_dir, lbl_dir, str(out), i, shard, formats, names, settings, old.get(str(i), [None])[0])
+            for i in range(n_shards)]
+    shards, gone, changed = {}, [], 0
+    with worker_pool(max(1, min(workers, len(jobs)))) as pool:
+        for i, key, counts, removed in pool.imap_unordered(export_shard, jobs):
+            shards[str(i)] = [key, *(counts or old[str(i)][1:])]
+            if removed is not None:
+                changed += 1
+                gone += removed
+    for p in (out / SHARD_DIR).glob('shard_*'):  # dataset shrank
+        if int(p.stem.split('_')[1]) >= n_shards:
+            p.unlink()
+    if 'voc' in formats and gone:  # xml of images no longer in dataset, moved ones were rewritten by their shard
+        index = DatasetIndex(img_dir, lbl_dir)
+        try:
+            for name in gone:
+                if not index.db.execute('SELECT 1 FROM images WHERE name = ?', (name,)).fetchone():
+                    (out / 'voc' / (Path(name).stem + '.xml')).unlink(missing_ok=True)
+        finally:
+            index.close()
+    final = changed or n_shards != len(old) or not all(
+        (out / p).exists() for f, p in [('coco', 'coco.json'), ('packed', 'packed/boxes.npy')] if f in formats)
+    counts = [shards[str(i)][1:] for i in range(n_shards)]
+    if final and 'coco' in formats:
+        write_coco(out, n_shards, [{'id': c + 1, 'name': category_name(names, c)} for c in categories])
+    if final and 'packed' in formats:
+        write_packed(out, n_shards, counts)
+    atomic_write(out / MANIFEST, json.dumps({'settings': settings, 'shards': shards}))
+    return {'shards': n_shards, 'changed': changed, 'images': sum(c[0] for c in counts),
+            'boxes': sum(c[1] for c in counts), 'skipped': sum(c[2] for c in counts)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.export', description='export yolo labels')
+    parser.add_argument('images', help='image folder')
+    parser.add_argument('labels', help='label folder')
+    parser.add_argument('out', help='output folder, kept between exports so only changed shards are rewritten')
+    parser.add_argument('--formats', default=','.join(FORMATS), help=f'comma separated among {FORMATS}')
+    parser.add_argument('--names', help='category names file, one per line')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes')
+    parser.add_argument('--shard', type=int, default=SHARD, help='images per shard')
+    opt = parser.parse_args(argv)
+    formats = opt.formats.split(',')
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f'unknown format {sorted(unknown)}')
+    names = read_names(opt.names) if opt.names else None
+    print(json.dumps(export(opt.images, opt.labels, opt.out, formats, names, opt.workers, opt.shard)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2146 @@
+import bisect
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+from PyQt5.QtWidgets import *
+from PyQt5.QtGui import *
+from PyQt5.QtCore import *
+from send2trash import send2trash
+import cv2
+import numpy as np
+from .dataset import IMG_FORMATS, has_images, label_path
+from .dedup import THRESHOLD, compute_hashes, find_clusters
+from .archive import ARCHIVE_FORMATS, ArchiveSource, is_archive
+from .bulk import bulk_edit, candidates, parse_remap
+from .index import DatasetIndex
+from .journal import Journal, held_paths, hold, unhold
+from .packed import NO_FILE, PackedLabels
+from .image import FrameCache, auto_levels, fit_factor, image_size, load_image, make_lut
+from .prelabel import CACHE_DB, INPUT_SIZE, ProposalCache, prelabel, shown
+from .pyramid import OVERVIEW_FACTOR, TilePyramid, is_huge
+from .spatial import BoxGrid
+from .thumbs import THUMB_SIZE, ThumbCache
+from .trace import tracer
+from .labels import Labels, LabelStore, format_box, parse_line
+from .video import VIDEO_FORMATS, VideoSource, is_video
+from .viewport import Viewport
+
+ROOT = Path(__file__).resolve().parent.parent  # repository root, icons live here
+ICON = str(ROOT / 'icon' / 'logo2.png')
+LOGO = str(ROOT / 'icon' / 'logo1.png')
+ERROR_IMG = str(ROOT / 'icon' / 'error.JPG')
+PREFETCH_AHEAD = 4  # images decoded ahead in direction of travel
+PREFETCH_BEHIND = 1  # images decoded behind
+DECODE_WORKERS = min(4, os.cpu_count() or 1)
+PREVIEW_SEC = 0.1  # while scrubbing, show a superseded image if nothing was shown for this long
+THUMB_PIXMAPS = 4096  # thumbnails kept in memory
+DISPLAY_BUFFERS = 2  # ring of lookup table outputs handed to QImage
+FLUSH_MS = 500  # label edits are written after this long without another edit
+BGR888 = getattr(QImage, 'Format_BGR888', None)  # Qt 5.14+, shows cv2 frames without color conversion
+IDENTITY_LUT = np.arange(256, dtype=np.uint8)
+FULL = (0.0, 0.0, 1.0, 1.0)  # whole image in normalized coordinates
+ZOOM_STEP = 1.25  # zoom per wheel notch
+PYRAMIDS = 4  # tile pyramids of recently shown huge images kept open
+HANDLE = 6  # pixels around selected box edge that resize it
+CLICK_PIXELS = 4  # left press and release closer than this select a box instead of drawing one
+HANDLE_CURSORS = {'l': Qt.SizeHorCursor, 'r': Qt.SizeHorCursor, 't': Qt.SizeVerCursor, 'b': Qt.SizeVerCursor,
+                  'lt': Qt.SizeFDiagCursor, 'rb': Qt.SizeFDiagCursor, 'rt': Qt.SizeBDiagCursor, 'lb': Qt.SizeBDiagCursor,
+                  'move': Qt.SizeAllCursor}
+
+logger = logging.getLogger(__name__)
+
+
+def log(path='./logs', test=False):
+
+    logs = logging.getLogger()
+    logs.setLevel(logging.DEBUG)
+
+    ch = logging.StreamHandler()  # print console
+    logs.addHandler(ch)
+
+    if test:
+        p = Path(path)
+        p.mkdir(exist_ok=True)
+        fh = logging.FileHandler(filename=p / "logfile.log")  # logging file
+        fh.setLevel(logging.WARNING)  # only logging over warning level
+        fh.setFormatter(logging.Formatter("%(levelname)s %(asctime)s - %(message)s"))
+        logs.addHandler(fh)
+
+    return logs
+
+
+class MyApp(QMainWindow):
+
+    def __init__(self):
+        super().__init__()
+
+        self.setWindowTitle('Easy Boxer')
+        self.setWindowIcon(QIcon(ICON))
+        self.setGeometry(100, 100, 1600, 900)
+        self.setFocusPolicy(Qt.NoFocus)
+
+        # connect QWidget
+        self.cent_widget = CentWidget()
+        self.setCentralWidget(self.cent_widget.tabs)
+
+        status = self.statusBar()
+        self.lbl_trace = QLabel()  # stage timings while tracing
+        status.addPermanentWidget(self.lbl_trace)
+        status.addPermanentWidget(self.cent_widget.lbl_prelabel)
+        status.addPermanentWidget(self.cent_widget.lbl_cnt)
+        self.trace_timer = QTimer(self)
+        self.trace_timer.timeout.connect(lambda: self.lbl_trace.setText(tracer.summary()))
+        if tracer.enabled:
+            self.trace_timer.start(500)
+
+        menubar = self.menuBar()
+        menubar.setCornerWidget(QLabel('제작자 : 김찬일   '))
+        menu_main = QMenu("메뉴", self)
+        menubar.addMenu(menu_main)
+        self.action_start = QAction('실행', self)
+        self.action_start.setShortcut('F5')
+        self.action_start.triggered.connect(self.cent_widget.run)
+        self.action_stop = QAction('실행 중지', self)
+        self.action_stop.triggered.connect(self.cent_widget.stop)
+        self.action_video = QAction('동영상 열기', self)
+        self.action_video.triggered.connect(self.cent_widget.video_source)
+        self.action_archive = QAction('압축파일 열기', self)
+        self.action_archive.triggered.connect(self.cent_widget.archive_source)
+        self.action_prelabel = QAction('자동 라벨링', self)
+        self.action_prelabel.triggered.connect(self.cent_widget.prelabel)
+        self.action_prelabel_stop = QAction('자동 라벨링 중지', self)
+        self.action_prelabel_stop.triggered.connect(self.cent_widget.prelabel_stop)
+        menu_main.addAction(self.action_start)
+        menu_main.addAction(self.action_stop)
+        menu_main.addAction(self.action_video)
+        menu_main.addAction(self.action_archive)
+        menu_main.addSeparator()
+        menu_main.addAction(self.action_prelabel)
+        menu_main.addAction(self.action_prelabel_stop)
+        menu_main.aboutToShow.connect(self.signal)
+
+        menu_filter = QMenu("필터", self)
+        menubar.addMenu(menu_filter)
+        for name, slot in [('전체', self.cent_widget.filter_all),
+                           ('라벨 없는 사진만', self.cent_widget.filter_unlabeled),
+                           ('클래스 선택', self.cent_widget.filter_category),
+                           ('박스 개수 초과', self.cent_widget.filter_boxes),
+                           ('작은 박스 포함', self.cent_widget.filter_small),
+                           ('라벨 통계', self.cent_widget.label_stats)]:
+            action = QAction(name, self)
+            action.triggered.connect(slot)
+            menu_filter.addAction(action)
+
+        menu_edit = QMenu("편집", self)
+        menubar.addMenu(menu_edit)
+        action_undo = QAction('실행 취소', self)
+        action_undo.setShortcut('Ctrl+Z')
+        action_undo.triggered.connect(self.cent_widget.undo)
+        action_redo = QAction('다시 실행', self)
+        action_redo.setShortcut('Ctrl+Y')
+        action_redo.triggered.connect(self.cent_widget.redo)
+        action_bulk = QAction('일괄 편집', self)
+        action_bulk.triggered.connect(self.cent_widget.bulk)
+        menu_edit.addAction(action_undo)
+        menu_edit.addAction(action_redo)
+        menu_edit.addSeparator()
+        menu_edit.addAction(action_bulk)
+
+        menu_view = QMenu("보기", self)
+        menubar.addMenu(menu_view)
+        action_gamma = QAction('감마 조절', self)
+        action_gamma.triggered.connect(self.cent_widget.gamma_chg)
+        action_contrast = QAction('대비 조절', self)
+        action_contrast.triggered.connect(self.cent_widget.contrast_chg)
+        self.action_levels = QAction('자동 레벨', self)
+        self.action_levels.setCheckable(True)
+        self.action_levels.toggled.connect(self.cent_widget.levels_chg)
+        action_reset = QAction('보정 초기화', self)
+        action_reset.triggered.connect(self.cent_widget.adjust_reset)
+        action_zoom = QAction('원래 크기', self)
+        action_zoom.setShortcut('Ctrl+0')
+        action_zoom.triggered.connect(self.cent_widget.zoom_reset)
+        menu_view.addAction(action_gamma)
+        menu_view.addAction(action_contrast)
+        menu_view.addAction(self.action_levels)
+        menu_view.addAction(action_reset)
+        menu_view.addAction(action_zoom)
+
+        menu_trace = QMenu("진단", self)
+        menubar.addMenu(menu_trace)
+        action_trace = QAction('성능 측정', self)
+        action_trace.setCheckable(True)
+        action_trace.setChecked(tracer.enabled)
+        action_trace.toggled.connect(self.trace)
+        action_export = QAction('트레이스 저장', self)
+        action_export.triggered.connect(self.trace_export)
+        menu_trace.addAction(action_trace)
+        menu_trace.addAction(action_export)
+
+        self.show()
+
+    def closeEvent(self, e):  # finish running decodes and save labels before quit
+        self.cent_widget.end_session()
+        return super(MyApp, self).closeEvent(e)
+
+    def trace(self, checked):  # switch stage timing on/off
+        tracer.enabled = checked
+        if checked:
+            tracer.clear()
+            self.trace_timer.start(500)
+        else:
+            self.trace_timer.stop()
+            self.lbl_trace.clear()
+
+    def trace_export(self):  # save chrome trace json
+        fname, _ = QFileDialog.getSaveFileName(self, '트레이스 저장', 'easyboxer_trace.json', 'JSON (*.json)')
+        if fname:
+            tracer.export(fname)
+
+    def signal(self):
+        # enable/disable run thread or stop thread
+        if self.cent_widget.loader.isRunning():
+            self.action_start.setEnabled(False)
+            self.action_stop.setEnabled(True)
+            self.action_video.setEnabled(False)
+            self.action_archive.setEnabled(False)
+            self.action_prelabel.setEnabled(self.cent_widget.loader.source is None and not self.cent_widget.prelabeling())
+        else:
+            self.action_start.setEnabled(True)
+            self.action_stop.setEnabled(False)
+            self.action_video.setEnabled(True)
+            self.action_archive.setEnabled(True)
+            self.action_prelabel.setEnabled(False)
+        self.action_prelabel_stop.setEnabled(self.cent_widget.prelabeling())
+
+
+class DrawRectangle(QLabel):
+    coordinate = pyqtSignal(list)
+    resized = pyqtSignal()
+    view_changed = pyqtSignal()  # zoomed or panned
+    picked = pyqtSignal(int)  # row of box clicked on canvas, -1 if none
+    box_edited = pyqtSignal(int, list, str)  # row, new widget corners and handle of dragged box
+
+    def __init__(self):
+        super().__init__()
+        self.begin = QPoint(-1, -1)
+        self.destination = QPoint(-1, -1)
+        self.boxes = np.zeros((0, 4), np.float32)  # stored label boxes, normalized (n, 4)
+        self.grid = None  # BoxGrid of boxes, built on first pointer query
+        self.selected = -1  # row shown in blue, can be dragged
+        self.hover = -1  # row under pointer
+        self.edit = ''  # part of selected box being dragged, see handle
+        self.edit_from = None
+        self.edit_base = None  # widget corners of selected box when drag started
+        self.edit_rect = None  # widget corners while dragging
+        self.proposals = np.zeros((0, 4), np.float32)  # model proposals waiting for accept or reject
+        self.proposal = -1  # proposal picked in list
+        self.viewport = Viewport()  # zoomed part of image shown
+        self.pan_from = None
+        self.setMouseTracking(True)  # hover without button
+
+    def set_boxes(self, boxes):  # repaint stored label boxes only, image untouched
+        boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+        if len(boxes) != len(self.boxes):  # rows shifted, selection is stale
+            self.selected = -1
+        self.boxes = boxes
+        self.grid = None
+        self.hover = -1
+        self.update()
+
+    def set_proposals(self, boxes):
+        self.proposals = np.asarray(boxes, np.float32).reshape(-1, 4)
+        self.proposal = -1
+        self.update()
+
+    def select_proposal(self, row):
+        self.proposal = row
+        self.update()
+
+    def box_grid(self):
+        if self.grid is None:
+            with tracer.span('box_grid'):
+                self.grid = BoxGrid(self.boxes)
+        return self.grid
+
+    def pick(self, pos):  # row of smallest box under widget point, -1 if none
+        x, y = self.viewport.to_point(pos.x(), pos.y(), self.width(), self.height())
+        return self.box_grid().pick(x, y)
+
+    def select(self, row):
+        self.selected = row
+        self.update()
+
+    def selected_rect(self):  # widget corners of selected box
+        return self.viewport.to_widget(self.boxes[self.selected], self.width(), self.height())
+
+    def handle(self, pos):  # part of selected box under point, edges like 'lt', 'move' inside, '' outside
+        if not 0 <= self.selected < len(self.boxes):
+            return ''
+        x1, y1, x2, y2 = self.selected_rect()
+        x, y = pos.x(), pos.y()
+        if not (x1 - HANDLE <= x <= x2 + HANDLE and y1 - HANDLE <= y <= y2 + HANDLE):
+            return ''
+        edges = ('l' if abs(x - x1) <= HANDLE else 'r' if abs(x - x2) <= HANDLE else '') + \
+                ('t' if abs(y - y1) <= HANDLE else 'b' if abs(y - y2) <= HANDLE else '')
+        return edges or 'move'
+
+    def drag(self, pos):  # edit_rect from edit_base moved or resized by pointer, kept inside widget
+        x1, y1, x2, y2 = self.edit_base
+        dx, dy = pos.x() - self.edit_from.x(), pos.y() - self.edit_from.y()
+        w, h = self.width(), self.height()
+        if self.edit == 'move':
+            dx = min(max(dx, -x1), w - x2)
+            dy = min(max(dy, -y1), h - y2)
+            x1, y1, x2, y2 = x1 + dx, y1 + dy, x2 + dx, y2 + dy
+        else:
+            if 'l' in self.edit:
+                x1 = min(max(x1 + dx, 0), w)
+            if 'r' in self.edit:
+                x2 = min(max(x2 + dx, 0), w)
+            if 't' in self.edit:
+                y1 = min(max(y1 + dy, 0), h)
+            if 'b' in self.edit:
+                y2 = min(max(y2 + dy, 0), h)
+        self.edit_rect = [min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)]
+
+    def clear_box(self):
+        self.begin = QPoint(-1, -1)
+        self.destination = QPoint(-1, -1)
+        self.selected = -1
+        self.edit = ''
+        self.update()
+        self.coordinate.emit([0, 0, 0, 0])
+
+    def resizeEvent(self, e):
+        self.resized.emit()
+        self.clear_box()  # if resize then clear box
+        return super(DrawRectangle, self).resizeEvent(e)
+
+    def paintEvent(self, e):
+        painter = QPainter(self)
+        painter.setPen(QPen(Qt.red, 2))  # stored label boxes
+        fx, fy = self.width(), self.height()
+        with tracer.span('overlay'):
+            corners = self.viewport.to_widget_array(self.boxes, fx, fy)
+            corners = corners[(corners[:, 2] >= 0) & (corners[:, 0] <= fx) & (corners[:, 3] >= 0) & (corners[:, 1] <= fy)]
+            painter.drawRects([QRect(QPoint(x1, y1), QPoint(x2, y2)) for x1, y1, x2, y2 in corners.tolist()])
+        for i, (x1, y1, x2, y2) in enumerate(self.viewport.to_widget_array(self.proposals, fx, fy).tolist()):
+            painter.setPen(QPen(Qt.green, 3) if i == self.proposal else QPen(Qt.green, 2, Qt.DashLine))  # proposals
+            painter.drawRect(QRect(QPoint(x1, y1), QPoint(x2, y2)))
+        if 0 <= self.hover < len(self.boxes) and self.hover != self.selected:  # box under pointer
+            painter.setPen(QPen(Qt.yellow, 2))
+            x1, y1, x2, y2 = self.viewport.to_widget(self.boxes[self.hover], fx, fy)
+            painter.drawRect(QRect(QPoint(x1, y1), QPoint(x2, y2)))
+        painter.setPen(QPen(Qt.red, 3))  # user draw box
+        rect = QRect(self.begin, self.destination)
+        painter.drawRect(rect.normalized())
+        if 0 <= self.selected < len(self.boxes):  # label show box
+            painter.setPen(QPen(Qt.blue, 3, Qt.DashLine if self.edit else Qt.SolidLine))
+            x1, y1, x2, y2 = self.edit_rect if self.edit else self.selected_rect()
+            painter.drawRect(QRect(QPoint(x1, y1), QPoint(x2, y2)))
+
+    def wheelEvent(self, e):  # zoom around cursor
+        step = e.angleDelta().y() / 120
+        if step:
+            self.viewport.zoom_at(ZOOM_STEP ** step, e.pos().x() / self.width(), e.pos().y() / self.height())
+            self.begin = QPoint(-1, -1)  # drawn box is in widget pixels
+            self.destination = QPoint(-1, -1)
+            self.coordinate.emit([0, 0, 0, 0])
+            self.update()
+            self.view_changed.emit()
+
+    def mousePressEvent(self, e):
+        if e.button() == Qt.LeftButton:
+            self.edit = self.handle(e.pos())
+            if self.edit:  # drag selected box
+                self.edit_from = e.pos()
+                self.edit_base = self.selected_rect()
+                self.edit_rect = list(self.edit_base)
+                return
+            self.begin = e.pos()
+            self.destination = self.begin
+            self.update()
+        elif e.button() == Qt.RightButton:  # click mouse right button to clear box
+            self.begin = QPoint(-1, -1)
+            self.destination = QPoint(-1, -1)
+            self.selected = -1
+            self.update()
+            self.coordinate.emit([0, 0, 0, 0])
+        elif e.button() == Qt.MiddleButton:  # middle button drag to pan
+            self.pan_from = e.pos()
+            self.clear_box()
+
+    def mouseMoveEvent(self, e):  # user draw box
+        if e.buttons() == Qt.MiddleButton and self.pan_from is not None:
+            d = e.pos() - self.pan_from
+            self.pan_from = e.pos()
+            self.viewport.pan(-d.x() / self.width(), -d.y() / self.height())
+            self.view_changed.emit()
+        elif e.buttons() == Qt.LeftButton and self.edit:
+            self.drag(e.pos())
+            self.update()
+        elif e.buttons() == Qt.LeftButton:
+            if (e.pos().x() < self.width()) & (e.pos().x() >= 0):
+                x = e.pos().x()
+            elif e.pos().x() >= self.width():
+                x = self.width() - 1
+            elif e.pos().x() < 0:
+                x = 0
+            if (e.pos().y() < self.height()) & (e.pos().y() >= 0):
+                y = e.pos().y()
+            elif e.pos().y() >= self.height():
+                y = self.height() - 1
+            elif e.pos().y() < 0:
+                y = 0
+            self.destination = QPoint(x, y)
+            self.update()
+        elif e.buttons() == Qt.NoButton:  # hover
+            self.setCursor(HANDLE_CURSORS.get(self.handle(e.pos()), Qt.ArrowCursor))
+            row = self.pick(e.pos())
+            if row != self.hover:
+                self.hover = row
+                self.update()
+
+    def leaveEvent(self, e):
+        if self.hover >= 0:
+            self.hover = -1
+            self.update()
+
+    def mouseReleaseEvent(self, e):  # fix box
+        if e.button() == Qt.LeftButton and self.edit:
+            rect, edit, moved = self.edit_rect, self.edit, e.pos() != self.edit_from
+            self.edit = ''
+            self.update()
+            if moved:
+                self.box_edited.emit(self.selected, rect, edit)
+        elif e.button() == Qt.LeftButton and (e.pos() - self.begin).manhattanLength() < CLICK_PIXELS:  # click selects
+            self.begin = QPoint(-1, -1)
+            self.destination = QPoint(-1, -1)
+            self.coordinate.emit([0, 0, 0, 0])
+            self.select(self.pick(e.pos()))
+            self.picked.emit(self.selected)
+        elif e.button() == Qt.LeftButton:
+            coord_list = [self.begin.x(), self.begin.y()]
+            if (e.pos().x() < self.width()) & (e.pos().x() >= 0):
+                x = e.pos().x()
+                coord_list.append(x)
+            elif e.pos().x() >= self.width():
+                x = self.width() - 1
+                coord_list.append(x + 1)
+            elif e.pos().x() < 0:
+                x = 0
+                coord_list.append(x)
+            if (e.pos().y() < self.height()) & (e.pos().y() >= 0):
+                y = e.pos().y()
+                coord_list.append(y)
+            elif e.pos().y() >= self.height():
+                y = self.height() - 1
+                coord_list.append(y + 1)
+            elif e.pos().y() < 0:
+                y = 0
+                coord_list.append(y)
+            self.destination = QPoint(x, y)
+            self.update()
+            self.coordinate.emit(coord_list)
+
+
+class ShowLoader(QObject):  # decodes requested image on worker pool, only latest request is displayed
+    send_img = pyqtSignal(np.ndarray, tuple)  # frame and part of image it covers
+    send_title = pyqtSignal(str)
+    send_code = pyqtSignal(object)  # Labels
+    send_cnt = pyqtSignal(str)
+    loaded = pyqtSignal(int, object)  # worker -> main thread
+    built = pyqtSignal(str)  # pyramid of path finished
+
+    def __init__(self):
+        super(ShowLoader, self).__init__()
+        self.cnt = 0
+        self.nf = 0
+        self.running = False
+        self.img_source = ''
+        self.lbl_source = ''
+        self.img_path = ''
+        self.shown_row = 0  # image row on screen, behind cnt while a newer request is decoding
+        self.images = []
+        self.source = None  # VideoSource or ArchiveSource, images are then its virtual paths
+        self.queue = []  # positions of images to visit, filtered by CentWidget
+        self.removed = set()  # positions of images held in trash, never visited until restored
+        self.qpos = 0  # position in queue
+        self.direction = 1  # direction of travel for prefetch
+        self.view = (0, 0)  # display size, set by CentWidget
+        self.viewport = FULL  # visible part of image, set by CentWidget
+        self.factor = 1  # decode scale of current image
+        self.size = None  # (width, height) of current image
+        self.region = FULL  # part of current image covered by frame
+        self.level = -1  # pyramid level of current frame, -1 if not from pyramid
+        self.pyramids = OrderedDict()  # path -> TilePyramid of huge images
+        self.lock = threading.Lock()  # pyramids are opened from workers
+        self.builder = None  # builds pyramids one at a time, not cancelled by navigation
+        self.cache = FrameCache()
+        self.store = LabelStore()  # parsed labels, shared with CentWidget for editing
+        self.packed = None  # PackedLabels of running folder, labels of unvisited images without reading files
+        self.pool = None
+        self.futures = []  # jobs of latest request, cancelled when superseded
+        self.loading = set()  # load jobs not finished yet, superseded ones too, they may still read packed labels
+        self.generation = 0  # request counter, results of older requests are stale
+        self.shown_gen = 0  # generation of last displayed result
+        self.shown_at = 0.0
+        self.loaded.connect(self.deliver)
+        self.built.connect(self.pyramid_built)
+
+    def isRunning(self):
+        return self.running
+
+    def start(self):
+        self.nf = len(self.images)  # set by CentWidget from dataset index
+        if not self.queue:
+            self.queue = list(range(self.nf))
+        self.pool = ThreadPoolExecutor(DECODE_WORKERS, thread_name_prefix='decode')  # cv2 releases the GIL
+        self.builder = ThreadPoolExecutor(1, thread_name_prefix='pyramid')
+        self.running = True
+        self.request()
+
+    def stop(self):  # drop pending jobs and wait for running decodes, no terminate
+        if self.pool is not None:
+            self.running = False
+            self.generation += 1
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+            self.futures = []
+            for pyramid in self.pyramids.values():  # unfinished builds resume on next visit
+                pyramid.cancelled = True
+            self.builder.shutdown(wait=True, cancel_futures=True)
+            self.builder = None
+
+    def next(self):
+        if self.qpos < len(self.queue) - 1:
+            self.qpos += 1
+            self.cnt = self.queue[self.qpos]
+        self.direction = 1
+        self.request()
+
+    def prev(self):
+        if self.qpos > 0:
+            self.qpos -= 1
+            self.cnt = self.queue[self.qpos]
+        self.direction = -1
+        self.request()
+
+    def set_queue(self, queue):  # visit only queue, stay on current image or the next one after it
+        self.queue = queue
+        self.qpos = min(bisect.bisect_left(queue, self.cnt), len(queue) - 1)
+        self.cnt = queue[self.qpos]
+        self.request()
+
+    def remove(self, rows):  # images held in trash, queue moves on to the next one
+        self.removed.update(rows)
+        queue = [i for i in self.queue if i not in self.removed]
+        if queue:
+            self.set_queue(queue)
+
+    def restore(self, rows):  # trash undone, images visited again, no request
+        self.removed.difference_update(rows)
+        self.queue = sorted(set(self.queue) | set(rows))
+        self.qpos = min(bisect.bisect_left(self.queue, self.cnt), len(self.queue) - 1)
+
+    def refresh(self):
+        self.request()
+
+    def move(self, num):  # num is position in queue
+        self.direction = 1 if num >= self.qpos else -1
+        self.qpos = num
+        self.cnt = self.queue[num]
+        self.request()
+
+    def reset_val(self):
+        self.cnt = 0
+        self.nf = 0
+        self.img_path = ''
+        self.shown_row = 0
+        self.images = []
+        self.queue = []
+        self.removed = set()
+        self.qpos = 0
+        self.direction = 1
+        self.size = None
+        self.region = FULL
+        self.level = -1
+        self.pyramids.clear()
+        if self.source is not None:
+            self.source.close()
+            self.source = None
+        self.cache.clear()
+
+    def neighbors(self):  # paths to prefetch along queue, direction of travel first
+        ahead = [self.qpos + self.direction * i for i in range(1, PREFETCH_AHEAD + 1)]
+        behind = [self.qpos - self.direction * i for i in range(1, PREFETCH_BEHIND + 1)]
+        return [self.images[self.queue[i]] for i in ahead + behind if 0 <= i < len(self.queue)]
+
+    def request(self):  # supersede previous request, display job first then prefetch
+        if not self.running:
+            return
+        self.generation += 1
+        for future in self.futures:
+            if future.cancel():
+                tracer.count('cancel')
+        self.send_cnt.emit(f'{self.qpos + 1}/{len(self.queue)}')
+        self.futures = [self.pool.submit(self.load, self.generation, self.qpos, self.cnt, self.images[self.cnt],
+                                         self.view, self.viewport)]
+        self.loading.add(self.futures[0])
+        self.futures[0].add_done_callback(self.loading.discard)
+        self.futures += [self.pool.submit(self.prefetch, self.generation, path, self.view) for path in self.neighbors()]
+
+    def load(self, generation, qpos, row, path, view, viewport):  # worker, error image shown if anything fails
+        if generation != self.generation:
+            return
+        try:
+            result = self.decode(qpos, row, path, view, viewport)
+        except Exception as e:  # broken source, label file or cache, request must still be answered
+            logger.warning(f'load failed {path}', exc_info=e)
+            result = (qpos, row, path, None, 1, -1, load_image(ERROR_IMG), FULL, Labels())
+        self.loaded.emit(generation, result)
+
+    def decode(self, qpos, row, path, view, viewport):  # worker, displayed image and labels
+        x0, y0, x1, y1 = viewport
+        zoomed = (view[0] / (x1 - x0), view[1] / (y1 - y0))  # zoomed in needs finer decode
+        size = image_size(path) if self.source is None else None
+        factor, region, level = 1, FULL, -1
+        if self.source is not None:  # video frame or archive member
+            img, size, factor = self.source.load(path, zoomed)
+        elif is_huge(size):
+            img, region, level = self.load_huge(path, size, view, viewport)
+        else:
+            factor = fit_factor(size, zoomed)
+            img = self.cache.find(path, factor)
+            tracer.count('hit' if img is not None else 'miss')
+            if img is None:
+                img = load_image(path, factor)
+                if img is not None:
+                    self.cache.put((path, factor), img)
+        if img is None:
+            img, region, level = load_image(ERROR_IMG), FULL, -1
+        elif self.source is None:
+            logger.info(datetime.fromtimestamp(os.path.getmtime(path)).strftime('%Y-%m-%d %H:%M:%S'))
+        with tracer.span('label_read'):
+            packed = self.packed
+            code = self.store.get(label_path(self.lbl_source, path),
+                                  None if packed is None else lambda mtime: packed.labels(row, mtime))
+        return qpos, row, path, size, factor, level, img, region, code
+
+    def load_huge(self, path, size, view, viewport):  # worker, visible tiles, overview until pyramid is built
+        with tracer.span('tiles'):
+            result = self.pyramid(path, size).render(viewport, view)
+        if result is not None:
+            return result
+        img = self.cache.find(path, OVERVIEW_FACTOR)
+        if img is None:
+            img = load_image(path, OVERVIEW_FACTOR)
+            if img is not None:
+                self.cache.put((path, OVERVIEW_FACTOR), img)
+        return img, FULL, -1
+
+    def pyramid(self, path, size):  # open pyramid of huge image, building it in background if needed
+        with self.lock:
+            pyramid = self.pyramids.get(path)
+            if pyramid is not None:
+                self.pyramids.move_to_end(path)
+                return pyramid
+            pyramid = self.pyramids[path] = TilePyramid(path, size, self.cache)
+            if not pyramid.built:
+                self.builder.submit(self.build, pyramid)
+            while len(self.pyramids) > PYRAMIDS:
+                _, old = self.pyramids.popitem(last=False)
+                old.cancelled = True
+            return pyramid
+
+    def build(self, pyramid):  # builder thread
+        try:
+            if pyramid.build():
+                self.built.emit(pyramid.path)
+        except Exception as e:  # overview stays shown, future would hide the error
+            logger.warning(f'pyramid build failed {pyramid.path}', exc_info=e)
+
+    def pyramid_built(self, path):  # main thread, replace overview by tiles
+        if self.running and str(self.img_path) == path:
+            self.refresh()
+
+    def needs_reload(self):  # shown frame too coarse or too small for current viewport
+        if self.size is None or not self.running:
+            return False
+        x0, y0, x1, y1 = self.viewport
+        if not is_huge(self.size):
+            return fit_factor(self.size, (self.view[0] / (x1 - x0), self.view[1] / (y1 - y0))) < self.factor
+        pyramid = self.pyramids.get(str(self.img_path))
+        if pyramid is None:
+            return False
+        level = pyramid.level_for(self.viewport, self.view)
+        if not pyramid.built and level > 0:  # overview until built
+            return False
+        rx0, ry0, rx1, ry1 = self.region
+        inside = rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1
+        return not inside or level != self.level
+
+    def prefetch(self, generation, path, view):  # worker, decode neighbor while user works on current one
+        if generation != self.generation:
+            return
+        if self.source is not None:
+            self.source.load(path, view, prefetch=True)
+            return
+        size = image_size(path)
+        if is_huge(size):  # tiles are loaded when shown
+            return
+        factor = fit_factor(size, view)
+        if self.cache.find(path, factor) is None:
+            tracer.count('prefetch')
+            img = load_image(path, factor)
+            if img is not None:
+                self.cache.put((path, factor), img)
+
+    def deliver(self, generation, result):  # main thread
+        now = time.perf_counter()
+        if generation != self.generation:  # superseded, still shown while scrubbing if nothing was for a while
+            if not self.running or generation < self.shown_gen or now - self.shown_at < PREVIEW_SEC:
+                tracer.count('stale')
+                return
+        qpos, row, path, size, factor, level, img, region, code = result
+        self.shown_gen = generation
+        self.shown_at = now
+        self.img_path = Path(path)
+        self.shown_row = row  # edits and erase go to the image on screen, preview included
+        if generation == self.generation:
+            self.size, self.factor, self.level, self.region = size, factor, level, region
+        self.send_title.emit(self.img_path.name)
+        self.send_cnt.emit(f'{qpos + 1}/{len(self.queue)}')
+        self.send_code.emit(code)  # boxes drawn by overlay
+        self.send_img.emit(img, region)  # resized once to display size in show_image
+
+
+class LabelModel(QAbstractListModel):  # lines of shown label file, view asks only for visible rows
+
+    def __init__(self):
+        super().__init__()
+        self.labels = None
+
+    def set_labels(self, labels):  # labels edited in place are set again
+        self.beginResetModel()
+        self.labels = labels
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.labels is None else len(self.labels)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole:
+            return self.labels.lines[index.row()]
+        return None
+
+
+class ThumbTask(QRunnable):  # load or generate one thumbnail in thread pool
+
+    def __init__(self, model, generation, row, file):
+        super(ThumbTask, self).__init__()
+        self.model = model
+        self.generation = generation
+        self.row = row
+        self.file = file
+
+    def run(self):
+        path = self.model.cache.get(*self.file[:3])
+        self.model.loaded.emit(self.generation, self.row, QImage(path if path else ERROR_IMG))
+
+
+class ThumbModel(QAbstractListModel):  # dataset thumbnails, only rows the view asks for are loaded
+    loaded = pyqtSignal(int, int, QImage)
+
+    def __init__(self):
+        super().__init__()
+        self.files = []  # (path, size, mtime_ns, n_boxes) from dataset index
+        self.pixmaps = OrderedDict()  # row -> QPixmap, least recently loaded dropped first
+        self.pending = set()
+        self.generation = 0  # drop results of previous folder
+        self.serial = 0  # newest request runs first
+        self.cache = ThumbCache()
+        self.pool = QThreadPool()
+        self.blank = QPixmap(THUMB_SIZE, THUMB_SIZE)
+        self.blank.fill(QColor('#EEEEEE'))
+        self.loaded.connect(self.store)
+
+    def set_files(self, files):
+        self.beginResetModel()
+        self.pool.clear()
+        self.generation += 1
+        self.files = files
+        self.pixmaps.clear()
+        self.pending.clear()
+        self.endResetModel()
+
+    def set_count(self, row, n):  # box count of row changed
+        if row < len(self.files):
+            self.files[row] = self.files[row][:3] + (n,)
+            idx = self.index(row)
+            self.dataChanged.emit(idx, idx, [Qt.UserRole])
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.files)
+
+    def data(self, index, role=Qt.DisplayRole):
+        row = index.row()
+        if role == Qt.DisplayRole:
+            return Path(self.files[row][0]).name
+        if role == Qt.DecorationRole:
+            pixmap = self.pixmaps.get(row)
+            if pixmap is None:
+                self.request(row)
+                return self.blank
+            return pixmap
+        if role == Qt.UserRole:  # box count
+            return self.files[row][3]
+        return None
+
+    def request(self, row):
+        if row not in self.pending:
+            self.pending.add(row)
+            self.serial += 1
+            self.pool.start(ThumbTask(self, self.generation, row, self.files[row]), self.serial)
+
+    def store(self, generation, row, img):  # thumbnail loaded in pool
+        if generation != self.generation:
+            return
+        self.pending.discard(row)
+        self.pixmaps[row] = QPixmap.fromImage(img)
+        if len(self.pixmaps) > THUMB_PIXMAPS:
+            self.pixmaps.popitem(last=False)
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [Qt.DecorationRole])
+
+
+class ThumbDelegate(QStyledItemDelegate):  # box count drawn over thumbnail
+
+    def paint(self, painter, option, index):
+        super(ThumbDelegate, self).paint(painter, option, index)
+        n = index.data(Qt.UserRole)
+        rect = QRect(option.rect.left() + 4, option.rect.top() + 4, 32, 18)
+        painter.save()
+        painter.fillRect(rect, QColor(0, 0, 0, 160) if n else QColor(200, 0, 0, 160))  # red : no box
+        painter.setPen(Qt.white)
+        painter.drawText(rect, Qt.AlignCenter, str(n))
+        painter.restore()
+
+
+class CentWidget(QWidget):
+    prelabeled = pyqtSignal(int, int, list)  # done, total and image paths just finished
+    prelabel_failed = pyqtSignal(str)
+    hashed = pyqtSignal(int, int)  # images hashed, images to hash
+    deduped = pyqtSignal(str, object)  # image folder and clusters of near duplicate rows keeper first, None if stopped
+    dedup_failed = pyqtSignal(str)
+    bulk_progress = pyqtSignal(int, int)  # label files done, files to check
+    bulk_done = pyqtSignal(dict, dict)  # summary and operations, dry run or not
+    packed_built = pyqtSignal(str, object)  # image folder and its PackedLabels, opened off the UI thread
+
+    def __init__(self):
+        super().__init__()
+        self.setWindowIcon(QIcon(ICON))
+        self.status = False
+        self.bbox = ''  # user draw box coordinate
+        self.box = None  # same as (x, y, w, h)
+        self.labels = None  # Labels of current image
+        self.edited = {}  # label path -> image name, edited since last flush
+        self.journal = None  # edit journal of running label folder
+        self.category = {0: 'sample'}
+        self.brightness = 0
+        self.contrast = 1.0
+        self.gamma = 1.0
+        self.auto_levels = False
+        self.lut = make_lut()
+        self.lut_identity = True  # nothing to adjust, display is shown as is
+        self.frame = None  # last decoded frame, redisplayed on resize
+        self.region = FULL  # part of image covered by frame
+        self.scaled = None  # reused resize output
+        self.display = None  # frame at label size (scaled or frame itself), brightness etc. applied on this
+        self.ring = [None] * DISPLAY_BUFFERS  # lookup table outputs, reused
+        self.ring_pos = 0
+        self.qimage = None  # (QImage, buffer it points to), keeps buffer alive while image exists
+        self.levels = None  # auto levels of display
+        self.index = None  # dataset index of running folder
+        self.packed = None  # PackedLabels of running folder, serves viewer, filters and statistics
+        self.packed_edits = {}  # name -> (Labels, mtime_ns) written while packed labels were opening
+        self.stride = 1  # label every stride-th frame of video
+        self.proposal_cache = None  # ProposalCache read by viewer, prelabel thread opens its own
+        self.proposal_model = None  # key of model whose proposals are shown
+        self.proposals = []  # [(index, category, box, score)] shown for current image
+        self.prelabel_cancel = threading.Event()
+        self.prelabel_job = None
+        self.prelabel_pool = ThreadPoolExecutor(1)  # drives worker processes off the UI thread
+        self.prelabeled.connect(self.prelabel_progress)
+        self.prelabel_failed.connect(self.prelabel_error)
+        self.dedup_cancel = threading.Event()
+        self.dedup_job = None
+        self.dedup_pool = ThreadPoolExecutor(1)  # hashing processes and clustering off the UI thread
+        self.hashed.connect(self.dedup_progress)
+        self.deduped.connect(self.show_clusters)
+        self.dedup_failed.connect(self.dedup_error)
+        self.bulk_pool = ThreadPoolExecutor(1)  # label rewrite processes off the UI thread
+        self.bulk_dialog = None  # modal progress while label files are checked or rewritten
+        self.bulk_progress.connect(self.bulk_step)
+        self.bulk_done.connect(self.bulk_finished)
+        self.packed_pool = ThreadPoolExecutor(1)  # packed label build off the UI thread
+        self.packed_job = None
+        self.packed_built.connect(self.packed_ready)
+
+        self.loader = ShowLoader()
+        self.loader.send_img.connect(self.frame_ready)
+        self.loader.send_title.connect(self.title)
+        self.loader.send_code.connect(self.code)
+        self.store = self.loader.store
+        self.flush_timer = QTimer(self)  # rapid edits are written once
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_MS)
+        self.flush_timer.timeout.connect(self.flush)
+        self.loader.send_cnt.connect(self.cnt)
+
+        # font
+        font = QFont()
+        font.setBold(True)
+        font.setPointSize(10)
+
+        big_font = QFont()
+        big_font.setPointSize(15)
+        big_font.setBold(True)
+
+        # color
+        color = 'D6F49A'
+
+        # image directory
+        self.btn_img = QPushButton('ImageDir', self)
+        self.btn_img.setFont(font)
+        self.btn_img.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.btn_img.setStatusTip('사진파일 폴더 선택')
+        self.btn_img.setToolTip('사진파일 폴더 선택')
+        self.btn_img.setStyleSheet(f'background-color: #{color}')
+        self.btn_img.clicked.connect(self.img_source)
+
+        # label directory
+        self.btn_txt = QPushButton('TextDir', self)
+        self.btn_txt.setFont(font)
+        self.btn_txt.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.btn_txt.setStatusTip('라벨파일 폴더 선택')
+        self.btn_txt.setToolTip('라벨파일 폴더 선택')
+        self.btn_txt.setStyleSheet(f'background-color: #{color}')
+        self.btn_txt.clicked.connect(self.txt_source)
+
+        # start button
+        self.btn_start = QPushButton('START!', self)
+        self.btn_start.setFont(font)
+        self.btn_start.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.btn_start.setStatusTip('검수 시작')
+        self.btn_start.setToolTip('검수 시작')
+        self.btn_start.setStyleSheet(f'background-color: #{color}')
+        self.btn_start.clicked.connect(self.run)
+
+        # next button
+        btn_next = QPushButton('Next', self)
+        btn_next.setFont(font)
+        btn_next.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        btn_next.setStatusTip('다음 파일로 이동')
+        btn_next.setToolTip('다음 파일로 이동')
+        btn_next.setStyleSheet(f'background-color: #{color}')
+        btn_next.clicked.connect(self.next)
+
+        # prev button
+        btn_prev = QPushButton('Prev', self)
+        btn_prev.setFont(font)
+        btn_prev.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        btn_prev.setStatusTip('이전 파일로 이동')
+        btn_prev.setToolTip('이전 파일로 이동')
+        btn_prev.setStyleSheet(f'background-color: #{color}')
+        btn_prev.clicked.connect(self.prev)
+
+        # add coordinate to txt file
+        btn_commit = QPushButton('Add Coordinate', self)
+        btn_commit.setFont(font)
+        btn_commit.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        btn_commit.setStatusTip('좌표를 저장합니다.')
+        btn_commit.setToolTip('좌표를 저장합니다.')
+        btn_commit.setStyleSheet(f'background-color: #{color}')
+        btn_commit.clicked.connect(self.commit)
+
+        # brighten image
+        btn_up = QPushButton('brightness', self)
+        btn_up.setFont(font)
+        btn_up.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        btn_up.setStatusTip('밝기가 증가합니다.')
+        btn_up.setToolTip('밝기가 증가합니다.')
+        btn_up.setStyleSheet(f'background-color: #{color}')
+        btn_up.clicked.connect(self.bright_up)
+
+        # dim image
+        btn_down = QPushButton('darkness', self)
+        btn_down.setFont(font)
+        btn_down.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        btn_down.setStatusTip('밝기가 감소합니다.')
+        btn_down.setToolTip('밝기가 감소합니다.')
+        btn_down.setStyleSheet(f'background-color: #{color}')
+        btn_down.clicked.connect(self.bright_down)
+
+        # edit category
+        self.btn_category = QPushButton('Edit Category', self)
+        self.btn_category.setFont(font)
+        self.btn_category.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.btn_category.setStatusTip('카테고리 변경하기.')
+        self.btn_category.setToolTip('카테고리 변경하기')
+        self.btn_category.setStyleSheet(f'background-color: #{color}')
+        self.btn_category.clicked.connect(self.edit_category)
+
+        # remove image & label file
+        btn_rm = QPushButton('사진 제거', self)
+        btn_rm.setFont(font)
+        btn_rm.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        btn_rm.setStatusTip('해당사진과 라벨파일 모두 제거합니다.')
+        btn_rm.setToolTip('해당사진과 라벨파일 모두 제거합니다.')
+        btn_rm.setStyleSheet(f'background-color: #{color}')
+        btn_rm.clicked.connect(self.erase_file)
+
+        # image directory
+        self.lbl_img = QLabel(self)
+        self.lbl_img.setFont(font)
+        self.lbl_img.setStyleSheet('background-color: #FFFFFF')
+        self.lbl_img.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        # label directory
+        self.lbl_txt = QLabel(self)
+        self.lbl_txt.setFont(font)
+        self.lbl_txt.setStyleSheet('background-color: #FFFFFF')
+        self.lbl_txt.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+
+        # brightness
+        self.lbl_bright = QLabel('현재밝기 : 0')
+        self.lbl_bright.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.lbl_bright.setStatusTip('더블클릭시 밝기를 조절합니다.')
+        self.lbl_bright.setToolTip('더블클릭시 밝기를 조절합니다.')
+        self.lbl_bright.setAlignment(Qt.AlignCenter)
+        self.lbl_bright.mouseDoubleClickEvent = self.bright_chg
+
+        # show image
+        self.img = QLabel()
+        self.img.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        self.img.setScaledContents(True)
+        self.img.setPixmap(QPixmap(LOGO))
+
+        # image title
+        self.lbl_title = QLabel()
+        self.lbl_title.setFont(big_font)
+        self.lbl_title.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.lbl_title.setStyleSheet('background-color: #FFFFFF')
+
+        # user draw box coordinate
+        self.lbl_bbox = QLabel()
+        self.lbl_bbox.setFont(big_font)
+        self.lbl_bbox.setStyleSheet('background-color: #FFFFFF')
+
+        # file index : Status bar / progress
+        self.lbl_cnt = QLabel()
+        self.lbl_cnt.setStatusTip('더블클릭시 파일을 이동합니다.')
+        self.lbl_cnt.setToolTip('더블클릭시 파일을 이동합니다.')
+        self.lbl_cnt.setFixedWidth(80)
+        self.lbl_cnt.mouseDoubleClickEvent = self.change
+
+        # show txt file
+        self.label_model = LabelModel()
+        self.list_code = QListView()
+        self.list_code.setFont(big_font)
+        self.list_code.setUniformItemSizes(True)  # rows are not measured one by one
+        self.list_code.setModel(self.label_model)
+        self.list_code.setStatusTip('클릭 : 사진에 표시, 더블클릭 : 제거')
+        self.list_code.setToolTip('클릭 : 사진에 표시\n더블클릭 : 제거')
+        self.list_code.clicked.connect(self.blue_square)
+        self.list_code.doubleClicked.connect(self.erase_lbl)
+
+        # model proposals
+        self.list_proposal = QListWidget()
+        self.list_proposal.setFont(font)
+        self.list_proposal.setStatusTip('클릭 : 사진에 표시, 더블클릭 : 수락')
+        self.list_proposal.setToolTip('자동 라벨링 제안\n클릭 : 사진에 표시\n더블클릭 : 수락')
+        self.list_proposal.currentRowChanged.connect(lambda row: self.lbl_rect.select_proposal(row))
+        self.list_proposal.itemDoubleClicked.connect(self.accept_proposal)
+        btn_accept = QPushButton('수락', self)
+        btn_accept.setFont(font)
+        btn_accept.setStatusTip('선택한 제안을 라벨에 추가합니다.')
+        btn_accept.setStyleSheet(f'background-color: #{color}')
+        btn_accept.clicked.connect(self.accept_proposal)
+        btn_reject = QPushButton('거절', self)
+        btn_reject.setFont(font)
+        btn_reject.setStatusTip('선택한 제안을 숨깁니다.')
+        btn_reject.setStyleSheet(f'background-color: #{color}')
+        btn_reject.clicked.connect(self.reject_proposal)
+        btn_accept_all = QPushButton('모두 수락', self)
+        btn_accept_all.setFont(font)
+        btn_accept_all.setStatusTip('보이는 제안을 모두 라벨에 추가합니다.')
+        btn_accept_all.setStyleSheet(f'background-color: #{color}')
+        btn_accept_all.clicked.connect(self.accept_all)
+        self.lbl_prelabel = QLabel()  # prelabel progress, status bar
+
+        # image bbox palette
+        self.lbl_rect = DrawRectangle()
+        self.lbl_rect.setAttribute(Qt.WA_TranslucentBackground, True)
+        self.lbl_rect.setStatusTip('좌클릭&드래그 : 사진에 표시, 우클릭 : 초기화, 휠 : 확대/축소, 휠 드래그 : 이동')
+        self.lbl_rect.setToolTip('좌클릭&드래그 : 사진에 표시\n우클릭 : 초기화\n휠 : 확대/축소\n휠 드래그 : 이동')
+        self.lbl_rect.coordinate.connect(self.coordinate)
+        self.lbl_rect.resized.connect(self.resize_view)
+        self.lbl_rect.view_changed.connect(self.view_changed)
+        self.lbl_rect.picked.connect(self.box_picked)
+        self.lbl_rect.box_edited.connect(self.move_box)
+        self.viewport = self.lbl_rect.viewport
+
+        # current category
+        self.lbl_category = QLabel('sample')
+        self.lbl_category.setStyleSheet('background-color: #FFFFFF')
+        self.lbl_category.setFont(big_font)
+        self.lbl_category.setAlignment(Qt.AlignCenter)
+
+        # spinbox category
+        self.select_category = QSpinBox()
+        self.select_category.setMinimum(0)
+        self.select_category.setMaximum(len(self.category) - 1)
+        self.select_category.valueChanged.connect(self.show_category)
+
+        # layout
+        layout = QGridLayout()
+        layout.addWidget(self.btn_img, 0, 0, 5, 5)  # 사진경로 지정버튼
+        layout.addWidget(self.lbl_img, 0, 5, 5, 60)  # 사진경로 출력라벨
+        layout.addWidget(self.btn_txt, 5, 0, 5, 5)  # 라벨경로 지정버튼
+        layout.addWidget(self.lbl_txt, 5, 5, 5, 60)  # 라벨경로 출력라벨
+        layout.addWidget(self.btn_start, 0, 60, 10, 20)  # 시작 버튼
+        layout.addWidget(btn_rm, 10, 60, 10, 20)  # 파일 제거
+        layout.addWidget(self.lbl_title, 10, 0, 10, 60)  # 사진 제목
+        layout.addWidget(self.img, 20, 0, 80, 80)  # 사진
+        layout.addWidget(self.lbl_rect, 20, 0, 80, 80)  # 직사각형그리기
+        layout.addWidget(self.lbl_bright, 80, 80, 10, 6)
+        layout.addWidget(btn_up, 80, 93, 10, 7)  # 밝기 증가
+        layout.addWidget(btn_down, 80, 86, 10, 7)  # 밝기 감소
+        layout.addWidget(btn_next, 90, 90, 10, 10)  # 다음 버튼
+        layout.addWidget(btn_prev, 90, 80, 10, 10)  # 이전 버튼
+        layout.addWidget(btn_commit, 20, 80, 10, 20)  # 커밋 버튼
+        layout.addWidget(self.lbl_bbox, 0, 80, 15, 20)  # 직접그린 bbox
+        layout.addWidget(self.btn_category, 15, 80, 5, 6)  # 카테고리 버튼
+        layout.addWidget(self.lbl_category, 15, 86, 5, 8)  # 카테고리 라벨
+        layout.addWidget(self.select_category, 15, 94, 5, 6)  # 카테고리 스핀박스
+        layout.addWidget(self.list_code, 30, 80, 35, 20)  # txt bbox
+        layout.addWidget(self.list_proposal, 65, 80, 11, 20)  # 자동 라벨링 제안
+        layout.addWidget(btn_accept, 76, 80, 4, 7)  # 제안 수락
+        layout.addWidget(btn_reject, 76, 87, 4, 7)  # 제안 거절
+        layout.addWidget(btn_accept_all, 76, 94, 4, 6)  # 제안 모두 수락
+
+        main = QWidget()
+        main.setLayout(layout)
+
+        # tabs
+        self.tabs = QTabWidget(self)
+        self.tabs.setFocusPolicy(Qt.NoFocus)
+        self.tabs.addTab(main, 'Main')
+
+        # thumbnails
+        self.thumb_model = ThumbModel()
+        self.thumbs = QListView()
+        self.thumbs.setViewMode(QListView.IconMode)
+        self.thumbs.setResizeMode(QListView.Adjust)
+        self.thumbs.setMovement(QListView.Static)
+        self.thumbs.setUniformItemSizes(True)
+        self.thumbs.setLayoutMode(QListView.Batched)
+        self.thumbs.setIconSize(QSize(THUMB_SIZE, THUMB_SIZE))
+        self.thumbs.setGridSize(QSize(THUMB_SIZE + 24, THUMB_SIZE + 36))
+        self.thumbs.setModel(self.thumb_model)
+        self.thumbs.setItemDelegate(ThumbDelegate(self.thumbs))
+        self.thumbs.setStatusTip('더블클릭 : 해당 사진으로 이동')
+        self.thumbs.activated.connect(self.thumb_move)
+        self.tabs.addTab(self.thumbs, 'Thumbnails')
+
+        # near duplicates
+        btn_dedup = QPushButton('중복 찾기')
+        btn_dedup.setStatusTip('사진마다 해시를 계산해 거의 같은 사진끼리 묶습니다. 계산한 해시는 다음 실행에 재사용됩니다.')
+        btn_dedup.clicked.connect(self.dedup)
+        self.dup_threshold = QSpinBox()
+        self.dup_threshold.setRange(0, 16)
+        self.dup_threshold.setValue(THRESHOLD)
+        self.dup_threshold.setPrefix('허용 차이 ')
+        self.dup_threshold.setStatusTip('해시가 이 비트 수까지 달라도 같은 사진으로 봅니다. 클수록 많이 묶입니다.')
+        btn_trash = QPushButton('선택 묶음 휴지통')
+        btn_trash.setStatusTip('선택한 묶음에서 유지할 사진만 남기고 휴지통으로 보냅니다.')
+        btn_trash.clicked.connect(self.trash_cluster)
+        btn_trash_all = QPushButton('모든 묶음 휴지통')
+        btn_trash_all.setStatusTip('모든 묶음에서 유지할 사진만 남기고 휴지통으로 보냅니다.')
+        btn_trash_all.clicked.connect(self.trash_all_clusters)
+        self.lbl_dedup = QLabel()
+        self.dup_tree = QTreeWidget()
+        self.dup_tree.setHeaderLabels(['사진', '박스'])
+        self.dup_tree.setStatusTip('더블클릭 : 해당 사진으로 이동, 박스가 가장 많은 사진을 유지합니다.')
+        self.dup_tree.itemDoubleClicked.connect(self.dup_move)
+        dup_layout = QGridLayout()
+        dup_layout.addWidget(btn_dedup, 0, 0)
+        dup_layout.addWidget(self.dup_threshold, 0, 1)
+        dup_layout.addWidget(btn_trash, 0, 2)
+        dup_layout.addWidget(btn_trash_all, 0, 3)
+        dup_layout.addWidget(self.lbl_dedup, 0, 4)
+        dup_layout.addWidget(self.dup_tree, 1, 0, 1, 5)
+        dup_layout.setColumnStretch(4, 1)
+        dup = QWidget()
+        dup.setLayout(dup_layout)
+        self.tabs.addTab(dup, '중복')
+
+    def erase_lbl(self, e):  # coordinate list double click event to remove coordinate
+        if e.data():
+            p = self.lbl_path()
+            reply = QMessageBox.question(self, '라벨 제거', f"{p}파일에 '{e.data()}'를 제거하시겠습니까?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                row = e.row()
+                self.record('remove', p, row, self.labels.lines[row])
+                self.changed(p, self.store.remove(p, row))  # by row, duplicates stay
+                self.lbl_rect.clear_box()
+
+    def erase_file(self, e):  # remove image & label at trash, held in folder until session ends for undo
+        if self.journal is None:
+            return
+        if self.loader.source is not None:
+            QMessageBox.information(self, '파일 제거', '동영상 프레임이나 압축파일 안의 사진은 제거할 수 없습니다.')
+            return
+        p_lbl = self.lbl_path()
+        p_img = self.loader.img_path
+        reply = QMessageBox.question(self, '파일 제거', f"다음 파일을 제거하시겠습니까?\n{p_img}\n{p_lbl}",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.flush()  # held label file has every edit
+            self.store.discard(p_lbl)
+            held = held_paths(p_img, p_lbl)
+            if not any(src == str(p_img) for src, _ in held):
+                QMessageBox.warning(self, '파일 찾지 못함', f'파일을 찾지 못했습니다.\n{p_img}')
+            self.journal.record({'t': 'erase', 'img': str(p_img), 'lbl': p_lbl, 'held': held})
+            self.journal.sync()  # logged before files move
+            hold(held)
+            self.remove_images([self.loader.shown_row])
+
+    def lbl_path(self):  # label file of current image
+        return label_path(self.lbl_txt.text(), self.lbl_title.text())
+
+    def changed(self, path, labels, row=None):  # labels of image row (shown one if None) edited, write later
+        if row is None or row == self.loader.shown_row:
+            self.code(labels)
+            row = self.loader.shown_row
+        self.thumb_model.set_count(row, len(labels))
+        self.edited[path] = Path(self.loader.images[row]).name
+        self.flush_timer.start()  # restarted by every edit
+
+    def record(self, t, path, row, line, old=None):  # journal label edit of current image
+        if self.journal is not None:
+            rec = {'t': t, 'lbl': path, 'img': str(self.loader.img_path), 'row': row, 'line': line}
+            if old is not None:
+                rec['old'] = old
+            self.journal.record(rec)
+
+    def undo(self):  # Ctrl+Z, revert last label edit or file removal
+        if self.journal is not None:
+            rec = self.journal.undo()
+            if rec is not None:
+                self.replay(rec, True)
+
+    def redo(self):  # Ctrl+Y
+        if self.journal is not None:
+            rec = self.journal.redo()
+            if rec is not None:
+                self.replay(rec, False)
+
+    def replay(self, rec, undo):  # apply journal edit backward or forward, then show its image
+        try:
+            row = self.loader.images.index(rec['img'])
+        except ValueError:  # not in this run
+            row = None
+        if rec['t'] == 'erase':
+            (unhold if undo else hold)(rec['held'])
+            self.journal.sync()
+            self.store.discard(rec['lbl'])
+            if row is not None and not undo:
+                self.remove_images([row])
+                return
+            if row is not None:
+                self.restore_images([row])
+            if row == self.loader.cnt:
+                self.loader.refresh()
+        else:
+            p, line = rec['lbl'], rec['line']
+            labels = self.store.get(p)
+            if rec['t'] == 'change':  # box moved or resized
+                old, new = (line, rec['old']) if undo else (rec['old'], line)
+                i = labels.find(rec['row'], old)
+                if i < 0:
+                    return
+                labels = self.store.replace(p, i, new)
+            elif (rec['t'] == 'remove') == undo:  # put line back
+                labels = self.store.insert(p, min(rec['row'], len(labels)), line)
+            else:
+                i = labels.find(rec['row'], line)  # moved since, take same line elsewhere
+                if i < 0:
+                    return
+                labels = self.store.remove(p, i)
+            if row is None:
+                self.edited[p] = Path(rec['img']).name
+                self.flush_timer.start()
+            else:
+                self.changed(p, labels, row)
+        if row is not None and row != self.loader.cnt:
+            self.goto(row)
+
+    def remove_images(self, rows):  # held in trash, left out of queue, index and packed labels until undone
+        names = [Path(self.loader.images[row]).name for row in rows]
+        if self.index is not None:
+            self.index.remove(names)
+        for row, name in zip(rows, names):
+            if self.packed is not None:
+                self.packed.remove(name)
+            self.thumb_model.set_count(row, 0)
+        self.loader.remove(rows)
+
+    def restore_images(self, rows):  # trash undone, label counts read again from restored files
+        for row in rows:
+            path = self.loader.images[row]
+            labels = self.store.get(label_path(self.lbl_txt.text(), path))
+            if self.index is not None:
+                mtime = self.index.update_label(Path(path).name, labels.counts())
+                self.packed_update(Path(path).name, labels, mtime)
+            self.thumb_model.set_count(row, len(labels))
+        self.loader.restore(rows)
+
+    def end_session(self):  # stop background work of running folder and save everything, on quit and by benchmark
+        self.prelabel_stop()
+        self.dedup_stop()
+        wait([job for job in (self.prelabel_job, self.dedup_job, self.packed_job) if job is not None])  # after running batch
+        self.loader.stop()
+        self.flush()
+        self.close_journal()
+        self.close_packed()
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def close_journal(self):  # end of session, held files go to trash for good
+        if self.journal is None:
+            return
+        for src, dst in self.journal.held():
+            try:
+                send2trash(dst)
+            except (FileNotFoundError, OSError):
+                pass
+            try:
+                os.rmdir(os.path.dirname(dst))  # only if empty
+            except OSError:
+                pass
+        self.journal.purge()
+        self.journal.close()
+        self.journal = self.store.journal = None
+
+    def flush(self):  # write edited label files, no re-read afterwards
+        self.flush_timer.stop()
+        try:
+            written = self.store.flush()
+        except OSError as e:
+            QMessageBox.critical(self, '저장 실패', f'라벨 파일을 저장하지 못했습니다.\n{e}')
+            return
+        for p, labels in written.items():
+            name = self.edited.pop(p, None)
+            if self.index is not None and name:
+                mtime = self.index.update_label(name, labels.counts())
+                self.packed_update(name, labels, mtime)
+
+    def thumb_move(self, e):  # thumbnail double click event to show image
+        if self.loader.isRunning():
+            self.goto(e.row())
+            self.tabs.setCurrentIndex(0)
+
+    def goto(self, row):  # show image row of dataset, filter cleared if it hides the image
+        if row in self.loader.removed:
+            return
+        pos = bisect.bisect_left(self.loader.queue, row)
+        if pos == len(self.loader.queue) or self.loader.queue[pos] != row:  # filtered out, queue swapped without a request
+            self.loader.queue = [i for i in range(self.loader.nf) if i not in self.loader.removed]
+            pos = bisect.bisect_left(self.loader.queue, row)
+        self.reset_view()
+        self.loader.move(pos)
+        self.lbl_rect.clear_box()
+
+    def blue_square(self, e):  # coordinate list click event to show what it is, then it can be dragged
+        if self.labels is not None and e.row() < len(self.labels):
+            self.lbl_rect.select(e.row())
+
+    def box_picked(self, row):  # box clicked on canvas, show its line
+        if row < 0:
+            self.list_code.clearSelection()
+        else:
+            idx = self.label_model.index(row)
+            self.list_code.setCurrentIndex(idx)
+            self.list_code.scrollTo(idx)
+
+    def move_box(self, row, rect, edit):  # box dragged on canvas, line replaced with same category
+        if self.labels is None or row >= len(self.labels):
+            return
+        box = self.viewport.to_image(*rect, self.img.width(), self.img.height())
+        old = self.labels.lines[row]
+        if edit == 'move':  # size kept as written, not rounded through widget pixels
+            box = box[:2] + parse_line(old)[1][2:]
+        line = format_box(int(self.labels.cls[row]), box)
+        if box[2] > 0 and box[3] > 0 and line != old:
+            p = self.lbl_path()
+            self.record('change', p, row, line, old)
+            self.changed(p, self.store.replace(p, row, line))
+
+    def bright_up(self):  # brightly image
+        if self.loader.isRunning() and self.brightness < 250:
+            self.brightness += 25
+            self.adjust()
+            self.lbl_bright.setText(f'현재밝기 : {self.brightness // 25}')
+
+    def bright_down(self):  # dim image
+        if self.loader.isRunning() and self.brightness > -250:
+            self.brightness -= 25
+            self.adjust()
+            self.lbl_bright.setText(f'현재밝기 : {self.brightness // 25}')
+
+    def bright_chg(self, e):  # 현재밝기 double click event to change brightness image
+        if self.loader.isRunning():
+            dlg = QInputDialog(self)
+            dlg.setWindowIcon(self.windowIcon())
+            dlg.setWindowFlags(Qt.Window | Qt.WindowCloseButtonHint)
+            dlg.setInputMode(QInputDialog.IntInput)
+            dlg.setWindowTitle('밝기 조절')
+            dlg.setLabelText("밝기를 조절합니다.\n-10 부터 10까지")
+            dlg.setIntRange(-10, 10)
+            dlg.setIntValue(self.brightness // 25)
+            ok = dlg.exec_()
+            num = dlg.intValue()
+            if ok:
+                self.brightness = num * 25
+                self.adjust()
+                self.lbl_bright.setText(f'현재밝기 : {num}')
+
+    def gamma_chg(self):  # menu event to change gamma
+        if self.loader.isRunning():
+            val, ok = QInputDialog.getDouble(self, '감마 조절', '감마를 조절합니다.\n0.2 부터 5.0까지', self.gamma, 0.2, 5.0, 1)
+            if ok:
+                self.gamma = val
+                self.adjust()
+
+    def contrast_chg(self):  # menu event to change contrast
+        if self.loader.isRunning():
+            val, ok = QInputDialog.getDouble(self, '대비 조절', '대비를 조절합니다.\n0.2 부터 5.0까지', self.contrast, 0.2, 5.0, 1)
+            if ok:
+                self.contrast = val
+                self.adjust()
+
+    def levels_chg(self, checked):  # menu event to toggle auto levels
+        self.auto_levels = checked
+        self.adjust()
+
+    def adjust_reset(self):  # menu event to reset every adjustment
+        self.brightness = 0
+        self.contrast = 1.0
+        self.gamma = 1.0
+        self.lbl_bright.setText('현재밝기 : 0')
+        self.adjust()
+
+    def adjust(self):  # rebuild lookup table and redisplay, no decoding
+        levels = (0, 255)
+        if self.auto_levels and self.display is not None:
+            if self.levels is None:
+                self.levels = auto_levels(self.display)
+            levels = self.levels
+        self.lut = make_lut(self.brightness, self.contrast, self.gamma, levels)
+        self.lut_identity = np.array_equal(self.lut, IDENTITY_LUT)
+        self.update_display()
+
+    def filter_all(self):  # menu event to visit every image
+        if self.index is not None:
+            self.apply_filter(list(range(self.loader.nf)))
+
+    def filter_unlabeled(self):  # menu event to visit images without label file
+        if self.index is not None:
+            self.flush()  # query sees pending edits
+            self.apply_filter(self.index.query(unlabeled=True))
+
+    def filter_category(self):  # menu event to visit images containing category
+        if self.index is not None:
+            num, ok = QInputDialog.getInt(self, '클래스 필터', '해당 카테고리가 있는 사진만 봅니다.',
+                                          self.select_category.value(), 0)
+            if ok:
+                self.flush()
+                self.apply_filter(self.index.query(category=num) if self.packed is None else
+                                  self.packed.query(category=num))
+
+    def filter_boxes(self):  # menu event to visit images with many boxes
+        if self.index is not None:
+            num, ok = QInputDialog.getInt(self, '박스 개수 필터', '박스가 N개보다 많은 사진만 봅니다.', 0, 0)
+            if ok:
+                self.flush()
+                self.apply_filter(self.index.query(min_boxes=num) if self.packed is None else
+                                  self.packed.query(min_boxes=num))
+
+    def filter_small(self):  # menu event to visit images with small boxes
+        if self.packed_pending('작은 박스 필터'):
+            return
+        if self.packed is not None:
+            num, ok = QInputDialog.getDouble(self, '작은 박스 필터', '가로나 세로가 사진의 N% 보다 작은 박스가 있는 사진만 봅니다.',
+                                             1.0, 0.0, 100.0, 2)
+            if ok:
+                self.flush()
+                self.apply_filter(self.packed.query(max_side=num / 100))
+
+    def label_stats(self):  # menu event to show class histogram and box sizes of whole dataset
+        if self.packed_pending('라벨 통계'):
+            return
+        if self.packed is not None:
+            self.flush()
+            st = self.packed.stats()
+            classes = '\n'.join(f'{self.category.get(c, c)} : {n}' for c, n in st['classes'].items())
+            QMessageBox.information(self, '라벨 통계',
+                                    f"사진 {st['images']}장, 라벨 있는 사진 {st['labeled']}장, 박스 {st['boxes']}개 "
+                                    f"(사진당 최대 {st['max_boxes']}개)\n"
+                                    f"박스 가로 (최소, 5%, 중간, 95%, 최대) : {st['width']}\n"
+                                    f"박스 세로 (최소, 5%, 중간, 95%, 최대) : {st['height']}\n\n{classes}")
+
+    def packed_pending(self, title):  # folder is running but packed labels are still being built
+        if self.index is not None and self.packed is None:
+            QMessageBox.information(self, title, '라벨을 모으는 중입니다. 잠시 후 다시 시도하세요.')
+            return True
+        return False
+
+    def apply_filter(self, queue):
+        queue = [i for i in queue if i not in self.loader.removed]
+        if not queue:
+            QMessageBox.information(self, '필터', '조건에 맞는 사진이 없습니다.')
+            return False
+        self.reset_view()
+        self.loader.set_queue(queue)
+        self.lbl_rect.clear_box()
+        return True
+
+    def run(self):  # run thread
+        if self.loader.isRunning():
+            return
+        fname = self.lbl_img.text()
+        p = str(Path(str(fname)).resolve())  # os-agnostic absolute path p = \
+        if is_video(p) or is_archive(p):
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                if is_video(p):
+                    self.loader.source = VideoSource(p, self.loader.cache, self.stride)
+                else:
+                    self.loader.source = ArchiveSource(p, self.loader.cache)  # member list indexed on first open
+            except ValueError:
+                QMessageBox.critical(self, '파일 오류', f'파일을 열지 못했습니다.\n{p}', QMessageBox.Ok)
+                return
+            finally:
+                QApplication.restoreOverrideCursor()
+            if not self.loader.source.paths:
+                self.loader.source.close()
+                self.loader.source = None
+                QMessageBox.critical(self, '파일 없음', f'해당 파일에서 사진을 찾지 못했습니다.\n{p}\n지원되는 확장자는:\n'
+                                                    f'{IMG_FORMATS}', QMessageBox.Ok)
+                return
+            self.loader.images = self.loader.source.paths  # read in place, no extraction
+            self.thumb_model.set_files([])
+        elif not has_images(p):
+            QMessageBox.critical(self, '파일 없음', f'해당 폴더에 사진을 찾지 못했습니다.\n{p}\n지원되는 확장자는:\n'
+                                                f'{IMG_FORMATS}', QMessageBox.Ok)
+            return
+        else:
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            try:
+                self.index = DatasetIndex(p, self.lbl_txt.text())
+                self.index.refresh()  # incremental, only new or modified files are read
+                files = self.index.files()
+                self.loader.images = [f[0] for f in files]
+                self.thumb_model.set_files(files)
+                self.load_packed()  # built on first open of folder, label files are read until then
+            finally:
+                QApplication.restoreOverrideCursor()
+        try:
+            self.journal = self.store.journal = Journal(self.lbl_txt.text())  # finishes writes cut off by crash
+        except OSError as e:
+            QMessageBox.warning(self, '저널 오류', f'편집 기록을 열지 못해 실행 취소를 쓸 수 없습니다.\n{e}')
+        else:
+            if self.journal.recovered:
+                QMessageBox.information(self, '라벨 복구', '저장 중 중단된 라벨 파일을 복구했습니다.\n' +
+                                        '\n'.join(self.journal.recovered[:20]))
+        self.btn_start.setEnabled(False)
+        self.btn_img.setEnabled(False)
+        self.btn_txt.setEnabled(False)
+        self.lbl_rect.clear_box()
+        self.reset_view()
+        self.loader.start()
+        self.status = True
+        try:
+            self.lbl_category.setText(self.category[0])
+        except (ValueError, KeyError):
+            pass
+
+    def stop(self):  # stop thread
+        if self.loader.isRunning():
+            reply = QMessageBox.warning(self, '프로세스 종료', '현재 프로세스를 종료하고 다른 폴더의 파일을 실행하시겠습니까?',
+                                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.dedup_stop()
+                self.loader.stop()
+                self.flush()
+                self.close_journal()
+                self.labels = None
+                self.img.setPixmap(QPixmap(LOGO))
+                self.frame = None
+                self.region = FULL
+                self.reset_view()
+                self.display = None
+                self.qimage = None
+                self.adjust_reset()
+                self.lbl_rect.clear_box()
+                self.lbl_rect.set_boxes([])
+                self.label_model.set_labels(None)
+                self.show_proposals()
+                self.dup_tree.clear()
+                self.lbl_dedup.clear()
+                self.btn_start.setEnabled(True)
+                self.btn_img.setEnabled(True)
+                self.btn_txt.setEnabled(True)
+                self.lbl_title.clear()
+                self.lbl_cnt.clear()
+                self.loader.reset_val()
+                self.close_packed()
+                if self.index is not None:
+                    self.index.close()
+                    self.index = None
+                self.thumb_model.set_files([])
+
+    def close_packed(self):  # pack edits of session if many, before index is closed
+        packed, self.packed, self.loader.packed = self.packed, None, None  # new decodes no longer see it
+        if packed is not None:
+            wait(list(self.loader.loading))  # decodes that took it before the swap
+            packed.close()
+
+    def load_packed(self):
+        self.packed_edits = {}
+        self.packed_job = self.packed_pool.submit(self.packed_build, self.index.img_dir, self.index.lbl_dir)
+
+    def packed_update(self, name, labels, mtime):  # label file of image written, kept for packed labels still opening
+        mtime = NO_FILE if mtime is None else mtime
+        if self.packed is not None:
+            self.packed.update(name, labels, mtime)
+        else:
+            self.packed_edits[name] = (labels, mtime)
+
+    def packed_build(self, img_dir, lbl_dir):  # packed thread, own index connection, built or mapped with overlay read
+        try:
+            index = DatasetIndex(img_dir, lbl_dir)
+            try:
+                packed = PackedLabels(index)
+            finally:
+                index.close()
+        except Exception as e:
+            logger.warning('packed labels build failed', exc_info=e)
+            return
+        self.packed_built.emit(img_dir, packed)
+
+    def packed_ready(self, img_dir, packed):  # main thread, only edits made while opening are applied
+        if self.index is None or self.index.img_dir != img_dir or self.packed is not None:
+            packed.release()
+            return
+        packed.index = self.index  # sqlite connection of this thread from now on
+        for name, (labels, mtime) in self.packed_edits.items():
+            packed.update(name, labels, mtime)
+        for row in self.loader.removed:  # trashed while opening
+            packed.remove(Path(self.loader.images[row]).name)
+        self.packed_edits = {}
+        self.packed = self.loader.packed = packed
+
+    def prev(self):  # button prev click event
+        self.reset_view()
+        self.loader.prev()
+        self.lbl_rect.clear_box()
+
+    def next(self):  # button next click event
+        self.reset_view()
+        self.loader.next()
+        self.lbl_rect.clear_box()
+
+    def frame_ready(self, frame, region):  # decoded frame from thread
+        self.frame = frame
+        self.region = region
+        self.show_image(frame)
+
+    def reset_view(self):  # whole image, new image always starts unzoomed
+        self.viewport.reset()
+        self.loader.viewport = self.viewport.rect()
+
+    def zoom_reset(self):  # menu event to show whole image
+        self.reset_view()
+        self.lbl_rect.clear_box()
+        self.view_changed()
+
+    def resize_view(self):  # display size changed
+        self.loader.view = (self.img.width(), self.img.height())
+        self.view_changed()
+
+    def view_changed(self):  # zoomed, panned or resized, redisplay from frame and decode finer if needed
+        self.loader.viewport = self.viewport.rect()
+        if self.frame is None or not self.loader.isRunning():
+            return
+        self.show_image(self.frame)
+        if self.loader.needs_reload():
+            self.loader.refresh()
+
+    def cnt(self, s):  # Status bar / set progress
+        self.lbl_cnt.setText(s)
+
+    def change(self, e):  # move file
+        if self.loader.isRunning():
+            dlg = QInputDialog(self)
+            dlg.setWindowIcon(self.windowIcon())
+            dlg.setWindowFlags(Qt.Window | Qt.WindowCloseButtonHint)
+            dlg.setInputMode(QInputDialog.IntInput)
+            dlg.setWindowTitle('파일 이동')
+            dlg.setLabelText("원하는 파일로 이동합니다.")
+            dlg.resize(500, 100)
+            dlg.setIntRange(1, len(self.loader.queue))
+            dlg.setIntValue(self.loader.qpos + 1)
+            ok = dlg.exec_()
+            num = dlg.intValue()
+            if ok:
+                self.reset_view()
+                self.loader.move(num - 1)
+
+    def commit(self):  # user draw box add to txt file
+        if self.status and self.bbox:
+            c = str(self.select_category.text()) + ' ' + self.bbox
+            p = self.lbl_path()
+            category = self.category[self.select_category.value()]
+            reply = QMessageBox.question(self, '라벨 추가',
+                                         f"{p}파일에 '{c}'를 추가하시겠습니까?\n현재 카테고리 : {category}",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+            if reply == QMessageBox.Yes:
+                labels = self.store.add(p, self.select_category.value(), self.box)
+                self.record('add', p, len(labels) - 1, labels.lines[-1])
+                self.changed(p, labels)
+                self.lbl_rect.clear_box()
+
+    def code(self, labels):  # show label coordinate data, already parsed
+        self.labels = labels
+        with tracer.span('label_list'):
+            self.label_model.set_labels(labels)
+        self.lbl_rect.set_boxes(labels.boxes)
+        self.show_proposals()
+
+    def coordinate(self, coordinate):  # show user draw box coordinate
+        x, y, w, h = self.viewport.to_image(*coordinate, self.img.width(), self.img.height()) if any(coordinate) \
+            else (0.0, 0.0, 0.0, 0.0)
+        self.lbl_bbox.setText(f'x:{x}\ny:{y}\nw:{w}\nh:{h}')
+        self.bbox = ' '.join([str(x), str(y), str(w), str(h)])
+        self.box = (x, y, w, h)
+
+    def show_category(self):  # current category
+        self.lbl_category.setText(self.category[self.select_category.value()])
+
+    def title(self, title):  # image title (file name)
+        self.lbl_title.setText(title)
+
+    def edit_category(self):  # edit category dictionary
+        dlg = QInputDialog(self)
+        dlg.setWindowIcon(self.windowIcon())
+        dlg.setWindowFlags(Qt.Window | Qt.WindowCloseButtonHint)
+        dlg.setWindowTitle('Edit Category')
+        category = '\n'.join([str(key) + ' / ' + val for key, val in self.category.items()])
+        dlg.setLabelText(f'추가할 번호/동물이름을 입력하세요\n예시) 0 / sample\n현재 목록:\n{category}')
+        dlg.setTextValue(category.split('\n')[-1])
+        ok = dlg.exec_()
+        text = dlg.textValue().strip()
+        if ok and len(text.split('/')) == 2:
+            try:
+                key, val = text.split('/')
+                key = int(key.strip())
+                val = re.sub(r"[^a-zA-Z0-9가-힣_ \-(){}\[\]]", "", val.strip())
+            except ValueError:
+                QMessageBox.critical(self, '추가 불가', '/앞은 숫자만 가능합니다.')
+            else:
+                if key > len(self.category):
+                    QMessageBox.critical(self, '추가 불가', '비어있는 번호가 생길 수 없습니다.')
+                elif key == len(self.category):
+                    self.category[key] = val
+                    QMessageBox.information(self, '카테고리 추가 완료!',
+                                            f"'{key}'의 이름을 '{val}'(으)로 추가하였습니다!")
+                    self.select_category.setMaximum(len(self.category) - 1)
+                    self.lbl_category.setText(self.category[key])
+                else:
+                    old_val = self.category[key]
+                    self.category[key] = val
+                    QMessageBox.information(self, '카테고리 업데이트 완료!',
+                                            f"'{key}'의 이름을 '{old_val}'에서 '{val}'(으)로 교체하였습니다!")
+                    self.lbl_category.setText(self.category[key])
+
+    def img_source(self):  # glob image list
+        if not self.loader.isRunning():
+            QMessageBox.information(self, '주의사항', '프로그램을 사용하는 도중에 해당 폴더 안의 사진의 이름을 변경하거나 삭제하지 마십시오.')
+            fname = QFileDialog.getExistingDirectory(self)  # fname = /
+            if fname:
+                p = str(Path(str(fname)).resolve())  # os-agnostic absolute path p = \
+                if not has_images(p):
+                    QMessageBox.critical(self, '파일 없음', f'해당 폴더에 사진을 찾지 못했습니다.\n{p}\n지원되는 확장자는:\n'
+                                                        f'{IMG_FORMATS}', QMessageBox.Ok)
+                else:
+                    self.lbl_img.setText(str(fname))
+                    self.loader.img_source = str(fname)
+
+    def prelabel(self):  # menu event, run onnx model over running folder in background
+        if not self.loader.isRunning() or self.loader.source is not None or self.prelabeling():
+            return
+        fname, _ = QFileDialog.getOpenFileName(self, 'ONNX 모델 선택', '', 'ONNX (*.onnx)')
+        if not fname:
+            return
+        size, ok = QInputDialog.getInt(self, '입력 크기', '모델 입력 크기를 입력하세요.', INPUT_SIZE, 32, 4096, 32)
+        if ok:
+            self.prelabel_cancel.clear()
+            self.lbl_prelabel.setText('자동 라벨링 준비')
+            paths = [p for i, p in enumerate(self.loader.images) if i not in self.loader.removed]  # trashed left out
+            self.prelabel_job = self.prelabel_pool.submit(self.prelabel_run, paths, fname, size)
+
+    def prelabel_run(self, paths, model, size):  # prelabel thread
+        try:
+            key, _ = prelabel(paths, model, size=size, progress=lambda done, total, p: self.prelabeled.emit(done, total, p),
+                              cancelled=self.prelabel_cancel.is_set)
+            self.prelabeled.emit(-1, -1, [key])  # finished or stopped
+        except Exception as e:  # bad model, missing backend, unreadable cache
+            logger.warning('prelabel failed', exc_info=e)
+            self.prelabel_failed.emit(str(e))
+
+    def prelabeling(self):
+        return self.prelabel_job is not None and not self.prelabel_job.done()
+
+    def prelabel_stop(self):  # finished batches stay cached, next run continues from there
+        if self.prelabeling():  # thread ends after running batch, reported by prelabel_progress
+            self.prelabel_cancel.set()
+            self.lbl_prelabel.setText('자동 라벨링 중지 중')
+
+    def prelabel_progress(self, done, total, paths):
+        if done < 0:  # paths holds model key
+            self.lbl_prelabel.setText('자동 라벨링 중지' if self.prelabel_cancel.is_set() else '자동 라벨링 완료')
+            self.proposal_model = self.proposal_db().meta('model', paths[0])
+            self.show_proposals()
+            return
+        if not self.prelabel_cancel.is_set():
+            self.lbl_prelabel.setText(f'자동 라벨링 {done}/{total}')
+        if self.proposal_model is not None and str(self.loader.img_path) in paths:
+            self.show_proposals()
+
+    def prelabel_error(self, msg):
+        self.lbl_prelabel.clear()
+        QMessageBox.warning(self, '자동 라벨링', f'모델을 실행하지 못했습니다.\n{msg}')
+
+    def dedup(self):  # duplicates tab event, hash and cluster running folder in background
+        if self.index is None or self.journal is None:
+            QMessageBox.information(self, '중복 찾기', '사진 폴더를 실행한 뒤 사용할 수 있습니다.')
+            return
+        if self.dedup_job is not None and not self.dedup_job.done():
+            return
+        self.flush()  # box counts decide which copy is kept
+        self.dedup_cancel.clear()
+        self.dup_tree.clear()
+        self.dedup_job = self.dedup_pool.submit(self.dedup_run, self.index.img_dir, self.index.lbl_dir,
+                                                self.dup_threshold.value())
+
+    def dedup_run(self, img_dir, lbl_dir, threshold):  # dedup thread, own index connection
+        try:
+            index = DatasetIndex(img_dir, lbl_dir)
+            try:
+                compute_hashes(index, progress=self.hashed.emit, cancelled=self.dedup_cancel.is_set)
+                self.deduped.emit(img_dir, None if self.dedup_cancel.is_set() else find_clusters(index, threshold))
+            finally:
+                index.close()
+        except Exception as e:  # unreadable index, worker crash
+            logger.warning('dedup failed', exc_info=e)
+            self.dedup_failed.emit(str(e))
+
+    def dedup_stop(self):  # stored hashes stay, next search continues from there
+        if self.dedup_job is not None and not self.dedup_job.done():  # thread ends after running chunk, reported by show_clusters
+            self.dedup_cancel.set()
+            self.lbl_dedup.setText('중복 찾기 중지 중')
+
+    def dedup_progress(self, done, total):
+        if not self.dedup_cancel.is_set():
+            self.lbl_dedup.setText(f'해시 계산 {done}/{total}')
+
+    def dedup_error(self, msg):
+        self.lbl_dedup.clear()
+        QMessageBox.warning(self, '중복 찾기', f'중복을 찾지 못했습니다.\n{msg}')
+
+    def show_clusters(self, img_dir, clusters):  # one top item per cluster, keeper first
+        if not self.loader.isRunning() or self.index is None or self.index.img_dir != img_dir:  # folder changed since
+            return
+        self.dup_tree.clear()
+        if clusters is None:
+            self.lbl_dedup.setText('중복 찾기 중지')
+            return
+        clusters = [c for c in ([r for r in c if r not in self.loader.removed] for c in clusters) if len(c) > 1]
+        for k, rows in enumerate(clusters, 1):
+            top = QTreeWidgetItem([f'묶음 {k} ({len(rows)}장)', ''])
+            for i, row in enumerate(rows):
+                path, _, _, n = self.thumb_model.files[row]
+                child = QTreeWidgetItem([Path(path).name + (' (유지)' if i == 0 else ''), str(n or 0)])
+                child.setData(0, Qt.UserRole, row)
+                top.addChild(child)
+            self.dup_tree.addTopLevelItem(top)
+        self.dup_tree.expandAll()
+        self.dup_tree.resizeColumnToContents(0)
+        self.lbl_dedup.setText(f'묶음 {len(clusters)}개, 지울 사진 {sum(len(c) - 1 for c in clusters)}장')
+
+    def dup_move(self, item):  # duplicates tab double click event to show image
+        row = item.data(0, Qt.UserRole)
+        if row is not None and self.loader.isRunning():
+            self.goto(row)
+            self.tabs.setCurrentIndex(0)
+
+    def trash_cluster(self):  # duplicates tab event, selected cluster but its keeper
+        item = self.dup_tree.currentItem()
+        if item is not None:
+            self.trash_clusters([item.parent() or item])
+
+    def trash_all_clusters(self):
+        self.trash_clusters([self.dup_tree.topLevelItem(i) for i in range(self.dup_tree.topLevelItemCount())])
+
+    def trash_clusters(self, tops):  # held like erase_file, each image undone by Ctrl+Z
+        rows = [top.child(i).data(0, Qt.UserRole) for top in tops for i in range(1, top.childCount())]
+        if not rows or self.journal is None or not self.loader.isRunning():
+            return
+        reply = QMessageBox.question(self, '중복 제거', f'{len(rows)}장의 사진과 라벨을 휴지통으로 보내시겠습니까?\n'
+                                     '묶음마다 박스가 가장 많은 사진은 남깁니다.', QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+        self.flush()
+        moves = []
+        for row in rows:
+            p_img = self.loader.images[row]
+            p_lbl = label_path(self.lbl_txt.text(), p_img)
+            self.store.discard(p_lbl)
+            held = held_paths(p_img, p_lbl)
+            self.journal.record({'t': 'erase', 'img': str(p_img), 'lbl': p_lbl, 'held': held})
+            moves.append(held)
+        self.journal.sync()  # logged before files move
+        for held in moves:
+            hold(held)
+        for top in tops:
+            self.dup_tree.takeTopLevelItem(self.dup_tree.indexOfTopLevelItem(top))
+        self.lbl_dedup.setText(f'{len(rows)}장 제거')
+        self.remove_images(rows)
+
+    def bulk(self):  # menu event, remap, delete, size or clip over every label file of running folder
+        if self.index is None or not self.loader.isRunning():
+            QMessageBox.information(self, '일괄 편집', '사진 폴더를 실행한 뒤 사용할 수 있습니다.')
+            return
+        kinds = ['클래스 바꾸기/합치기', '클래스 삭제', '작은 박스 삭제', '박스를 사진 안으로 자르기']
+        kind, ok = QInputDialog.getItem(self, '일괄 편집', '모든 라벨 파일에 적용할 작업', kinds, 0, False)
+        if not ok:
+            return
+        if kind == kinds[0]:
+            text, ok = QInputDialog.getText(self, kind, '이전 번호:새 번호를 쉼표로 구분해 입력하세요\n예시) 3:1,4:1 (3과 4를 1로 합침)')
+            try:
+                ops = {'remap': parse_remap(text)}
+            except ValueError:
+                QMessageBox.critical(self, kind, '형식이 맞지 않습니다.')
+                return
+            ok = ok and ops['remap']
+        elif kind == kinds[1]:
+            num, ok = QInputDialog.getInt(self, kind, '박스를 모두 지울 카테고리', self.select_category.value(), 0)
+            ops = {'delete': [num]}
+        elif kind == kinds[2]:
+            num, ok = QInputDialog.getInt(self, kind, '가로나 세로가 N 픽셀보다 작은 박스를 지웁니다.', 4, 1)
+            ops = {'min_pixels': num}
+        else:
+            ops = {'clip': True}
+        if ok:
+            self.flush()  # pending edits written before files are rewritten
+            self.bulk_run(ops, True)
+
+    def bulk_run(self, ops, dry_run):  # dry run first, files are rewritten after confirmation
+        names = candidates(self.index, ops, self.packed)  # index and packed labels stay on this thread
+        self.bulk_dialog = QProgressDialog('라벨 파일 확인 중' if dry_run else '라벨 파일 수정 중', None, 0, 0, self)
+        self.bulk_dialog.setWindowTitle('일괄 편집')
+        self.bulk_dialog.setWindowModality(Qt.WindowModal)  # no label edits meanwhile
+        self.bulk_dialog.setMinimumDuration(0)
+        self.bulk_dialog.show()
+        self.bulk_pool.submit(self.bulk_thread, self.index.img_dir, self.index.lbl_dir, ops, dry_run, names)
+
+    def bulk_thread(self, img_dir, lbl_dir, ops, dry_run, names):  # bulk thread, own index connection
+        try:
+            summary = bulk_edit(img_dir, lbl_dir, ops, dry_run, names, progress=self.bulk_progress.emit)
+        except Exception as e:  # bulk_done always follows, progress dialog is modal
+            logger.warning('bulk edit failed', exc_info=e)
+            summary = {'error': str(e)}
+        self.bulk_done.emit(summary, ops)
+
+    def bulk_step(self, done, total):
+        if self.bulk_dialog is not None:
+            self.bulk_dialog.setMaximum(total)
+            self.bulk_dialog.setValue(done)
+
+    def bulk_finished(self, summary, ops):
+        self.bulk_dialog.close()
+        self.bulk_dialog = None
+        if 'error' in summary:
+            QMessageBox.critical(self, '일괄 편집', f"라벨 파일을 수정하지 못했습니다.\n{summary['error']}")
+        elif summary['dry_run']:
+            if not summary['files']:
+                QMessageBox.information(self, '일괄 편집', '바뀌는 라벨 파일이 없습니다.')
+                return
+            reply = QMessageBox.question(self, '일괄 편집', f"라벨 파일 {summary['files']}개에서 박스 {summary['changed']}개를 "
+                                         f"고치고 {summary['dropped']}개를 지웁니다.\n되돌릴 수 없습니다. 진행하시겠습니까?",
+                                         QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                self.flush()
+                self.bulk_run(ops, False)
+        else:
+            self.thumb_model.set_files(self.index.files())  # box counts written by bulk thread
+            if self.packed is not None:  # rewritten files are read again into overlay, or packed again if many
+                self.close_packed()
+                self.load_packed()
+            self.loader.refresh()
+            QMessageBox.information(self, '일괄 편집', f"라벨 파일 {summary['files']}개를 수정했습니다.")
+
+    def proposal_db(self):  # None until some prelabel run made the cache file, browsing creates nothing
+        if self.proposal_cache is None:
+            if not CACHE_DB.exists():
+                return None
+            self.proposal_cache = ProposalCache()
+            self.proposal_model = self.proposal_model or self.proposal_cache.meta('model')  # last model run
+        return self.proposal_cache
+
+    def show_proposals(self):  # proposals of current image not yet accepted, rejected or drawn
+        self.proposals = []
+        if self.labels is not None and self.loader.source is None and self.loader.img_path:
+            cache = self.proposal_db()
+            if cache is not None and self.proposal_model is not None:
+                self.proposals = shown(cache.get(self.loader.img_path, self.proposal_model) or [], self.labels.boxes)
+        self.list_proposal.clear()
+        self.list_proposal.addItems([f'{c} {x} {y} {w} {h}  ({s:.2f})' for _, c, (x, y, w, h), s in self.proposals])
+        self.lbl_rect.set_proposals([box for _, _, box, _ in self.proposals])
+
+    def accept(self, proposals):  # proposals become label lines, undone like drawn boxes
+        if not proposals or self.journal is None:
+            return
+        p = self.lbl_path()
+        for _, c, box, _ in proposals:
+            labels = self.store.add(p, c, box)
+            self.record('add', p, len(labels) - 1, labels.lines[-1])
+        self.changed(p, labels)
+
+    def accept_proposal(self, *_):
+        row = self.list_proposal.currentRow()
+        if 0 <= row < len(self.proposals):
+            self.accept([self.proposals[row]])
+
+    def accept_all(self):
+        self.accept(self.proposals)
+
+    def reject_proposal(self):
+        row = self.list_proposal.currentRow()
+        if 0 <= row < len(self.proposals):
+            self.proposal_db().reject(self.loader.img_path, self.proposal_model, self.proposals[row][0])
+            self.show_proposals()
+
+    def video_source(self):  # menu event to label frames of video without extracting them
+        if not self.loader.isRunning():
+            formats = ' '.join(f'*.{f}' for f in VIDEO_FORMATS)
+            fname, _ = QFileDialog.getOpenFileName(self, '동영상 선택', '', f'Video ({formats})')
+            if fname:
+                stride, ok = QInputDialog.getInt(self, '프레임 간격', '몇 프레임마다 라벨링할지 입력하세요.', self.stride, 1)
+                if ok:
+                    self.stride = stride
+                    self.lbl_img.setText(str(fname))
+                    self.loader.img_source = str(fname)
+
+    def archive_source(self):  # menu event to open zip or tar without extracting it
+        if not self.loader.isRunning():
+            formats = ' '.join(f'*.{f}' for f in ARCHIVE_FORMATS)
+            fname, _ = QFileDialog.getOpenFileName(self, '압축파일 선택', '', f'Archive ({formats})')
+            if fname:
+                self.lbl_img.setText(str(fname))
+                self.loader.img_source = str(fname)
+
+    def txt_source(self):  # glob label list
+        if not self.loader.isRunning():
+            fname = QFileDialog.getExistingDirectory(self)  # fname = /
+            if fname:
+                self.lbl_txt.setText(str(fname))
+                self.loader.lbl_source = str(fname)
+
+    def show_image(self, img_src):  # bring frame to label size once, then display through lookup table
+        try:
+            w = self.img.geometry().width()
+            h = self.img.geometry().height()
+            fy, fx = img_src.shape[:2]
+            rx0, ry0, rx1, ry1 = self.region
+            x0, y0, x1, y1 = viewport = self.viewport.rect()
+            sx = (x1 - x0) / (rx1 - rx0) * fx / w  # frame pixels per display pixel
+            sy = (y1 - y0) / (ry1 - ry0) * fy / h
+            ox = (x0 - rx0) / (rx1 - rx0) * fx  # viewport corner in frame pixels
+            oy = (y0 - ry0) / (ry1 - ry0) * fy
+            inside = rx0 <= x0 and ry0 <= y0 and x1 <= rx1 and y1 <= ry1
+            if (fy, fx) == (h, w) and viewport == self.region and BGR888 is not None:
+                self.display = img_src  # read only from here on, no copy
+            else:
+                if self.scaled is None or self.scaled.shape[:2] != (h, w):
+                    self.scaled = np.empty((h, w, 3), np.uint8)
+                with tracer.span('resize'):
+                    if sx >= 1 and sy >= 1 and inside:  # shrink visible part, area average
+                        crop = img_src[int(oy):min(int(oy + sy * h + 0.5), fy), int(ox):min(int(ox + sx * w + 0.5), fx)]
+                        cv2.resize(crop, (w, h), dst=self.scaled, interpolation=cv2.INTER_AREA)
+                    else:  # magnify, sub pixel exact so overlay stays aligned while zooming
+                        m = np.float32([[1 / sx, 0, (0.5 - ox) / sx - 0.5], [0, 1 / sy, (0.5 - oy) / sy - 0.5]])
+                        cv2.warpAffine(img_src, m, (w, h), dst=self.scaled, flags=cv2.INTER_LINEAR)
+                if BGR888 is None:  # old Qt, convert in place
+                    with tracer.span('cvtColor'):
+                        cv2.cvtColor(self.scaled, cv2.COLOR_BGR2RGB, dst=self.scaled)
+                self.display = self.scaled
+            self.levels = None  # recomputed on demand for new display
+            if self.auto_levels:
+                self.adjust()
+            else:
+                self.update_display()
+        except Exception as e:
+            logger.warning('show_image error', exc_info=e)
+
+    def update_display(self):  # image2pixmap, QPixmap.fromImage is the only copy
+        if self.display is None:
+            return
+        if self.lut_identity:
+            buf = self.display
+        else:
+            buf = self.ring[self.ring_pos]
+            if buf is None or buf.shape != self.display.shape:
+                buf = self.ring[self.ring_pos] = np.empty_like(self.display)
+            self.ring_pos = (self.ring_pos + 1) % DISPLAY_BUFFERS
+            with tracer.span('lut'):
+                cv2.LUT(self.display, self.lut, dst=buf)
+        h, w, _ = buf.shape
+        img = QImage(buf.data, w, h, buf.strides[0], BGR888 or QImage.Format_RGB888)
+        self.qimage = (img, buf)
+        with tracer.span('pixmap'):
+            self.img.setPixmap(QPixmap.fromImage(img))
+
+
+def main():
+    log()
+    app = QApplication(sys.argv)
+    size = app.primaryScreen().size()
+    width = size.width()
+    height = size.height()
+    ex = MyApp()
+    ex.setGeometry(int(0.1 * width), int(0.1 * height), int(0.8 * width), int(0.8 * height))
+    return app.exec_()
@@ -0,0 +1,193 @@
+import struct
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+from .trace import tracer
+
+CACHE_BYTES = 1 << 30  # decoded frame cache budget (1GB)
+REDUCED_FLAGS = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}  # decode scale -> imdecode flag
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}  # start of frame markers
+TIFF_TYPES = {3: 'H', 4: 'I'}  # tiff entry type -> struct code, sizes are short or long
+
+
+def exif_rotated(app1):  # True if exif orientation swaps width and height
+    if app1[:6] != b'Exif\x00\x00':
+        return False
+    tiff = app1[6:]
+    order = '<' if tiff[:2] == b'II' else '>'
+    offset, = struct.unpack(order + 'I', tiff[4:8])
+    count, = struct.unpack(order + 'H', tiff[offset:offset + 2])
+    for i in range(count):  # IFD0 entries
+        entry = tiff[offset + 2 + 12 * i:offset + 14 + 12 * i]
+        tag, _, _, value = struct.unpack(order + 'HHIH', entry[:10])
+        if tag == 0x0112:  # orientation 5~8 are transposed
+            return value >= 5
+    return False
+
+
+def image_size(path):  # displayed (width, height) read from file header without decoding, None if unknown
+    try:
+        with open(path, 'rb') as f:
+            return read_size(f)
+    except OSError:
+        return None
+
+
+def decoded_size(path):  # (width, height) by full decode, for files whose header read_size does not know
+    img = load_image(path)
+    return None if img is None else (img.shape[1], img.shape[0])
+
+
+def tiff_size(f, order):  # first image directory of tiff (also dng), as OpenCV decodes it
+    f.seek(4)
+    offset, = struct.unpack(order + 'I', f.read(4))
+    f.seek(offset)
+    count, = struct.unpack(order + 'H', f.read(2))
+    size = {}
+    for _ in range(count):
+        tag, kind, _, value = struct.unpack(order + 'HHI4s', f.read(12))
+        if tag in (256, 257) and kind in TIFF_TYPES:  # image width, image length
+            size[tag] = struct.unpack(order + TIFF_TYPES[kind], value[:struct.calcsize(TIFF_TYPES[kind])])[0]
+    return (size[256], size[257]) if len(size) == 2 else None
+
+
+def webp_size(head):  # lossy, lossless or extended webp
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a':
+        w, h = struct.unpack('<HH', head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b'VP8L' and head[20] == 0x2F:
+        bits, = struct.unpack('<I', head[21:25])
+        return (bits & 0x3FFF) + 1, (bits >> 14 & 0x3FFF) + 1
+    if chunk == b'VP8X':
+        return int.from_bytes(head[24:27], 'little') + 1, int.from_bytes(head[27:30], 'little') + 1
+    return None
+
+
+def read_size(f):  # image_size of open binary file
+    try:
+        head = f.read(30)
+        if head[:8] == b'\x89PNG\r\n\x1a\n':
+            return struct.unpack('>II', head[16:24])
+        if head[:2] == b'BM':
+            w, h = struct.unpack('<ii', head[18:26])
+            return w, abs(h)
+        if head[:4] in (b'II*\x00', b'MM\x00*'):
+            return tiff_size(f, '<' if head[:2] == b'II' else '>')
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return webp_size(head)
+        if head[:2] != b'\xff\xd8':
+            return None
+        f.seek(2)
+        rotated = False
+        while True:  # walk jpeg segments until frame header
+            b = f.read(1)
+            while b == b'\xff':  # skip fill bytes
+                b = f.read(1)
+            if not b:
+                return None
+            marker = b[0]
+            if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # standalone markers
+                continue
+            length, = struct.unpack('>H', f.read(2))
+            if marker in JPEG_SOF:
+                h, w = struct.unpack('>xHH', f.read(5))
+                return (h, w) if rotated else (w, h)
+            if marker == 0xE1:  # exif, decoder applies its orientation
+                rotated = rotated or exif_rotated(f.read(length - 2))
+            else:
+                f.seek(length - 2, 1)
+    except (OSError, struct.error):
+        return None
+
+
+def reduce_factor(path, view):  # largest decode scale whose output still covers the viewport
+    return fit_factor(image_size(path), view)
+
+
+def fit_factor(size, view):  # largest decode scale of size (width, height) still covering view
+    if size is None or not view[0] or not view[1]:
+        return 1
+    w, h = size
+    for factor in (8, 4, 2):
+        if w // factor >= view[0] and h // factor >= view[1]:
+            return factor
+    return 1
+
+
+def load_image(path, factor=1):  # decode image file at 1/factor scale, None if missing or broken
+    try:
+        with tracer.span('fromfile'):
+            img_array = np.fromfile(str(path), np.uint8)  # unicode decoding
+    except (FileNotFoundError, OSError):
+        return None
+    return decode_image(img_array, factor)
+
+
+def decode_image(data, factor=1):  # decode encoded bytes at 1/factor scale, None if broken
+    with tracer.span('imdecode'):
+        return cv2.imdecode(np.frombuffer(data, np.uint8), REDUCED_FLAGS[factor])
+
+
+class FrameCache:  # byte-budgeted LRU cache of decoded frames, shared between threads
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.frames = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.frames
+
+    def get(self, key):
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is not None:
+                self.frames.move_to_end(key)  # most recently used
+            return frame
+
+    def find(self, path, factor):  # cached frame of path decoded at factor or finer
+        while factor >= 1:
+            frame = self.get((path, factor))
+            if frame is not None:
+                return frame
+            factor //= 2
+        return None
+
+    def put(self, key, frame):
+        if frame.nbytes > self.max_bytes:  # never fits, don't flush whole cache for it
+            return
+        with self.lock:
+            old = self.frames.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self.frames[key] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes:  # evict least recently used
+                _, old = self.frames.popitem(last=False)
+                self.nbytes -= old.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.frames.clear()
+            self.nbytes = 0
+
+
+def make_lut(brightness=0, contrast=1.0, gamma=1.0, levels=(0, 255)):  # 256 entry display lookup table
+    x = np.arange(256, dtype=np.float32)
+    lo, hi = levels
+    x = (x - lo) * (255 / max(hi - lo, 1))  # stretch levels to full range
+    x = np.clip((x - 128) * contrast + 128 + brightness, 0, 255)
+    x = 255 * (x / 255) ** (1 / gamma)
+    return np.clip(x + 0.5, 0, 255).astype(np.uint8)
+
+
+def auto_levels(img, cut=0.005):  # (low, high) intensity after clipping darkest/brightest cut ratio
+    hist = cv2.calcHist([img.reshape(-1, 1)], [0], None, [256], [0, 256]).ravel().cumsum()
+    lo = int(np.searchsorted(hist, hist[-1] * cut))
+    hi = int(np.searchsorted(hist, hist[-1] * (1 - cut)))
+    return (lo, hi) if hi > lo else (0, 255)
@@ -0,0 +1,180 @@
+import hashlib
+import logging
+import os
+import sqlite3
+from pathlib import Path
+from natsort import natsorted
+from .dataset import is_image
+from .image import decoded_size, image_size
+from .labels import count_classes, read_labels
+
+INDEX_NAME = '.easyboxer.db'  # index file kept next to the images
+CACHE_DIR = Path.home() / '.cache' / 'easyboxer'  # fallback when image folder is read-only
+HELD = -2  # lbl_mtime_ns of image held in trash for undo, row kept so positions of running session stay
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS images (
+    name TEXT PRIMARY KEY,
+    seq INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    width INTEGER,
+    height INTEGER,
+    lbl_mtime_ns INTEGER,
+    n_boxes INTEGER
+);
+CREATE INDEX IF NOT EXISTS images_seq ON images (seq);
+CREATE TABLE IF NOT EXISTS classes (name TEXT, cls INTEGER, n INTEGER, PRIMARY KEY (name, cls)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS classes_cls ON classes (cls);
+CREATE TABLE IF NOT EXISTS hashes (name TEXT PRIMARY KEY, mtime_ns INTEGER, dhash INTEGER, phash INTEGER);
+'''
+
+
+def scan(folder, match):  # {name: (size, mtime_ns)} of files in folder, one os.scandir pass
+    files = {}
+    try:
+        with os.scandir(folder) as it:
+            for e in it:
+                if match(e.name) and e.is_file():
+                    st = e.stat()
+                    files[e.name] = (st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return files
+
+
+class DatasetIndex:  # persistent image list with size, mtime, dimensions and label counts
+
+    def __init__(self, img_dir, lbl_dir='', db_path=None):
+        self.img_dir = str(Path(img_dir).resolve())
+        self.lbl_dir = str(Path(lbl_dir).resolve()) if lbl_dir else ''
+        self.db_path = db_path
+        self.db = self.connect()
+        if self.meta('lbl_dir') != self.lbl_dir:  # label folder changed, every label summary is stale
+            with self.db:
+                self.db.execute('UPDATE images SET lbl_mtime_ns = -1')
+                self.db.execute('DELETE FROM classes')
+                self.db.execute('REPLACE INTO meta VALUES (?, ?)', ('lbl_dir', self.lbl_dir))
+
+    def connect(self):
+        if self.db_path is None:
+            try:
+                self.db_path = str(Path(self.img_dir) / INDEX_NAME)
+                db = sqlite3.connect(self.db_path)
+                db.executescript(SCHEMA)
+                return db
+            except sqlite3.Error:
+                key = hashlib.sha1(self.img_dir.encode()).hexdigest()
+                CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                self.db_path = str(CACHE_DIR / (key + '.db'))
+                logger.info(f'image folder not writable, index at {self.db_path}')
+        db = sqlite3.connect(self.db_path)
+        db.executescript(SCHEMA)
+        return db
+
+    def meta(self, key):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        self.db.close()
+
+    def __len__(self):
+        return self.db.execute('SELECT COUNT(*) FROM images').fetchone()[0]
+
+    def refresh(self):  # incremental rescan, only new or modified files are read
+        images = scan(self.img_dir, is_image)
+        labels = scan(self.lbl_dir, lambda name: name.endswith('.txt')) if self.lbl_dir else {}
+        known = {name: (size, mtime, lbl_mtime, w) for name, size, mtime, lbl_mtime, w in
+                 self.db.execute('SELECT name, size, mtime_ns, lbl_mtime_ns, width FROM images')}
+        removed = [(name,) for name in known.keys() - images.keys()]
+        added = len(images.keys() - known.keys())
+        changed = []
+        relabeled = []
+        for name, (size, mtime) in images.items():
+            old = known.get(name)
+            lbl = labels.get(Path(name).stem + '.txt')
+            lbl_mtime = lbl[1] if lbl else None
+            if old is None or old[:2] != (size, mtime) or old[3] is None:  # no size yet, older index
+                path = os.path.join(self.img_dir, name)
+                w, h = image_size(path) or decoded_size(path) or (0, 0)  # unreadable, tried again when file changes
+                changed.append((name, size, mtime, w, h))
+            if old is None or old[2] != lbl_mtime:
+                relabeled.append((name, lbl_mtime))
+        with self.db:
+            self.db.executemany('DELETE FROM images WHERE name = ?', removed)
+            self.db.executemany('DELETE FROM classes WHERE name = ?', removed)
+            self.db.executemany('DELETE FROM hashes WHERE name = ?', removed)
+            self.db.executemany('INSERT INTO images (name, size, mtime_ns, width, height) VALUES (?, ?, ?, ?, ?) '
+                                'ON CONFLICT (name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, '
+                                'width = excluded.width, height = excluded.height', changed)
+            for name, lbl_mtime in relabeled:
+                self.store_label(name, lbl_mtime)
+            if removed or added:
+                order = natsorted(images)  # natural name order, shared by viewer and tools
+                self.db.executemany('UPDATE images SET seq = ? WHERE name = ?', enumerate(order))
+        return len(changed), len(relabeled), len(removed)
+
+    def store_label(self, name, lbl_mtime, counts=None):  # label summary of one image, caller commits
+        if counts is None:
+            counts = count_classes(read_labels(os.path.join(self.lbl_dir, Path(name).stem + '.txt'))) \
+                if lbl_mtime is not None else {}
+        self.db.execute('UPDATE images SET lbl_mtime_ns = ?, n_boxes = ? WHERE name = ?',
+                        (lbl_mtime, sum(counts.values()), name))
+        self.db.execute('DELETE FROM classes WHERE name = ?', (name,))
+        self.db.executemany('INSERT INTO classes VALUES (?, ?, ?)', [(name, c, n) for c, n in counts.items()])
+
+    def update_label(self, name, counts=None):  # label file of image was rewritten, counts known if given, new mtime
+        try:
+            lbl_mtime = os.stat(os.path.join(self.lbl_dir, Path(name).stem + '.txt')).st_mtime_ns
+        except FileNotFoundError:
+            lbl_mtime = None
+        with self.db:
+            self.store_label(Path(name).name, lbl_mtime, counts)
+        return lbl_mtime
+
+    def remove(self, names):  # images held in trash, left out of queries and duplicate search until relabeled
+        with self.db:
+            self.db.executemany('UPDATE images SET lbl_mtime_ns = ?, n_boxes = 0 WHERE name = ?',
+                                [(HELD, name) for name in names])
+            self.db.executemany('DELETE FROM classes WHERE name = ?', [(name,) for name in names])
+
+    def query(self, unlabeled=False, category=None, min_boxes=None):  # positions of matching images in shared order
+        where, args = [], []
+        if unlabeled:
+            where.append('lbl_mtime_ns IS NULL')  # no label file
+        if category is not None:
+            where.append('name IN (SELECT name FROM classes WHERE cls = ?)')
+            args.append(category)
+        if min_boxes is not None:
+            where.append('n_boxes > ?')
+            args.append(min_boxes)
+        sql = 'SELECT seq FROM images' + (' WHERE ' + ' AND '.join(where) if where else '') + ' ORDER BY seq'
+        return [seq for seq, in self.db.execute(sql, args)]
+
+    def files(self):  # [(path, size, mtime_ns, n_boxes)] in shared order
+        return [(os.path.join(self.img_dir, name), size, mtime, n or 0) for name, size, mtime, n in
+                self.db.execute('SELECT name, size, mtime_ns, n_boxes FROM images ORDER BY seq')]
+
+    def unhashed(self):  # [(name, mtime_ns)] of images without perceptual hash of current file
+        return self.db.execute('SELECT i.name, i.mtime_ns FROM images i LEFT JOIN hashes h ON h.name = i.name '
+                               'WHERE h.mtime_ns IS NOT i.mtime_ns AND i.lbl_mtime_ns IS NOT ? ORDER BY i.seq',
+                               (HELD,)).fetchall()
+
+    def store_hashes(self, rows):  # [(name, mtime_ns, dhash, phash)], hashes None for unreadable image
+        with self.db:
+            self.db.executemany('REPLACE INTO hashes VALUES (?, ?, ?, ?)', rows)
+
+    def hashes(self):  # [(seq, dhash, phash, n_boxes)] of hashed images in shared order
+        return self.db.execute('SELECT i.seq, h.dhash, h.phash, i.n_boxes FROM images i JOIN hashes h ON h.name = i.name '
+                               'WHERE h.mtime_ns = i.mtime_ns AND h.phash IS NOT NULL AND i.lbl_mtime_ns IS NOT ? '
+                               'ORDER BY i.seq', (HELD,)).fetchall()
+
+    def names(self):  # image names in shared order
+        return [name for name, in self.db.execute('SELECT name FROM images ORDER BY seq')]
+
+    def paths(self):
+        return [os.path.join(self.img_dir, name) for name in self.names()]
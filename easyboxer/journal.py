@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from .labels import TMP_PREFIX, write_labels
+
+JOURNAL_NAME = '.easyboxer.journal'  # kept in label folder
+JOURNAL_BYTES = 4 << 20  # rewritten to undo history only when bigger
+UNDO_LIMIT = 1000  # edits that can be undone
+TRASH_DIR = '.easyboxer_trash'  # removed files wait here until session ends, so removal can be undone
+TMP_AGE = 3600  # seconds, older temp file was left by a crash, younger one may be another instance writing
+
+# records, one json object per line
+#   add / remove  {'t', 'lbl', 'img', 'row', 'line'}  label line added or removed, undoable
+#   change        {'t', 'lbl', 'img', 'row', 'line', 'old'}  label line old replaced by line, undoable
+#   erase         {'t', 'img', 'lbl', 'held'}          image and label moved to TRASH_DIR, undoable
+#   undo / redo   {'t'}                                last edit undone / redone
+#   purge         {'t'}                                held files sent to trash, erase no longer undoable
+#   write         {'t', 'lbl', 'text'}                 label file about to be replaced with text
+#   done          {'t'}                                every write before it finished
+
+
+def held_paths(*paths):  # [src, dst] in TRASH_DIR next to each existing file
+    return [[str(p), str(p.parent / TRASH_DIR / p.name)] for p in map(Path, paths) if p.is_file()]
+
+
+def hold(held):  # move files into TRASH_DIR
+    for src, dst in held:
+        if os.path.exists(src):
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            os.replace(src, dst)
+
+
+def unhold(held):  # move held files back
+    for src, dst in held:
+        if os.path.exists(dst):
+            os.replace(dst, src)
+
+
+class Journal:  # append-only log of label edits, gives undo/redo history and finishes interrupted writes
+
+    def __init__(self, lbl_dir):
+        self.path = Path(lbl_dir).resolve() / JOURNAL_NAME
+        self.undo_stack = []
+        self.redo_stack = []
+        self.buffer = []  # records not written yet, synced in batches
+        pending = self.replay()
+        self.recovered = self.recover(pending)
+        self.f = open(self.path, 'a', encoding='utf-8')
+        if self.f.tell() > JOURNAL_BYTES:
+            self.compact()
+
+    def replay(self):  # rebuild undo history, {label path: text} of writes that may not have finished
+        pending = {}
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return pending
+        good = 0
+        for line in data.splitlines(keepends=True):
+            try:
+                rec = json.loads(line)
+            except ValueError:  # torn by crash while appending, everything after it is dropped
+                break
+            if not line.endswith(b'\n'):
+                break
+            good += len(line)
+            t = rec['t']
+            if t in ('add', 'remove', 'change', 'erase'):
+                self.push(rec)
+            elif t == 'undo' and self.undo_stack:
+                self.redo_stack.append(self.undo_stack.pop())
+            elif t == 'redo' and self.redo_stack:
+                self.undo_stack.append(self.redo_stack.pop())
+            elif t == 'purge':
+                self.drop_erase()
+            elif t == 'write':
+                pending[rec['lbl']] = rec['text']
+            elif t == 'done':
+                pending.clear()
+        if good < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(good)
+        return pending
+
+    def recover(self, pending):  # redo label writes cut off by crash, label paths restored
+        for lbl, text in pending.items():
+            write_labels(lbl, text)
+        folders = {os.path.dirname(p) for p in pending} | {str(self.path.parent)}
+        for folder in folders:  # temp files of interrupted writes, other tools' files left alone
+            for p in Path(folder).glob(TMP_PREFIX + '*.tmp'):
+                try:
+                    if time.time() - p.stat().st_mtime > TMP_AGE:
+                        p.unlink()
+                except FileNotFoundError:  # write finished meanwhile
+                    pass
+        if pending:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'t': 'done'}) + '\n')
+        return list(pending)
+
+    def push(self, rec):
+        self.undo_stack.append(rec)
+        del self.undo_stack[:-UNDO_LIMIT]
+        self.redo_stack.clear()
+
+    def drop_erase(self):
+        self.undo_stack = [r for r in self.undo_stack if r['t'] != 'erase']
+        self.redo_stack = [r for r in self.redo_stack if r['t'] != 'erase']
+
+    def record(self, rec):  # undoable edit
+        self.push(rec)
+        self.buffer.append(rec)
+
+    def log(self, rec):  # bookkeeping, not undoable
+        self.buffer.append(rec)
+
+    def undo(self):  # edit to revert, None if nothing left
+        if not self.undo_stack:
+            return None
+        rec = self.undo_stack.pop()
+        self.redo_stack.append(rec)
+        self.buffer.append({'t': 'undo'})
+        return rec
+
+    def redo(self):  # edit to apply again, None if nothing left
+        if not self.redo_stack:
+            return None
+        rec = self.redo_stack.pop()
+        self.undo_stack.append(rec)
+        self.buffer.append({'t': 'redo'})
+        return rec
+
+    def held(self):  # [src, dst] of every file waiting in TRASH_DIR
+        return [h for r in self.undo_stack + self.redo_stack if r['t'] == 'erase' for h in r['held']]
+
+    def purge(self):  # caller sent held files to trash
+        self.drop_erase()
+        self.log({'t': 'purge'})
+
+    def sync(self):  # one write and fsync for every buffered record
+        if self.buffer:
+            self.f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in self.buffer))
+            self.f.flush()
+            os.fsync(self.f.fileno())
+            self.buffer.clear()
+
+    def compact(self):  # rewrite as undo history only, every write is done at this point
+        self.sync()
+        records = self.undo_stack + self.redo_stack[::-1] + [{'t': 'undo'}] * len(self.redo_stack)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=TMP_PREFIX, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+        self.f.close()
+        os.replace(tmp, self.path)
+        self.f = open(self.path, 'a', encoding='utf-8')
+
+    def close(self):
+        self.sync()
+        if self.f.tell() > JOURNAL_BYTES:
+            self.compact()
+        self.f.close()
@@ -0,0 +1,271 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+
+EDGE_TOL = 1e-3  # box edge may pass image border by rounding of 4 decimal coordinates
+LABEL_DTYPE = np.dtype([('c', np.int32), ('box', np.float64, 4)])  # one yolo line
+STORE_FILES = 4096  # parsed label files kept by LabelStore, unsaved ones are never dropped
+TMP_PREFIX = '.easyboxer-'  # temp files of atomic writes, only these are cleaned up after a crash
+
+
+def parse_line(coordinate):  # (category, (x, y, w, h)) of one yolo line, None if malformed
+    try:
+        c, x, y, w, h = coordinate.split(' ')
+        return int(c), (float(x), float(y), float(w), float(h))
+    except ValueError:
+        return None
+
+
+def parse_array(code):  # (lines, malformed lines, int32 categories, float64 (n, 4) boxes) in one pass
+    lines = [line for line in code.split('\n') if line.strip()]
+    if not lines:
+        return lines, [], np.zeros(0, np.int32), np.zeros((0, 4))
+    try:  # usual case, whole file converted by numpy at once
+        rows = np.loadtxt(lines, dtype=LABEL_DTYPE, delimiter=' ', comments=None, ndmin=1)
+        return lines, [], rows['c'], rows['box']
+    except ValueError:
+        pass
+    parsed = [(line, parse_line(line)) for line in lines]  # line by line to find malformed ones
+    good = [(line, p) for line, p in parsed if p is not None]
+    return ([line for line, _ in good], [line for line, p in parsed if p is None],
+            np.array([p[0] for _, p in good], np.int32), np.array([p[1] for _, p in good], np.float64).reshape(-1, 4))
+
+
+def parse_labels(code):  # yolo label text to [(category, (x, y, w, h)), ...], malformed lines skipped
+    return [p for p in map(parse_line, code.split('\n')) if p is not None]  # repeat for more then 1 object
+
+
+def check_labels(code, nc=None):  # strict parse, ([(category, box)], [(line number, problem, line)])
+    labels, issues = [], []
+    for i, line in enumerate(code.split('\n'), 1):
+        if not line.strip():
+            continue
+        try:
+            c, x, y, w, h = line.split(' ')  # same split as viewer, anything else is skipped there
+            c, box = int(c), (float(x), float(y), float(w), float(h))
+        except ValueError:
+            issues.append((i, 'malformed', line))
+            continue
+        x, y, w, h = box
+        if c < 0 or (nc is not None and c >= nc):
+            issues.append((i, 'category', line))
+        elif w <= 0 or h <= 0:
+            issues.append((i, 'zero_area', line))
+        elif not (x - w / 2 >= -EDGE_TOL and y - h / 2 >= -EDGE_TOL and
+                  x + w / 2 <= 1 + EDGE_TOL and y + h / 2 <= 1 + EDGE_TOL):  # also false for nan
+            issues.append((i, 'out_of_range', line))
+        else:
+            labels.append((c, box))
+    return labels, issues
+
+
+def parse_boxes(code):  # yolo label text to [(x, y, w, h), ...], no category
+    return [box for _, box in parse_labels(code)]
+
+
+def count_classes(code):  # {category: number of boxes}
+    cls, n = np.unique(parse_array(code)[2], return_counts=True)
+    return dict(zip(cls.tolist(), n.tolist()))
+
+
+def format_box(category, box):  # yolo label line
+    return ' '.join([str(category)] + [str(v) for v in box])
+
+
+def corners_array(boxes, fx, fy):  # box_corners of (n, 4) boxes at once, int (n, 4) array
+    boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+    xy, half = boxes[:, :2] * (fx, fy), boxes[:, 2:] * (fx / 2, fy / 2)
+    return np.rint(np.hstack([xy - half, xy + half])).astype(np.int32)
+
+
+def box_corners(box, fx, fy):  # normalized center box to pixel corners (x1, y1, x2, y2) of fx * fy image
+    x, y, w, h = box
+    x1 = round(-fx / 2 * w + fx * x)
+    x2 = round(fx / 2 * w + fx * x)
+    y1 = round(-fy / 2 * h + fy * y)
+    y2 = round(fy / 2 * h + fy * y)
+    return x1, y1, x2, y2
+
+
+def corners_box(x1, y1, x2, y2, fx, fy):  # pixel corners of fx * fy image to normalized center box
+    x = round((x1 + x2) / 2 / fx, 4)
+    y = round((y1 + y2) / 2 / fy, 4)
+    w = round(abs(x1 - x2) / fx, 4)
+    h = round(abs(y1 - y2) / fy, 4)
+    return x, y, w, h
+
+
+def read_labels(path):  # label text, '' if no label file
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip('\n')
+    except FileNotFoundError:
+        return ''
+
+
+def write_labels(path, code):  # replace label file atomically, readers see old or new file, never half
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=TMP_PREFIX, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(code)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def file_stat(path):  # (mtime_ns, size), None if missing
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        return None
+
+
+class Labels:  # parsed label file of one image, rows as category ids and float32 boxes
+
+    def __init__(self, lines=(), extra=(), cls=None, boxes=None):
+        self.lines = list(lines)  # yolo line of each row, written back as is
+        self.extra = list(extra)  # malformed lines, kept at end of file
+        if cls is None:
+            _, _, cls, boxes = parse_array('\n'.join(self.lines))
+        self.cls = cls.astype(np.int32)
+        self.boxes = boxes.astype(np.float32).reshape(-1, 4)
+
+    @classmethod
+    def parse(cls, code):  # blank lines are dropped on rewrite
+        return cls(*parse_array(code))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def text(self):
+        return '\n'.join(self.lines + self.extra)
+
+    def counts(self):  # {category: number of boxes}
+        cls, n = np.unique(self.cls, return_counts=True)
+        return dict(zip(cls.tolist(), n.tolist()))
+
+    def add(self, category, box):
+        self.lines.append(format_box(category, box))
+        self.cls = np.append(self.cls, np.int32(category))
+        self.boxes = np.vstack([self.boxes, np.array(box, np.float32)])
+
+    def insert(self, row, line):  # valid yolo line at row
+        category, box = parse_line(line)
+        self.lines.insert(row, line)
+        self.cls = np.insert(self.cls, row, np.int32(category))
+        self.boxes = np.insert(self.boxes, row, np.array(box, np.float32), axis=0)
+
+    def remove(self, row):  # by position, identical lines elsewhere stay
+        del self.lines[row]
+        self.cls = np.delete(self.cls, row)
+        self.boxes = np.delete(self.boxes, row, axis=0)
+
+    def find(self, row, line):  # row of line, expected at row but may have moved since, -1 if gone
+        if row < len(self.lines) and self.lines[row] == line:
+            return row
+        return self.lines.index(line) if line in self.lines else -1
+
+    def replace(self, row, line):  # valid yolo line in place of row, box moved or resized
+        category, box = parse_line(line)
+        self.lines[row] = line
+        self.cls[row] = category
+        self.boxes[row] = box
+
+
+class LabelStore:  # parsed label files shared by viewer, list and overlay, edits saved in batches
+
+    def __init__(self, max_files=STORE_FILES):
+        self.max_files = max_files
+        self.files = OrderedDict()  # path -> (Labels, file_stat when read or written)
+        self.dirty = set()  # edited, not written yet
+        self.journal = None  # Journal, flushed writes are logged there first
+        self.lock = threading.Lock()
+
+    def get(self, path, packed=None):  # parsed labels, file is read only if changed outside of store and cache
+        stat = file_stat(path)
+        with self.lock:
+            entry = self.files.get(path)
+            if entry is not None and (path in self.dirty or entry[1] == stat):
+                self.files.move_to_end(path)
+                return entry[0]
+        labels = packed(stat[0] if stat else -1) if packed is not None else None  # Labels if mtime matches
+        if labels is None:
+            labels = Labels.parse(read_labels(path))
+        with self.lock:
+            if path in self.dirty:  # edited while reading
+                return self.files[path][0]
+            self.files[path] = (labels, stat)
+            self.trim()
+        return labels
+
+    def add(self, path, category, box):
+        labels = self.get(path)
+        with self.lock:
+            labels.add(category, box)
+            self.dirty.add(path)
+        return labels
+
+    def insert(self, path, row, line):
+        labels = self.get(path)
+        with self.lock:
+            labels.insert(row, line)
+            self.dirty.add(path)
+        return labels
+
+    def remove(self, path, row):
+        labels = self.get(path)
+        with self.lock:
+            labels.remove(row)
+            self.dirty.add(path)
+        return labels
+
+    def replace(self, path, row, line):
+        labels = self.get(path)
+        with self.lock:
+            labels.replace(row, line)
+            self.dirty.add(path)
+        return labels
+
+    def discard(self, path):  # file removed, unsaved edits dropped
+        with self.lock:
+            self.files.pop(path, None)
+            self.dirty.discard(path)
+
+    def flush(self):  # write edited files, {path: Labels} written
+        with self.lock:
+            written = {p: self.files[p][0] for p in self.dirty}
+            self.dirty.clear()
+        paths = list(written)
+        if self.journal is not None and paths:  # redo record first, interrupted writes are finished on next open
+            for p in paths:
+                self.journal.log({'t': 'write', 'lbl': p, 'text': written[p].text()})
+            self.journal.sync()
+        for i, p in enumerate(paths):
+            labels = written[p]
+            try:
+                write_labels(p, labels.text())
+            except OSError:
+                with self.lock:
+                    self.dirty.update(paths[i:])  # retried on next flush
+                raise
+            with self.lock:
+                self.files[p] = (labels, file_stat(p))  # own write is not a change
+        if self.journal is not None and paths:
+            self.journal.log({'t': 'done'})  # synced with next batch, redoing a finished write is harmless
+        return written
+
+    def trim(self):  # drop least recently used saved files
+        for p in list(self.files):
+            if len(self.files) <= self.max_files:
+                break
+            if p not in self.dirty:
+                del self.files[p]
@@ -0,0 +1,273 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+import numpy as np
+from .index import DatasetIndex
+from .labels import Labels, parse_array, read_labels
+from .pool import WORKERS, worker_pool
+
+PACKED_SUFFIX = '.labels'  # folder next to index database
+CHUNK = 512  # label files per worker task while building
+COMPACT = 1000  # overlay images above this are written into the arrays
+NO_FILE = -1  # mtime of image without label file
+UNPACKED = -2  # label file has malformed lines, kept in overlay as parsed
+ARRAYS = {'boxes': (np.float32, 4), 'classes': (np.int32, 0), 'offsets': (np.int64, 0), 'mtimes': (np.int64, 0),
+          'text': (np.uint8, 0), 'text_offsets': (np.int64, 0)}  # raw files, dtype and row width
+
+
+def mapped(path, dtype, shape):  # read-only memory map, empty file cannot be mapped
+    if not int(np.prod(shape)):
+        return np.zeros(shape, dtype)
+    return np.memmap(path, dtype, 'r', shape=shape)
+
+
+def label_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return NO_FILE
+
+
+def pack(items):  # [(lines, cls, boxes, mtime)] to one chunk of arrays
+    text = [('\n'.join(lines)).encode() for lines, _, _, _ in items]
+    return {'classes': np.concatenate([c for _, c, _, _ in items] + [np.zeros(0, np.int32)]).astype(np.int32),
+            'boxes': np.concatenate([b.reshape(-1, 4) for _, _, b, _ in items] + [np.zeros((0, 4))]).astype(np.float32),
+            'counts': np.array([len(c) for _, c, _, _ in items], np.int64),
+            'mtimes': np.array([m for _, _, _, m in items], np.int64),
+            'text': np.frombuffer(b''.join(text), np.uint8), 'lengths': np.array([len(t) for t in text], np.int64)}
+
+
+def read_chunk(args):  # worker, label files of consecutive images
+    lbl_dir, names = args
+    items = []
+    for name in names:
+        path = os.path.join(lbl_dir, Path(name).stem + '.txt')
+        mtime = label_mtime(path)
+        lines, extra, cls, boxes = parse_array(read_labels(path))
+        items.append(([], cls[:0], boxes[:0], UNPACKED) if extra else (lines, cls, boxes, mtime))
+    return pack(items)
+
+
+def names_key(index):  # images in order and label folder, arrays are rebuilt when it changes
+    h = hashlib.sha1(index.lbl_dir.encode())
+    for name, in index.db.execute('SELECT name FROM images ORDER BY seq'):
+        h.update(name.encode() + b'\n')
+    return h.hexdigest()
+
+
+def write(folder, key, chunks):  # stream chunks into raw files of a new folder, then swap it in
+    tmp = folder.with_name(folder.name + '.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    files = {k: open(tmp / f'{k}.bin', 'wb') for k in ARRAYS}
+    n = {'images': 0, 'boxes': 0, 'text': 0}
+    try:
+        files['offsets'].write(np.zeros(1, np.int64).tobytes())
+        files['text_offsets'].write(np.zeros(1, np.int64).tobytes())
+        for chunk in chunks:
+            for k in ('boxes', 'classes', 'mtimes', 'text'):
+                files[k].write(chunk[k].tobytes())
+            files['offsets'].write((np.cumsum(chunk['counts']) + n['boxes']).tobytes())
+            files['text_offsets'].write((np.cumsum(chunk['lengths']) + n['text']).tobytes())
+            n['images'] += len(chunk['counts'])
+            n['boxes'] += len(chunk['classes'])
+            n['text'] += len(chunk['text'])
+    finally:
+        for f in files.values():
+            f.close()
+    with open(tmp / 'meta.json', 'w') as f:
+        json.dump(dict(n, key=key), f)
+    old = folder.with_name(folder.name + '.old')
+    shutil.rmtree(old, ignore_errors=True)
+    if folder.exists():
+        folder.rename(old)
+    tmp.rename(folder)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+class PackedLabels:  # labels of indexed images memory-mapped in index order, edits since build in an overlay
+
+    def __init__(self, index, workers=WORKERS):
+        self.index = index
+        self.folder = Path(index.db_path).with_suffix(PACKED_SUFFIX)
+        self.workers = workers
+        self.overlay = {}  # image seq -> (Labels, mtime_ns), edited or changed outside since build
+        self.removed = set()  # image seqs held in trash, kept in overlay without boxes
+        key = names_key(index)
+        if not self.open(key):
+            self.build(key)
+            self.open(key)
+        db = np.fromiter((NO_FILE if m is None else m for m, in
+                          index.db.execute('SELECT lbl_mtime_ns FROM images ORDER BY seq')), np.int64, len(self))
+        stale = np.flatnonzero((db != self.mtimes) | (self.mtimes == UNPACKED))
+        if len(stale) > COMPACT:  # many files changed outside, reading them all again is as fast
+            self.build(key)
+            self.open(key)
+            stale = np.flatnonzero(self.mtimes == UNPACKED)
+        names = index.names() if len(stale) else []
+        for i in stale.tolist():
+            path = os.path.join(index.lbl_dir, Path(names[i]).stem + '.txt')
+            self.overlay[i] = (Labels.parse(read_labels(path)), label_mtime(path))
+
+    def open(self, key):  # map arrays of folder, False if missing or built for other images
+        try:
+            with open(self.folder / 'meta.json') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return False
+        if meta['key'] != key:
+            return False
+        m, n, t = meta['images'], meta['boxes'], meta['text']
+        shapes = {'boxes': (n, 4), 'classes': (n,), 'offsets': (m + 1,), 'mtimes': (m,), 'text': (t,),
+                  'text_offsets': (m + 1,)}
+        for k, (dtype, _) in ARRAYS.items():
+            setattr(self, k, mapped(self.folder / f'{k}.bin', dtype, shapes[k]))
+        return True
+
+    def build(self, key):  # read every label file on all cpu cores, chunks streamed to disk in order
+        names = self.index.names()
+        jobs = [(self.index.lbl_dir, names[i:i + CHUNK]) for i in range(0, len(names), CHUNK)]
+        self.release()
+        with worker_pool(max(1, min(self.workers, len(jobs)))) as pool:
+            write(self.folder, key, pool.imap(read_chunk, jobs))
+
+    def compact(self):  # write overlay into arrays, no label file is read
+        if not self.overlay:
+            return
+        key = names_key(self.index)
+
+        def chunks():
+            for start in range(0, len(self), CHUNK):
+                stop = min(start + CHUNK, len(self))
+                items = []
+                for i in range(start, stop):
+                    if i in self.overlay:
+                        labels, mtime = self.overlay[i]
+                        items.append(([], labels.cls[:0], labels.boxes[:0], UNPACKED) if labels.extra else
+                                     (labels.lines, labels.cls, labels.boxes, mtime))
+                    else:
+                        cls, boxes = self.arrays(i)
+                        items.append((self.lines(i), cls, boxes, self.mtimes[i]))
+                yield pack(items)
+        tmp = self.folder.with_name(self.folder.name + '.tmp')
+        write(tmp, key, chunks())  # old arrays are read while the new ones are written
+        self.release()
+        shutil.rmtree(self.folder, ignore_errors=True)
+        tmp.rename(self.folder)
+        unpacked = {i: v for i, v in self.overlay.items() if v[0].extra}
+        self.open(key)
+        self.overlay = unpacked
+
+    def release(self):  # drop maps, files can be replaced
+        for k in ARRAYS:
+            setattr(self, k, None)
+
+    def close(self):  # big overlay is packed for next session, small one is read again from files
+        if len(self.overlay) > COMPACT:
+            self.compact()
+        self.release()
+
+    def __len__(self):
+        return len(self.mtimes)
+
+    def arrays(self, i):  # int32 categories and float32 (n, 4) boxes of image i, views of the map
+        if i in self.overlay:
+            labels = self.overlay[i][0]
+            return labels.cls, labels.boxes
+        a, b = self.offsets[i], self.offsets[i + 1]
+        return self.classes[a:b], self.boxes[a:b]
+
+    def lines(self, i):  # label lines of image i from packed text
+        text = self.text[self.text_offsets[i]:self.text_offsets[i + 1]].tobytes().decode()
+        return text.split('\n') if text else []
+
+    def labels(self, i, mtime_ns):  # Labels of image i, None if label file changed since (mtime differs)
+        if i in self.overlay:
+            labels, mtime = self.overlay[i]
+            return labels if mtime == mtime_ns else None
+        if self.mtimes[i] != mtime_ns:
+            return None
+        cls, boxes = self.arrays(i)
+        return Labels(self.lines(i), [], cls, boxes)
+
+    def update(self, name, labels, mtime_ns):  # label file of image was written by viewer
+        row = self.index.db.execute('SELECT seq FROM images WHERE name = ?', (name,)).fetchone()
+        if row is not None and row[0] < len(self):
+            self.overlay[row[0]] = (Labels(labels.lines, labels.extra, labels.cls, labels.boxes), mtime_ns)
+            self.removed.discard(row[0])
+
+    def remove(self, name):  # image held in trash, matches no query until updated again
+        row = self.index.db.execute('SELECT seq FROM images WHERE name = ?', (name,)).fetchone()
+        if row is not None and row[0] < len(self):
+            self.overlay[row[0]] = (Labels(), NO_FILE)
+            self.removed.add(row[0])
+
+    def counts(self, mask):  # matching boxes per image, mask over packed boxes
+        total = np.concatenate([[0], np.cumsum(mask, dtype=np.int64)])
+        return total[self.offsets[1:]] - total[self.offsets[:-1]]
+
+    def query(self, category=None, min_boxes=0, max_side=None):  # images with more than min_boxes matching boxes
+        mask = np.ones(len(self.classes), bool)
+        if category is not None:
+            mask &= self.classes == category
+        if max_side is not None:  # smaller side of box under this fraction of image
+            mask &= self.boxes[:, 2:].min(1) < max_side
+        n = self.counts(mask)
+        for i, (labels, _) in self.overlay.items():
+            m = np.ones(len(labels), bool)
+            if category is not None:
+                m &= labels.cls == category
+            if max_side is not None:
+                m &= labels.boxes[:, 2:].min(1) < max_side
+            n[i] = m.sum()
+        return np.flatnonzero(n > min_boxes).tolist()
+
+    def stats(self):  # dataset summary without reading label files
+        keep = np.ones(len(self.classes), bool)
+        for i in self.overlay:
+            keep[self.offsets[i]:self.offsets[i + 1]] = False
+        cls = np.concatenate([self.classes[keep]] + [labels.cls for labels, _ in self.overlay.values()])
+        boxes = np.concatenate([self.boxes[keep]] + [labels.boxes for labels, _ in self.overlay.values()])
+        n = np.diff(self.offsets)
+        for i, (labels, _) in self.overlay.items():
+            n[i] = len(labels)
+        classes, counts = np.unique(cls, return_counts=True)
+        q = [0, 0.05, 0.5, 0.95, 1]
+        return {'images': len(self) - len(self.removed), 'labeled': int((n > 0).sum()), 'boxes': len(cls),
+                'max_boxes': int(n.max()) if len(n) else 0,
+                'classes': dict(zip(classes.tolist(), counts.tolist())),
+                'width': np.quantile(boxes[:, 2], q).round(4).tolist() if len(boxes) else [],
+                'height': np.quantile(boxes[:, 3], q).round(4).tolist() if len(boxes) else []}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.packed', description='packed label cache')
+    parser.add_argument('images', help='image folder')
+    parser.add_argument('labels', help='label folder')
+    parser.add_argument('--category', type=int, help='print images containing category')
+    parser.add_argument('--min-boxes', type=int, default=0, help='print images with more matching boxes')
+    parser.add_argument('--max-side', type=float, help='only boxes with a side under this fraction match')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes')
+    opt = parser.parse_args(argv)
+    index = DatasetIndex(opt.images, opt.labels)
+    try:
+        index.refresh()
+        packed = PackedLabels(index, opt.workers)
+        if opt.category is not None or opt.min_boxes or opt.max_side is not None:
+            names = index.names()
+            for i in packed.query(opt.category, opt.min_boxes, opt.max_side):
+                print(names[i])
+        else:
+            print(json.dumps(packed.stats()))
+        packed.close()
+    finally:
+        index.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
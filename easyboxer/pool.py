@@ -0,0 +1,8 @@
+import multiprocessing
+import os
+
+WORKERS = max(1, (os.cpu_count() or 2) - 1)  # one core left for the viewer
+
+
+def worker_pool(processes=WORKERS, initializer=None, initargs=()):  # spawned, fork would copy Qt and decoder threads
+    return multiprocessing.get_context('spawn').Pool(processes, initializer, initargs)
@@ -0,0 +1,344 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+from pathlib import Path
+import cv2
+import numpy as np
+from .dataset import list_images
+from .image import decode_image, fit_factor, read_size
+from .pool import WORKERS, worker_pool
+from .spatial import box_iou
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+CACHE_DB = Path.home() / '.cache' / 'easyboxer' / 'proposals.db'  # shared by datasets, keyed by image content
+INPUT_SIZE = 640  # model input side
+SCORE = 0.25  # proposals below this confidence are dropped
+IOU = 0.45  # non-maximum suppression overlap, per category
+MAX_PROPOSALS = 300  # per image, highest scores kept
+BATCH = 8  # images per worker task and per forward pass
+SHOWN_IOU = 0.7  # proposal overlapping a label this much is hidden, already accepted or drawn
+TINY_SIZE = 32  # input side of tiny_model
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT);
+CREATE TABLE IF NOT EXISTS proposals (hash TEXT, model TEXT, boxes TEXT, PRIMARY KEY (hash, model)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rejected (hash TEXT, model TEXT, idx INTEGER, PRIMARY KEY (hash, model, idx)) WITHOUT ROWID;
+'''
+
+
+def model_key(path, size=INPUT_SIZE, score=SCORE, iou=IOU):  # model file content and settings, proposals depend on all
+    h = hashlib.sha1(f'{size}|{score}|{iou}|'.encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def letterbox(img, size):  # resized into size x size keeping aspect, gray padded; (input, (w, h), (pad x, pad y))
+    h, w = img.shape[:2]
+    s = size / max(h, w)
+    nw, nh = max(1, round(w * s)), max(1, round(h * s))
+    out = np.full((size, size, 3), 114, np.uint8)
+    px, py = (size - nw) // 2, (size - nh) // 2
+    out[py:py + nh, px:px + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_AREA if s < 1 else cv2.INTER_LINEAR)
+    return out, (nw, nh), (px, py)
+
+
+def decode(out, fit, pad, score=SCORE, iou=IOU):  # yolo head output of one image to [(category, (x, y, w, h), score)]
+    out = np.asarray(out, np.float32).reshape(out.shape[-2:])
+    if out.shape[0] < out.shape[1]:  # yolov8 (4 + nc, anchors), class scores only
+        out = out.T
+        conf = out[:, 4:]
+    else:  # yolov5 (anchors, 5 + nc), objectness times class score
+        conf = out[:, 5:] * out[:, 4:5]
+    cls = conf.argmax(1)
+    best = conf[np.arange(len(conf)), cls]
+    keep = best >= score
+    xywh, cls, best = out[keep, :4], cls[keep], best[keep]
+    (nw, nh), (px, py) = fit, pad
+    x1 = np.clip((xywh[:, 0] - xywh[:, 2] / 2 - px) / nw, 0, 1)  # input pixels to normalized image, clipped to it
+    y1 = np.clip((xywh[:, 1] - xywh[:, 3] / 2 - py) / nh, 0, 1)
+    x2 = np.clip((xywh[:, 0] + xywh[:, 2] / 2 - px) / nw, 0, 1)
+    y2 = np.clip((xywh[:, 1] + xywh[:, 3] / 2 - py) / nh, 0, 1)
+    keep = (x2 > x1) & (y2 > y1)
+    x1, y1, x2, y2, cls, best = x1[keep], y1[keep], x2[keep], y2[keep], cls[keep], best[keep]
+    if not len(best):
+        return []
+    shifted = np.column_stack([x1 + cls * 2, y1, x2 - x1, y2 - y1])  # categories apart, one suppression call
+    idx = np.asarray(cv2.dnn.NMSBoxes(shifted.tolist(), best.tolist(), score, iou), np.int64).reshape(-1)
+    idx = idx[np.argsort(-best[idx], kind='stable')][:MAX_PROPOSALS]
+    return [(int(cls[i]), (round(float(x1[i] + x2[i]) / 2, 4), round(float(y1[i] + y2[i]) / 2, 4),
+                           round(float(x2[i] - x1[i]), 4), round(float(y2[i] - y1[i]), 4)), round(float(best[i]), 4))
+            for i in idx]
+
+
+class Model:  # onnx detector on cpu through onnxruntime if installed, else OpenCV DNN
+
+    def __init__(self, path, backend='auto', size=INPUT_SIZE):
+        self.size = size
+        self.backend = ('onnxruntime' if onnxruntime is not None else 'opencv') if backend == 'auto' else backend
+        self.batched = True  # False once model rejected a batch, fixed batch 1 export
+        if self.backend == 'onnxruntime':
+            if onnxruntime is None:
+                raise ImportError('onnxruntime is not installed')
+            opts = onnxruntime.SessionOptions()
+            opts.intra_op_num_threads = 1  # parallel over workers instead
+            self.session = onnxruntime.InferenceSession(str(path), opts, providers=['CPUExecutionProvider'])
+            self.input = self.session.get_inputs()[0]
+            self.batched = not isinstance(self.input.shape[0], int) or self.input.shape[0] != 1
+        else:
+            self.net = cv2.dnn.readNetFromONNX(str(path))
+
+    def forward(self, blob):
+        if self.backend == 'onnxruntime':
+            return self.session.run(None, {self.input.name: blob})[0]
+        self.net.setInput(blob)
+        return self.net.forward()
+
+    def __call__(self, imgs, score=SCORE, iou=IOU):  # proposals of each image
+        boxed = [letterbox(img, self.size) for img in imgs]
+        blob = cv2.dnn.blobFromImages([b[0] for b in boxed], 1 / 255, (self.size, self.size), swapRB=True)
+        outs = None
+        if self.batched and len(imgs) > 1:
+            try:
+                outs = self.forward(blob)
+            except cv2.error:
+                self.batched = False
+        if outs is None:
+            outs = np.concatenate([self.forward(blob[i:i + 1]) for i in range(len(imgs))])
+        return [decode(out, fit, pad, score, iou) for out, (_, fit, pad) in zip(outs, boxed)]
+
+
+def check_model(path, backend='auto', size=INPUT_SIZE):  # load and run once here, bad model never reaches workers
+    Model(path, backend, size)([np.zeros((size, size, 3), np.uint8)])
+
+
+model = None  # Model of worker process, or exception loading it raised
+
+
+def init_worker(path, backend, size):
+    global model
+    cv2.setNumThreads(1)  # parallel over workers instead
+    try:
+        model = Model(path, backend, size)
+    except Exception as e:  # raised by first task, failing initializer would respawn workers forever
+        model = e
+
+
+def detect_files(args):  # worker, [(path, size, mtime_ns, hash, proposals)] of a batch, proposals None if unreadable
+    if isinstance(model, Exception):
+        raise model
+    paths, score, iou = args
+    results, imgs, decoded = [], [], []
+    for p in paths:
+        try:
+            st = os.stat(p)
+            with open(p, 'rb') as f:
+                data = f.read()
+        except OSError:
+            results.append((p, None, None, None, None))
+            continue
+        img = decode_image(data, fit_factor(read_size(io.BytesIO(data)), (model.size, model.size)))
+        if img is None:
+            results.append((p, st.st_size, st.st_mtime_ns, None, None))
+            continue
+        imgs.append(img)
+        decoded.append((p, st.st_size, st.st_mtime_ns, hashlib.sha1(data).hexdigest()))
+    if imgs:
+        results += [d + (props,) for d, props in zip(decoded, model(imgs, score, iou))]
+    return results
+
+
+class ProposalCache:  # model proposals by image content hash, resumable and shared between folders
+
+    def __init__(self, path=CACHE_DB):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path), timeout=30)  # viewer reads while prelabel thread writes
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def meta(self, key, value=None):  # read, or write if value given
+        if value is not None:
+            with self.db:
+                self.db.execute('REPLACE INTO meta VALUES (?, ?)', (key, value))
+            return value
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def digest(self, path):  # content hash of unchanged file, None if not seen or changed since
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        row = self.db.execute('SELECT size, mtime_ns, hash FROM files WHERE path = ?', (str(path),)).fetchone()
+        return row[2] if row and row[:2] == (st.st_size, st.st_mtime_ns) else None
+
+    def pending(self, paths, model):  # paths without proposals of model, or changed since
+        done = {p: (size, mtime) for p, size, mtime in self.db.execute(
+            'SELECT f.path, f.size, f.mtime_ns FROM files f JOIN proposals r ON r.hash = f.hash WHERE r.model = ?',
+            (model,))}
+        todo = []
+        for p in map(str, paths):
+            if p in done:
+                try:
+                    st = os.stat(p)
+                    if done[p] == (st.st_size, st.st_mtime_ns):
+                        continue
+                except OSError:
+                    pass
+            todo.append(p)
+        return todo
+
+    def put(self, model, results):  # detect_files results, one transaction
+        with self.db:
+            for p, size, mtime, digest, props in results:
+                if digest is None:
+                    continue
+                self.db.execute('REPLACE INTO files VALUES (?, ?, ?, ?)', (p, size, mtime, digest))
+                boxes = [[c, *box, s] for c, box, s in props]
+                self.db.execute('REPLACE INTO proposals VALUES (?, ?, ?)', (digest, model, json.dumps(boxes)))
+
+    def get(self, path, model):  # [(index, category, box, score)] not rejected, None if not run on this image
+        digest = self.digest(path)
+        if digest is None:
+            return None
+        row = self.db.execute('SELECT boxes FROM proposals WHERE hash = ? AND model = ?', (digest, model)).fetchone()
+        if row is None:
+            return None
+        rejected = {i for i, in self.db.execute('SELECT idx FROM rejected WHERE hash = ? AND model = ?', (digest, model))}
+        return [(i, c, (x, y, w, h), s) for i, (c, x, y, w, h, s) in enumerate(json.loads(row[0])) if i not in rejected]
+
+    def reject(self, path, model, idx):  # hidden from now on, also after rerun
+        digest = self.digest(path)
+        if digest is not None:
+            with self.db:
+                self.db.execute('REPLACE INTO rejected VALUES (?, ?, ?)', (digest, model, idx))
+
+
+def shown(proposals, boxes):  # proposals not already covered by a label box
+    if not proposals or not len(boxes):
+        return proposals
+    overlap = box_iou(np.array([box for _, _, box, _ in proposals], np.float32), boxes).max(1)
+    return [p for p, o in zip(proposals, overlap) if o < SHOWN_IOU]
+
+
+def prelabel(paths, model_path, backend='auto', size=INPUT_SIZE, score=SCORE, iou=IOU, workers=WORKERS,
+             batch=BATCH, cache_path=CACHE_DB, progress=None, cancelled=None):  # run model on images not cached yet
+    cache = ProposalCache(cache_path)
+    try:
+        key = model_key(model_path, size, score, iou)
+        todo = cache.pending(paths, key)
+        total, done = len(todo), 0
+        if progress is not None:
+            progress(done, total, [])
+        if not todo:
+            return key, 0
+        check_model(model_path, backend, size)
+        jobs = [(todo[i:i + batch], score, iou) for i in range(0, total, batch)]
+        with worker_pool(min(workers, len(jobs)), init_worker, (str(model_path), backend, size)) as pool:
+            for results in pool.imap_unordered(detect_files, jobs):
+                cache.put(key, results)
+                done += len(results)
+                if progress is not None:
+                    progress(done, total, [r[0] for r in results])
+                if cancelled is not None and cancelled():  # finished batches stay cached, next run resumes
+                    pool.terminate()
+                    break
+        return key, done
+    finally:
+        cache.close()
+
+
+def pb_varint(n):
+    out = bytearray()
+    while True:
+        b, n = n & 0x7F, n >> 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def pb_field(num, value):  # protobuf field, int as varint, str/bytes length delimited
+    if isinstance(value, int):
+        return pb_varint(num << 3) + pb_varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return pb_varint(num << 3 | 2) + pb_varint(len(value)) + value
+
+
+def pb_tensor(name, array):  # onnx TensorProto, float32 or int64
+    dtype = 7 if array.dtype == np.int64 else 1
+    array = array.astype('<i8' if dtype == 7 else '<f4')
+    return b''.join(pb_field(1, d) for d in array.shape) + pb_field(2, dtype) + pb_field(8, name) + \
+        pb_field(9, array.tobytes())
+
+
+def pb_value(name, shape):  # onnx ValueInfoProto of float tensor
+    dims = b''.join(pb_field(1, pb_field(1, d)) for d in shape)
+    return pb_field(1, name) + pb_field(2, pb_field(1, pb_field(1, 1) + pb_field(2, dims)))
+
+
+def tiny_model(path, size=TINY_SIZE):  # yolov8 style onnx of 8 fixed tiles scored by brightness, for smoke runs
+    cols, rows = 4, 2
+    a, tw, th = cols * rows, size // cols, size // rows
+    weight = np.zeros((5 * a, 3, size, size), np.float32)  # channel k is attribute k // a of tile k % a
+    bias = np.zeros(5 * a, np.float32)
+    for i in range(a):
+        c, r = i % cols, i // cols
+        bias[[i, a + i, 2 * a + i, 3 * a + i]] = (c + 0.5) * tw, (r + 0.5) * th, tw, th
+        weight[4 * a + i, :, r * th:(r + 1) * th, c * tw:(c + 1) * tw] = 1 / (3 * tw * th)  # mean of tile
+    kernel = pb_field(1, 'kernel_shape') + pb_field(20, 7) + pb_field(8, size) + pb_field(8, size)
+    conv = pb_field(1, 'images') + pb_field(1, 'weight') + pb_field(1, 'bias') + pb_field(2, 'feat') + \
+        pb_field(3, 'conv') + pb_field(4, 'Conv') + pb_field(5, kernel)
+    reshape = pb_field(1, 'feat') + pb_field(1, 'shape') + pb_field(2, 'output') + pb_field(3, 'reshape') + \
+        pb_field(4, 'Reshape')
+    graph = pb_field(1, conv) + pb_field(1, reshape) + pb_field(2, 'tiny') + \
+        pb_field(5, pb_tensor('weight', weight)) + pb_field(5, pb_tensor('bias', bias)) + \
+        pb_field(5, pb_tensor('shape', np.array([-1, 5, a], np.int64))) + \
+        pb_field(11, pb_value('images', (1, 3, size, size))) + pb_field(12, pb_value('output', (1, 5, a)))
+    model = pb_field(1, 7) + pb_field(2, 'easyboxer') + pb_field(7, graph) + \
+        pb_field(8, pb_field(1, '') + pb_field(2, 13))
+    with open(path, 'wb') as f:
+        f.write(model)
+    return str(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.prelabel', description='cache model proposals of images')
+    parser.add_argument('model', help='onnx detector (yolov5 / yolov8 head), "tiny" writes and uses a test model')
+    parser.add_argument('images', help='image folder')
+    parser.add_argument('--backend', default='auto', choices=['auto', 'opencv', 'onnxruntime'])
+    parser.add_argument('--size', type=int, default=None, help=f'model input side, default {INPUT_SIZE}')
+    parser.add_argument('--score', type=float, default=SCORE)
+    parser.add_argument('--iou', type=float, default=IOU)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--batch', type=int, default=BATCH)
+    parser.add_argument('--cache', default=str(CACHE_DB), help='proposal database')
+    opt = parser.parse_args(argv)
+    size = opt.size or INPUT_SIZE
+    if opt.model == 'tiny':
+        size = opt.size or TINY_SIZE
+        opt.model = tiny_model(Path(opt.cache).parent / 'tiny.onnx', size)
+
+    def progress(done, total, _):
+        print(f'\r{done}/{total}', end='', file=sys.stderr)
+    key, n = prelabel(list_images(opt.images), opt.model, opt.backend, size, opt.score, opt.iou, opt.workers,
+                      opt.batch, opt.cache, progress)
+    print(file=sys.stderr)
+    print(json.dumps({'model': key, 'images': n}))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,210 @@
+import hashlib
+import math
+import os
+import tempfile
+import threading
+from pathlib import Path
+import cv2
+import numpy as np
+from .image import load_image
+from .trace import tracer
+
+try:
+    import tifffile  # optional, tiled tiff is read tile by tile instead of decoded whole
+except ImportError:
+    tifffile = None
+
+TILE = 512  # pyramid tile side in pixels
+PYRAMID_PIXELS = 1 << 26  # images above this (~67MP) are shown through the pyramid
+OVERVIEW_FACTOR = 8  # decode scale shown while pyramid is being built
+CACHE_DIR = Path.home() / '.cache' / 'easyboxer' / 'pyramids'
+
+
+def is_huge(size):
+    return size is not None and size[0] * size[1] > PYRAMID_PIXELS
+
+
+def to_bgr(img):  # tiff samples to 8 bit bgr
+    if img.dtype != np.uint8:
+        img = (img >> (8 * img.dtype.itemsize - 8)).astype(np.uint8) if img.dtype.kind == 'u' else \
+            cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+    if img.ndim == 2 or img.shape[2] == 1:
+        return cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    if img.shape[2] == 4:
+        return cv2.cvtColor(img, cv2.COLOR_RGBA2BGR)
+    return cv2.cvtColor(img[..., :3], cv2.COLOR_RGB2BGR)
+
+
+class ArrayTiles:  # full resolution from one whole decode, for formats without tiles
+
+    def __init__(self, path):
+        self.img = load_image(path)
+        if self.img is None:
+            raise ValueError(f'cannot decode {path}')
+
+    def read(self, x, y, w, h):
+        return self.img[y:y + h, x:x + w]
+
+    def close(self):  # array is freed with the last reference, readers may still hold it
+        pass
+
+
+class TiffTiles:  # full resolution straight from tiled tiff, only overlapping tiles are decoded
+
+    def __init__(self, path):
+        self.tif = tifffile.TiffFile(path)
+        self.page = self.tif.pages[0]
+        if not self.page.is_tiled:
+            self.tif.close()
+            raise ValueError(f'{path} is not tiled')
+        self.tw, self.th = self.page.tilewidth, self.page.tilelength
+        self.across = math.ceil(self.page.imagewidth / self.tw)
+        self.lock = threading.Lock()  # one file handle
+
+    def tile(self, i):
+        with self.lock:
+            fh = self.tif.filehandle
+            fh.seek(self.page.dataoffsets[i])
+            data = fh.read(self.page.databytecounts[i])
+        segment = self.page.decode(data, i, jpegtables=self.page.jpegtables)[0]
+        return to_bgr(segment.reshape(segment.shape[-3:]))
+
+    def read(self, x, y, w, h):
+        w = min(w, self.page.imagewidth - x)
+        h = min(h, self.page.imagelength - y)
+        out = np.empty((h, w, 3), np.uint8)
+        for ty in range(y // self.th, (y + h - 1) // self.th + 1):
+            for tx in range(x // self.tw, (x + w - 1) // self.tw + 1):
+                tile = self.tile(ty * self.across + tx)
+                ox, oy = tx * self.tw, ty * self.th
+                x0, y0 = max(x, ox), max(y, oy)
+                x1, y1 = min(x + w, ox + self.tw), min(y + h, oy + self.th)
+                out[y0 - y:y1 - y, x0 - x:x1 - x] = tile[y0 - oy:y1 - oy, x0 - ox:x1 - ox]
+        return out
+
+    def close(self):
+        with self.lock:
+            self.tif.close()
+
+
+def open_tiles(path):
+    if tifffile is not None and Path(path).suffix.lower() in ('.tif', '.tiff'):
+        try:
+            return TiffTiles(path)
+        except (ValueError, tifffile.TiffFileError):
+            pass
+    return ArrayTiles(path)
+
+
+class TilePyramid:  # multi-resolution tiles of a very large image, built in background and kept on disk
+    # level 0 is full resolution, each level halves the previous one, top level fits in one tile
+
+    def __init__(self, path, size, cache, root=CACHE_DIR):
+        self.path = str(path)
+        self.size = size
+        self.cache = cache  # FrameCache for decoded tiles
+        st = os.stat(self.path)
+        key = hashlib.sha1(f'{self.path}|{st.st_size}|{st.st_mtime_ns}'.encode()).hexdigest()
+        self.dir = Path(root) / key
+        self.levels = 1
+        while max(size) > TILE << (self.levels - 1):
+            self.levels += 1
+        self.built = (self.dir / 'done').exists()
+        self.source = None  # full resolution reader while building
+        self.cancelled = False
+
+    def level_size(self, level):
+        return -(-self.size[0] >> level), -(-self.size[1] >> level)
+
+    def level_for(self, viewport, view):  # coarsest level that still has a pixel per display pixel
+        x0, y0, x1, y1 = viewport
+        density = min((x1 - x0) * self.size[0] / max(view[0], 1), (y1 - y0) * self.size[1] / max(view[1], 1))
+        return min(max(int(math.log2(density)), 0), self.levels - 1) if density >= 1 else 0
+
+    def tile_path(self, level, tx, ty):
+        return self.dir / str(level) / f'{ty}_{tx}.jpg'
+
+    def tile(self, level, tx, ty):  # decoded tile from memory or disk, None if not built yet
+        key = (self.path, 'tile', level, tx, ty)
+        img = self.cache.get(key)
+        if img is None:
+            source = self.source  # cleared by build when done
+            if level == 0 and source is not None:
+                img = source.read(tx * TILE, ty * TILE, TILE, TILE)
+            else:
+                p = self.tile_path(level, tx, ty)
+                if not p.exists():
+                    return None
+                img = load_image(p)
+                if img is None:
+                    return None
+            self.cache.put(key, img)
+        return img
+
+    def write(self, level, tx, ty, img):  # atomic, half written tiles never show up
+        p = self.tile_path(level, tx, ty)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 92])
+        fd, tmp = tempfile.mkstemp(dir=p.parent, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buf.tobytes())
+        os.replace(tmp, p)
+
+    def build(self):  # background, bottom up, each tile made from four of the level below
+        if self.built:
+            return True
+        with tracer.span('pyramid_source'):
+            self.source = open_tiles(self.path)
+        try:
+            for level in range(self.levels):
+                lw, lh = self.level_size(level)
+                for ty in range(-(-lh // TILE)):
+                    for tx in range(-(-lw // TILE)):
+                        if self.cancelled:
+                            return False
+                        if self.tile_path(level, tx, ty).exists():  # resume interrupted build
+                            continue
+                        with tracer.span('pyramid_tile'):
+                            if level == 0:
+                                img = self.source.read(tx * TILE, ty * TILE, TILE, TILE)
+                            else:
+                                img = self.compose(level - 1, 2 * tx, 2 * ty, 2, 2)
+                                img = cv2.resize(img, (-(-img.shape[1] // 2), -(-img.shape[0] // 2)),
+                                                 interpolation=cv2.INTER_AREA)
+                            self.write(level, tx, ty, img)
+            (self.dir / 'done').touch()
+            self.built = True
+            return True
+        finally:
+            self.source.close()
+            self.source = None
+
+    def compose(self, level, tx0, ty0, nx, ny):  # nx * ny tiles from (tx0, ty0) pasted together, None if missing
+        lw, lh = self.level_size(level)
+        nx = min(nx, -(-lw // TILE) - tx0)
+        ny = min(ny, -(-lh // TILE) - ty0)
+        w = min((tx0 + nx) * TILE, lw) - tx0 * TILE
+        h = min((ty0 + ny) * TILE, lh) - ty0 * TILE
+        out = np.empty((h, w, 3), np.uint8)
+        for j in range(ny):
+            for i in range(nx):
+                tile = self.tile(level, tx0 + i, ty0 + j)
+                if tile is None:
+                    return None
+                out[j * TILE:j * TILE + tile.shape[0], i * TILE:i * TILE + tile.shape[1]] = tile
+        return out
+
+    def render(self, viewport, view):  # (frame, region, level) covering viewport, None if tiles aren't ready
+        level = self.level_for(viewport, view)
+        if not self.built and level > 0:
+            return None
+        lw, lh = self.level_size(level)
+        x0, y0, x1, y1 = viewport
+        tx0, ty0 = int(x0 * lw) // TILE, int(y0 * lh) // TILE
+        tx1, ty1 = -(-math.ceil(x1 * lw) // TILE), -(-math.ceil(y1 * lh) // TILE)
+        frame = self.compose(level, tx0, ty0, tx1 - tx0, ty1 - ty0)
+        if frame is None:
+            return None
+        h, w = frame.shape[:2]
+        region = (tx0 * TILE / lw, ty0 * TILE / lh, (tx0 * TILE + w) / lw, (ty0 * TILE + h) / lh)
+        return frame, region, level
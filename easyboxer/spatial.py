@@ -0,0 +1,67 @@
+import numpy as np
+
+CELL_BOXES = 4  # average boxes per grid cell
+BOX_CELLS = 2  # median box spans about this many cells per side, finer grid only repeats boxes
+MAX_SIDE = 256  # grid cells per side at most
+BIG_CELLS = 64  # boxes covering more cells are kept in one list checked for every query
+
+
+def center_corners(boxes):  # normalized center boxes (n, 4) to corners x1, y1, x2, y2
+    boxes = np.asarray(boxes, np.float32).reshape(-1, 4)
+    half = boxes[:, 2:] / 2
+    return np.hstack([boxes[:, :2] - half, boxes[:, :2] + half])
+
+
+def box_iou(a, b):  # (n, m) intersection over union of normalized center boxes
+    a, b = center_corners(a)[:, None], center_corners(b)[None]
+    w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = w * h
+    union = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1]) + (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1]) - inter
+    return inter / np.maximum(union, 1e-12)
+
+
+class BoxGrid:  # uniform grid over normalized boxes of one image, a point query reads one cell
+
+    def __init__(self, boxes):
+        self.corners = center_corners(boxes)
+        self.area = (self.corners[:, 2] - self.corners[:, 0]) * (self.corners[:, 3] - self.corners[:, 1])
+        n = len(self.corners)
+        span = np.median(np.maximum(self.corners[:, 2] - self.corners[:, 0], self.corners[:, 3] - self.corners[:, 1])) \
+            if n else 1.0
+        self.side = int(min(MAX_SIDE, np.sqrt(n / CELL_BOXES), BOX_CELLS / max(span, 1e-6)))
+        self.side = max(1, self.side)
+        c = self.cell(self.corners)  # cell range cx0, cy0, cx1, cy1 of each box
+        nx, ny = c[:, 2] - c[:, 0] + 1, c[:, 3] - c[:, 1] + 1
+        big = nx * ny > BIG_CELLS
+        self.big = np.flatnonzero(big)
+        ids = np.flatnonzero(~big)
+        count = (nx * ny)[ids]
+        ids = np.repeat(ids, count)  # one entry per covered cell
+        k = np.arange(len(ids)) - np.repeat(np.cumsum(count) - count, count)
+        cells = (c[ids, 1] + k // nx[ids]) * self.side + c[ids, 0] + k % nx[ids]
+        order = np.argsort(cells, kind='stable')
+        self.ids = ids[order]
+        self.starts = np.searchsorted(cells[order], np.arange(self.side * self.side + 1))
+
+    def __len__(self):
+        return len(self.corners)
+
+    def cell(self, v):  # cell coordinates of normalized values
+        return np.clip((np.asarray(v) * self.side).astype(np.int64), 0, self.side - 1)
+
+    def candidates(self, x1, y1, x2, y2):  # boxes whose cells overlap the region, may not touch it
+        cx0, cy0, cx1, cy1 = self.cell((x1, y1, x2, y2)).tolist()
+        parts = [self.ids[self.starts[cy * self.side + cx0]:self.starts[cy * self.side + cx1 + 1]]
+                 for cy in range(cy0, cy1 + 1)]
+        return np.unique(np.concatenate(parts + [self.big]))
+
+    def at(self, x, y, tx=0.0, ty=0.0):  # boxes containing point within tolerance, smallest first
+        i = self.candidates(x - tx, y - ty, x + tx, y + ty)
+        c = self.corners[i]
+        i = i[(c[:, 0] - tx <= x) & (x <= c[:, 2] + tx) & (c[:, 1] - ty <= y) & (y <= c[:, 3] + ty)]
+        return i[np.argsort(self.area[i], kind='stable')]
+
+    def pick(self, x, y, tx=0.0, ty=0.0):  # smallest box at point, -1 if none
+        i = self.at(x, y, tx, ty)
+        return int(i[0]) if len(i) else -1
@@ -0,0 +1,41 @@
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+import cv2
+from .image import load_image, reduce_factor
+
+THUMB_SIZE = 128  # longest side of thumbnail
+CACHE_DIR = Path.home() / '.cache' / 'easyboxer' / 'thumbs'
+
+
+class ThumbCache:  # content-addressed thumbnail files keyed by path, mtime and size
+
+    def __init__(self, root=CACHE_DIR, size=THUMB_SIZE):
+        self.root = Path(root)
+        self.size = size
+
+    def path(self, img_path, file_size, mtime_ns):  # cache file of image, may not exist yet
+        key = hashlib.sha1(f'{img_path}|{mtime_ns}|{file_size}|{self.size}'.encode()).hexdigest()
+        return self.root / key[:2] / (key + '.jpg')
+
+    def get(self, img_path, file_size, mtime_ns):  # cache file, generated on miss, None if image is broken
+        p = self.path(img_path, file_size, mtime_ns)
+        if p.exists():
+            return str(p)
+        img = load_image(img_path, reduce_factor(img_path, (self.size, self.size)))
+        if img is None:
+            return None
+        h, w = img.shape[:2]
+        scale = self.size / max(h, w)
+        if scale < 1:
+            img = cv2.resize(img, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
+        ok, buf = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            return None
+        p.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=p.parent, suffix='.tmp')  # other workers never see half written file
+        with os.fdopen(fd, 'wb') as f:
+            f.write(buf.tobytes())
+        os.replace(tmp, p)
+        return str(p)
@@ -0,0 +1,72 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+MAX_EVENTS = 200000  # oldest trace events dropped first
+
+NULL_SPAN = contextlib.nullcontext()  # shared, entering it costs almost nothing
+
+
+class Span:
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.add(self.name, self.start, time.perf_counter_ns() - self.start)
+
+
+class Tracer:  # per-stage timings and counters of the display pipeline
+
+    def __init__(self):
+        self.enabled = bool(os.environ.get('EASYBOXER_TRACE'))
+        self.events = deque(maxlen=MAX_EVENTS)
+        self.last = {}  # stage -> last duration in ms
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def span(self, name):  # with tracer.span('imdecode'): ...
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def add(self, name, start_ns, dur_ns):
+        with self.lock:
+            self.last[name] = dur_ns / 1e6
+            self.events.append((name, start_ns, dur_ns, threading.get_ident()))
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + n
+
+    def clear(self):
+        with self.lock:
+            self.events.clear()
+            self.last.clear()
+            self.counters.clear()
+
+    def summary(self):  # one line for status bar
+        with self.lock:
+            stages = ' '.join(f'{k} {v:.1f}' for k, v in self.last.items())
+            counters = ' '.join(f'{k} {v}' for k, v in sorted(self.counters.items()))
+        return f'{stages} ms | {counters}' if counters else (f'{stages} ms' if stages else '')
+
+    def export(self, path):  # chrome://tracing or perfetto json
+        pid = os.getpid()
+        with self.lock:
+            events = [{'name': name, 'ph': 'X', 'ts': start / 1e3, 'dur': dur / 1e3, 'pid': pid, 'tid': tid}
+                      for name, start, dur, tid in self.events]
+            events += [{'name': name, 'ph': 'C', 'ts': time.perf_counter_ns() / 1e3, 'pid': pid, 'args': {name: n}}
+                       for name, n in self.counters.items()]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+tracer = Tracer()  # process wide, disabled unless EASYBOXER_TRACE is set or switched on in GUI
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import sys
+from bisect import bisect_right
+from pathlib import Path
+from .dataset import is_image
+from .labels import check_labels, read_labels
+from .pool import WORKERS, worker_pool
+
+SIZE_BINS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5]  # box size sqrt(w * h) histogram edges, last bin up to 1
+
+
+def stems(folder, match):  # {stem: file name}, single os.scandir pass
+    with os.scandir(folder) as it:
+        return {e.name.rsplit('.', 1)[0]: e.name for e in it if match(e.name) and e.is_file()}
+
+
+def check_file(args):  # worker, summary of one label file
+    path, nc = args
+    labels, issues = check_labels(read_labels(path), nc)
+    classes = {}
+    sizes = [0] * (len(SIZE_BINS) + 1)
+    for c, (_, _, w, h) in labels:
+        classes[c] = classes.get(c, 0) + 1
+        sizes[bisect_right(SIZE_BINS, (w * h) ** 0.5)] += 1
+    return path, len(labels), classes, sizes, issues
+
+
+def read_names(path):  # category names, one per line
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def validate(img_dir, lbl_dir, nc=None, workers=WORKERS, report=print):  # stream issues to report, return summary
+    images = stems(img_dir, is_image)
+    labels = stems(lbl_dir, lambda name: name.endswith('.txt'))
+    summary = {'type': 'summary', 'images': len(images), 'labels': len(labels), 'boxes': 0,
+               'issues': {}, 'classes': {}, 'box_sizes': [0] * (len(SIZE_BINS) + 1)}
+
+    def issue(kind, **kw):
+        summary['issues'][kind] = summary['issues'].get(kind, 0) + 1
+        report(json.dumps({'type': kind, **kw}, ensure_ascii=False))
+
+    jobs = ((os.path.join(lbl_dir, name), nc) for name in labels.values())
+    with worker_pool(workers) as pool:
+        for path, n, classes, sizes, issues in pool.imap_unordered(check_file, jobs, chunksize=256):
+            summary['boxes'] += n
+            for c, k in classes.items():
+                summary['classes'][c] = summary['classes'].get(c, 0) + k
+            summary['box_sizes'] = [a + b for a, b in zip(summary['box_sizes'], sizes)]
+            for line_no, kind, line in issues:
+                issue(kind, file=path, line=line_no, text=line)
+            if Path(path).stem not in images:
+                issue('orphan_label', file=path)
+    for stem in images.keys() - labels.keys():
+        issue('unlabeled_image', file=os.path.join(img_dir, images[stem]))
+    summary['classes'] = dict(sorted(summary['classes'].items()))
+    summary['box_sizes'] = dict(zip([f'<{b}' for b in SIZE_BINS] + ['<=1'], summary['box_sizes']))
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m easyboxer.validate', description='validate yolo label folder')
+    parser.add_argument('images', help='image folder')
+    parser.add_argument('labels', help='label folder')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--names', help='category names file, one per line')
+    group.add_argument('--nc', type=int, help='number of categories')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='processes')
+    parser.add_argument('--out', help='write json lines here instead of stdout')
+    opt = parser.parse_args(argv)
+    nc = len(read_names(opt.names)) if opt.names else opt.nc
+    out = open(opt.out, 'w', encoding='utf-8') if opt.out else sys.stdout
+    try:
+        summary = validate(opt.images, opt.labels, nc, opt.workers, report=lambda s: print(s, file=out))
+        print(json.dumps(summary, ensure_ascii=False), file=out)
+    finally:
+        if opt.out:
+            out.close()
+    return 1 if summary['issues'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import bisect
+import threading
+from pathlib import Path
+import cv2
+from .trace import tracer
+
+try:
+    import av  # optional, keyframe positions from container packets
+except ImportError:
+    av = None
+
+VIDEO_FORMATS = ['mp4', 'avi', 'mkv', 'mov', 'wmv', 'm4v', 'mpg', 'mpeg', 'ts', 'webm']  # acceptable video suffixes
+FORWARD_SEC = 2  # without keyframe index, decode forward instead of seeking for gaps up to this
+
+
+def is_video(path):
+    p = Path(path)
+    return p.suffix[1:].lower() in VIDEO_FORMATS and p.is_file()
+
+
+def frame_name(stem, frame):  # name of video frame as if extracted, label is <stem>_<frame>.txt
+    return f'{stem}_{frame:06d}.jpg'
+
+
+def keyframe_index(path):  # sorted frame numbers of keyframes read from packets without decoding, None if unknown
+    if av is None:
+        return None
+    try:
+        with av.open(str(path)) as container:
+            stream = container.streams.video[0]
+            rate, base, start = stream.average_rate, stream.time_base, stream.start_time or 0
+            if not rate or not base:
+                return None
+            keys = [round((p.pts - start) * base * rate) for p in container.demux(stream)
+                    if p.is_keyframe and p.pts is not None]
+        return sorted(keys) or None
+    except (OSError, IndexError, av.error.FFmpegError):
+        return None
+
+
+class VideoSource:  # frames of one video file read in place, every stride-th frame is an item
+
+    def __init__(self, path, cache, stride=1):
+        self.path = str(path)
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            raise ValueError(f'cannot open video {path}')
+        self.count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        if self.count <= 0:
+            self.cap.release()
+            raise ValueError(f'no frames in {path}')
+        self.stride = stride
+        self.cache = cache  # FrameCache, frames decoded on the way to target are kept here too
+        p = Path(self.path)
+        self.paths = [str(p.parent / frame_name(p.stem, f)) for f in range(0, self.count, stride)]  # virtual paths
+        self.frame_of = {path: i * stride for i, path in enumerate(self.paths)}
+        self.pos = 0  # frame the next grab returns, -1 unknown
+        self.keyframes = None
+        self.lock = threading.Lock()  # one decoder, workers take turns
+        threading.Thread(target=self.index_keyframes, daemon=True).start()
+
+    def index_keyframes(self):  # background, seeking works with heuristic until done
+        keys = keyframe_index(self.path)
+        if keys is not None:
+            self.keyframes = keys
+
+    def keyframe_before(self, frame):
+        keys = self.keyframes
+        return keys[max(bisect.bisect_right(keys, frame) - 1, 0)]
+
+    def sequential(self, target):  # cheaper to decode forward from current position than to seek
+        if self.pos < 0 or target < self.pos:
+            return False
+        if self.keyframes is not None:
+            return self.keyframe_before(target) <= self.pos  # no keyframe in between
+        return target - self.pos <= self.fps * FORWARD_SEC
+
+    def read(self, path):  # frame of virtual path, None past the end
+        target = self.frame_of[path]
+        with self.lock:
+            if not self.sequential(target):
+                start = self.keyframe_before(target) if self.keyframes is not None else target
+                with tracer.span('seek'):
+                    self.cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+                tracer.count('seek')
+                self.pos = start
+            frame = None
+            while self.pos <= target:
+                key = (self.paths[self.pos // self.stride], 1) if self.pos % self.stride == 0 else None
+                wanted = self.pos == target or (key is not None and key not in self.cache)
+                with tracer.span('video_decode'):
+                    if wanted:
+                        ok, frame = self.cap.read()
+                    else:
+                        ok = self.cap.grab()
+                if not ok:
+                    self.pos = -1
+                    return None
+                if wanted:
+                    self.cache.put(key, frame)
+                self.pos += 1
+            return frame
+
+    def load(self, path, view, prefetch=False):  # (frame, size, factor) through frame cache, no reduced decode
+        img = self.cache.get((path, 1))
+        if prefetch:
+            if img is None:
+                tracer.count('prefetch')
+        else:
+            tracer.count('hit' if img is not None else 'miss')
+        if img is None:
+            img = self.read(path)  # cached along with frames decoded on the way
+        return img, None if img is None else (img.shape[1], img.shape[0]), 1
+
+    def close(self):
+        with self.lock:
+            self.cap.release()
@@ -0,0 +1,58 @@
+import numpy as np
+from .labels import box_corners, corners_array, corners_box
+
+MAX_ZOOM = 64
+
+
+class Viewport:  # visible part of image in normalized coordinates, widget shows it stretched
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.x0, self.y0, self.x1, self.y1 = 0.0, 0.0, 1.0, 1.0
+
+    def rect(self):
+        return self.x0, self.y0, self.x1, self.y1
+
+    def zoom(self):
+        return 1 / (self.x1 - self.x0)
+
+    def zoom_at(self, factor, cx, cy):  # keep image point under widget fraction (cx, cy) fixed
+        nx = self.x0 + cx * (self.x1 - self.x0)
+        ny = self.y0 + cy * (self.y1 - self.y0)
+        span = min(1.0, max(1 / MAX_ZOOM, (self.x1 - self.x0) / factor))
+        self.x0, self.y0 = nx - cx * span, ny - cy * span
+        self.x1, self.y1 = self.x0 + span, self.y0 + span
+        self.clamp()
+
+    def pan(self, dx, dy):  # move by widget fraction
+        span_x, span_y = self.x1 - self.x0, self.y1 - self.y0
+        self.x0 += dx * span_x
+        self.y0 += dy * span_y
+        self.x1, self.y1 = self.x0 + span_x, self.y0 + span_y
+        self.clamp()
+
+    def clamp(self):  # keep inside image
+        span_x, span_y = self.x1 - self.x0, self.y1 - self.y0
+        self.x0 = min(max(self.x0, 0.0), 1.0 - span_x)
+        self.y0 = min(max(self.y0, 0.0), 1.0 - span_y)
+        self.x1, self.y1 = self.x0 + span_x, self.y0 + span_y
+
+    def to_widget(self, box, fx, fy):  # normalized center box to corners in fx * fy widget
+        x, y, w, h = box
+        sx, sy = self.x1 - self.x0, self.y1 - self.y0
+        return box_corners(((x - self.x0) / sx, (y - self.y0) / sy, w / sx, h / sy), fx, fy)
+
+    def to_widget_array(self, boxes, fx, fy):  # to_widget of (n, 4) boxes at once
+        boxes = np.asarray(boxes, np.float64).reshape(-1, 4)
+        sx, sy = self.x1 - self.x0, self.y1 - self.y0
+        return corners_array((boxes - (self.x0, self.y0, 0, 0)) / (sx, sy, sx, sy), fx, fy)
+
+    def to_point(self, px, py, fx, fy):  # point in fx * fy widget to normalized image point
+        return self.x0 + px / fx * (self.x1 - self.x0), self.y0 + py / fy * (self.y1 - self.y0)
+
+    def to_image(self, x1, y1, x2, y2, fx, fy):  # corners in fx * fy widget to normalized center box
+        x, y, w, h = corners_box(x1, y1, x2, y2, fx, fy)
+        sx, sy = self.x1 - self.x0, self.y1 - self.y0
+        return round(self.x0 + x * sx, 4), round(self.y0 + y * sy, 4), round(w * sx, 4), round(h * sy, 4)
@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+from easyboxer.prelabel import TINY_SIZE, ProposalCache, decode, prelabel, tiny_model
+
+
+def test_decode_suppresses_overlap_per_category():
+    out = np.zeros((8, 6), np.float32)  # yolov8 anchors: x, y, w, h, score of category 0 and 1
+    out[:4] = [[50, 50, 20, 20, 0.9, 0.0],
+               [52, 50, 20, 20, 0.8, 0.0],  # same category, overlaps first
+               [52, 50, 20, 20, 0.0, 0.7],  # other category, kept
+               [10, 10, 4, 4, 0.1, 0.0]]  # under score
+    out = out.T[None]
+    props = decode(out, (100, 100), (0, 0))
+    assert [(c, s) for c, _, s in props] == [(0, 0.9), (1, 0.7)]
+    assert props[0][1] == (0.5, 0.5, 0.2, 0.2)
+
+
+def test_tiny_model_round_trip(tmp_path):
+    img = np.zeros((64, 64, 3), np.uint8)
+    img[:32, 16:32] = 255  # second tile of top row
+    path = str(tmp_path / 'a.png')
+    cv2.imwrite(path, img)
+    model = tiny_model(tmp_path / 'tiny.onnx')
+    db = tmp_path / 'proposals.db'
+    key, done = prelabel([path], model, size=TINY_SIZE, workers=1, cache_path=db)
+    assert done == 1
+    assert prelabel([path], model, size=TINY_SIZE, workers=1, cache_path=db) == (key, 0)  # served by cache
+    cache = ProposalCache(db)
+    try:
+        assert cache.get(path, key) == [(0, 0, (0.375, 0.25, 0.25, 0.5), 1.0)]
+        cache.reject(path, key, 0)
+        assert cache.get(path, key) == []
+    finally:
+        cache.close()